@@ -0,0 +1,71 @@
+"""
+Waktu load, save dan lookup file TinyDB dalam format JSON vs msgpack.
+
+Jalankan dari root repo:  python -m benchmarks.storage_formats [jumlah_pengguna]
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+
+from utils.storage import JSONBackend, msgpack
+
+ENTRIES_PER_USER = 10
+LOOKUPS = 50
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def run(file_format: str, directory: str, users: int):
+    backend = JSONBackend(directory, durability='off', file_format=file_format)
+    users_table = backend.table('users')
+    ledger = backend.table('ledger')
+
+    def save():
+        with backend.transaction():
+            users_table.insert_multiple(
+                {'id': user_id, 'username': f'user{user_id}', 'first_name': 'Bench', 'balance': 0}
+                for user_id in range(1, users + 1)
+            )
+            ledger.insert_multiple(
+                {'user_id': user_id, 'type': 'topup', 'amount': 10000, 'status': 'success',
+                 'timestamp': 1700000000 + n, 'ref': f'REF{user_id}-{n}'}
+                for user_id in range(1, users + 1) for n in range(ENTRIES_PER_USER)
+            )
+
+    save_ms = timed(save)
+    storage = backend.open_db(os.path.join(directory, backend.file_name('ledger'))).storage
+    decode_ms = timed(storage.read)
+    load_ms = timed(lambda: (users_table.all(), ledger.all()))
+    lookup_ms = timed(
+        lambda: [users_table.find({'id': random.randint(1, users)}) for _ in range(LOOKUPS)]
+    ) / LOOKUPS
+    size = sum(os.path.getsize(path) for path in backend.files())
+    backend.close()
+    return save_ms, decode_ms, load_ms, lookup_ms, size
+
+
+def main(users: int = 10000) -> None:
+    formats = ['json'] + (['msgpack'] if msgpack is not None else [])
+    if msgpack is None:
+        print('msgpack is not installed, only measuring json (pip install msgpack)')
+
+    print(f'{users} users, {users * ENTRIES_PER_USER} ledger entries')
+    print(f'{"format":<10}{"save ms":>10}{"decode ms":>11}{"load ms":>10}{"lookup ms":>11}{"size KB":>10}')
+    for file_format in formats:
+        directory = tempfile.mkdtemp(prefix='digibot-bench-')
+        try:
+            save_ms, decode_ms, load_ms, lookup_ms, size = run(file_format, directory, users)
+            print(f'{file_format:<10}{save_ms:>10.1f}{decode_ms:>11.1f}{load_ms:>10.1f}{lookup_ms:>11.2f}{size / 1024:>10.0f}')
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
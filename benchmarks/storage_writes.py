@@ -0,0 +1,62 @@
+"""
+Latensi update saldo (find + update, satu commit) terhadap jumlah pengguna
+untuk tiap layout penyimpanan.
+
+Jalankan dari root repo:  python -m benchmarks.storage_writes [jumlah_sampel]
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+import statistics
+
+from utils.storage import JSONBackend, SQLiteBackend
+
+USER_COUNTS = (100, 1000, 10000, 100000)
+JSON_SHARDS = 256
+
+
+def layouts(directory: str):
+    yield 'json', JSONBackend(os.path.join(directory, 'json'), durability='off')
+    yield f'json ({JSON_SHARDS} shards)', JSONBackend(os.path.join(directory, 'sharded'), durability='off',
+                                                      shards=JSON_SHARDS)
+    yield 'sqlite', SQLiteBackend(os.path.join(directory, 'digibot.sqlite3'), durability='off')
+
+
+def populate(backend, count: int) -> None:
+    users = backend.table('users', indexes=('id',))
+    with backend.transaction():
+        users.insert_multiple(
+            {'id': user_id, 'username': f'user{user_id}', 'first_name': 'Bench', 'balance': 0}
+            for user_id in range(1, count + 1)
+        )
+
+
+def update_balance(backend, user_id: int) -> float:
+    users = backend.table('users', indexes=('id',))
+    start = time.perf_counter()
+    with backend.transaction():
+        user = users.find({'id': user_id})
+        users.update({'balance': user['balance'] + 1000}, doc_ids=[user.doc_id])
+    return (time.perf_counter() - start) * 1000
+
+
+def main(samples: int = 50) -> None:
+    print(f'{"layout":<20}{"users":>8}{"median ms":>12}{"p95 ms":>10}')
+    for count in USER_COUNTS:
+        directory = tempfile.mkdtemp(prefix='digibot-bench-')
+        try:
+            for name, backend in layouts(directory):
+                populate(backend, count)
+                timings = sorted(update_balance(backend, random.randint(1, count)) for _ in range(samples))
+                p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                print(f'{name:<20}{count:>8}{statistics.median(timings):>12.3f}{p95:>10.3f}')
+                backend.close()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
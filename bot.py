@@ -43,6 +43,7 @@ admin_commands: Dict[str, str] = {
     '/add_vps': 'create_droplet',
     '/sett_vps': 'manage_droplets',
     '/edit_vps_price': 'edit_vps_price',
+    '/storage': 'storage_admin',
 }
 
 # Configure callback handlers
@@ -54,7 +55,8 @@ admin_callbacks: list = [
     'add_account', 'manage_accounts', 'batch_test_accounts',
     'account_detail', 'delete_account', 'batch_test_delete_accounts',
     'create_droplet', 'manage_droplets', 'list_droplets',
-    'droplet_detail', 'droplet_actions', 'admin_tools'
+    'droplet_detail', 'droplet_actions', 'admin_tools',
+    'view_transactions', 'storage_admin'
 ]
 
 def validate_command_handler(handler_name: str) -> bool:
@@ -108,9 +110,10 @@ def text_handler(m: Message):
             if m.text in admin_commands:
                 logger.info(f"Checking admin access for user {user_id}")
                 logger.info(f"Config admins: {config.admins}")
-                logger.info(f"Is database admin: {is_admin(user_id)}")
+                db_admin = is_admin(user_id)
+                logger.info(f"Is database admin: {db_admin}")
                 logger.info(f"User ID type: {type(user_id)}")
-                if is_admin(user_id) or int(user_id) in config.admins:
+                if db_admin or int(user_id) in config.admins:
                     handler_name = admin_commands[m.text]
                     if validate_command_handler(handler_name):
                         execute_command_handler(handler_name, m)
@@ -166,9 +169,10 @@ def callback_query_handler(call: CallbackQuery):
             if func_name in admin_callbacks:
                 logger.info(f"Checking admin access for callback from user {user_id}")
                 logger.info(f"Config admins: {config.admins}")
-                logger.info(f"Is database admin: {is_admin(user_id)}")
+                db_admin = is_admin(user_id)
+                logger.info(f"Is database admin: {db_admin}")
                 logger.info(f"User ID type: {type(user_id)}")
-                if not (is_admin(user_id) or int(user_id) in config.admins):
+                if not (db_admin or int(user_id) in config.admins):
                     bot.answer_callback_query(
                         callback_query_id=call.id,
                         text='Anda tidak memiliki izin untuk mengakses fitur ini.',
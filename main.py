@@ -4,7 +4,6 @@ import json
 import logging
 import signal
 from typing import NoReturn
-from tinydb import TinyDB
 
 # Setup logging
 logging.basicConfig(
@@ -62,32 +61,17 @@ def load_config() -> None:
         raise
 
 def setup_database() -> None:
-    """Initialize and verify database structure."""
+    """Initialize storage backend and migrate legacy JSON databases."""
     try:
-        # Ensure database directory exists
-        db_dir = 'data'
-        os.makedirs(db_dir, exist_ok=True)
-        
-        # Initialize databases
-        databases = {
-            'users.json': ['users'],
-            'transactions.json': ['transactions'],
-            'accounts.json': ['accounts'],
-            'droplets.json': ['user_droplets']
-        }
-        
-        for db_file, tables in databases.items():
-            db_path = os.path.join(db_dir, db_file)
-            db = TinyDB(db_path)
-            
-            # Initialize required tables
-            for table in tables:
-                if table not in db.tables():
-                    db.table(table)
-                    logger.info(f"Created table '{table}' in {db_file}")
-            
-            db.close()
-            
+        from utils.storage import STORAGE_CONFIG, get_backend
+        from utils.migrate import run_migrations
+
+        backend = get_backend()
+        logger.info(f"Storage backend: {STORAGE_CONFIG.get('BACKEND', 'sqlite')}")
+
+        # Migrasi satu kali dari users.json, transactions.json, user_droplets.json dan db.json,
+        # lalu pindahkan riwayat transaksi yang tertanam di dokumen pengguna ke ledger
+        run_migrations(backend)
         logger.info("Database setup completed")
         
     except Exception as e:
@@ -98,12 +82,36 @@ def signal_handler(signum: int, frame) -> NoReturn:
     """Handle termination signals gracefully."""
     logger.info(f"Received signal {signum}")
     logger.info("Shutting down bot...")
+
+    from utils.storage import close_storage
+    from utils.do_client import clients
+    close_storage()
+
+    logger.info(f"DO API connections: {clients.stats()}")
+    clients.close()
+
     sys.exit(0)
 
 def start_bot() -> None:
     """Initialize and start the bot."""
     try:
         from bot import bot
+        from utils.maintenance import start_maintenance_scheduler
+        from utils.catalog import start_catalog_scheduler
+        from utils.placement import start_placement_scheduler
+        from utils.warm_pool import start_warm_pool_scheduler
+        
+        # Kompaksi dan snapshot penyimpanan secara berkala
+        start_maintenance_scheduler()
+        
+        # Muat katalog semua akun DO di background selagi polling dimulai
+        start_catalog_scheduler()
+
+        # Data penempatan auto order (slot droplet per akun)
+        start_placement_scheduler()
+
+        # Isi warm pool paket populer (jika diaktifkan)
+        start_warm_pool_scheduler()
         
         # Register signal handlers
         signal.signal(signal.SIGINT, signal_handler)
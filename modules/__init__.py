@@ -23,6 +23,8 @@ from .droplet_actions import droplet_actions
 from .account_detail import account_detail
 from .delete_account import delete_account
 from .batch_test_delete_accounts import batch_test_delete_accounts
+from .view_transactions import view_transactions
+from .storage_admin import storage_admin
 
 # Daftar modul yang tersedia
 __all__ = [
@@ -46,5 +48,7 @@ __all__ = [
     'droplet_actions',
     'account_detail',
     'delete_account',
-    'batch_test_delete_accounts'
+    'batch_test_delete_accounts',
+    'view_transactions',
+    'storage_admin'
 ]
@@ -4,11 +4,12 @@ from telebot.types import (
     InlineKeyboardButton,
 )
 
-import digitalocean
 from digitalocean import DataReadError
 
 from _bot import bot
-from utils.db import AccountsDB
+from utils.db import AccountsDB, token_fingerprint
+from utils.do_client import clients
+from utils.rate_limit import rate_limiter
 
 
 def account_detail(call: CallbackQuery, data: dict):
@@ -38,7 +39,7 @@ def account_detail(call: CallbackQuery, data: dict):
     )
 
     try:
-        account_balance = digitalocean.Balance().get_object(api_token=account['token'])
+        account_balance = clients.get_balance(account['token'])
 
         t += f'💰 Saldo Akun: <code>{account_balance.account_balance}</code>\n' \
              f'📊 Penggunaan Bulan Ini: <code>{account_balance.month_to_date_usage}</code>\n' \
@@ -49,6 +50,11 @@ def account_detail(call: CallbackQuery, data: dict):
     except Exception as e:
         t += f'⚠️ Kesalahan: <code>{e}</code>'
 
+    budget = rate_limiter.budget(token_fingerprint(account['token']))
+    if budget is not None:
+        t += f'\n📶 Anggaran API: <code>{budget["remaining"]}/{budget["limit"]}</code> ' \
+             f'(reset {budget["reset_in"] / 60:.0f} menit)'
+
     bot.edit_message_text(
         text=t,
         chat_id=call.from_user.id,
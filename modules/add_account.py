@@ -1,3 +1,5 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Union
 
 from telebot.types import (
@@ -5,13 +7,19 @@ from telebot.types import (
     CallbackQuery
 )
 
-import digitalocean
 from digitalocean import DataReadError
 
 from _bot import bot
 from utils.db import AccountsDB
+from utils.do_client import clients
+from utils.message import split_message
 from .start import start
 
+# Jumlah token yang divalidasi bersamaan
+MAX_WORKERS = 8
+# Jeda minimum antar update pesan progres (detik)
+PROGRESS_INTERVAL = 2
+
 
 def add_account(d: Union[Message, CallbackQuery]):
     t = '<b>🔑 Tambahkan Akun DigitalOcean</b>\n\n' \
@@ -31,6 +39,16 @@ def add_account(d: Union[Message, CallbackQuery]):
     bot.register_next_step_handler(msg, add_account_next_step_handler)
 
 
+def validate_token(token: str) -> str:
+    """Return the account email of a token, through its pooled session."""
+    try:
+        return clients.get_account(token).email
+    except Exception:
+        # Token yang tidak jadi disimpan tidak perlu menyimpan sesi
+        clients.close(token)
+        raise
+
+
 def add_account_next_step_handler(m: Message):
     if m.text == '/cancel':
         start(m)
@@ -41,41 +59,76 @@ def add_account_next_step_handler(m: Message):
         chat_id=m.from_user.id
     )
 
-    accounts = m.text.split('\n')
-    added_accounts = []
+    accounts = [account for account in m.text.split('\n') if account.strip()]
+    valid_accounts = []
     failed_accounts = []
+    error_accounts = []
+    duplicate_accounts = []
+    pending = {}
+    seen_tokens = set()
+
+    try:
+        accounts_db = AccountsDB()
+        for account in accounts:
+            token, _, remarks = account.partition(':')
+            token = token.strip()
+
+            # Token yang sudah tersimpan atau diulang tidak perlu dicek ke API
+            if token in seen_tokens or accounts_db.has_token(token):
+                duplicate_accounts.append(account)
+                continue
+            seen_tokens.add(token)
+            pending[token] = (account, remarks.strip())
+    except Exception as e:
+        bot.edit_message_text(
+            text=f'⚠️ Kesalahan saat menambahkan akun: <code>{str(e)}</code>',
+            chat_id=m.from_user.id,
+            message_id=msg.message_id,
+            parse_mode='HTML'
+        )
+        return
 
-    for account in accounts:
-        if ':' in account:
-            token = account.split(':')[0]
-            remarks = account.split(':')[1]
-        else:
-            token = account
-            remarks = ''
-
-        try:
-            email = digitalocean.Account().get_object(
-                api_token=token
-            ).email
-
-            AccountsDB().save(
-                email=email,
-                token=token,
-                remarks=remarks
-            )
-
-            added_accounts.append(email)
+    last_update = time.monotonic()
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='add_account') as pool:
+        futures = {pool.submit(validate_token, token): token for token in pending}
+        for done, future in enumerate(as_completed(futures), start=1):
+            token = futures[future]
+            account, remarks = pending[token]
+            try:
+                valid_accounts.append({
+                    'email': future.result(),
+                    'token': token,
+                    'remarks': remarks
+                })
+            except DataReadError:
+                failed_accounts.append(account)
+            except Exception as e:
+                error_accounts.append((account, str(e)))
+
+            if time.monotonic() - last_update >= PROGRESS_INTERVAL and done < len(futures):
+                last_update = time.monotonic()
+                try:
+                    bot.edit_message_text(
+                        text=f'🔄 Menambahkan akun... {done}/{len(futures)} token diperiksa',
+                        chat_id=m.from_user.id,
+                        message_id=msg.message_id
+                    )
+                except Exception:
+                    pass
+
+    try:
+        added, duplicates = accounts_db.save_many(valid_accounts)
+    except Exception as e:
+        bot.edit_message_text(
+            text=f'⚠️ Kesalahan saat menambahkan akun: <code>{str(e)}</code>',
+            chat_id=m.from_user.id,
+            message_id=msg.message_id,
+            parse_mode='HTML'
+        )
+        return
 
-        except DataReadError:
-            failed_accounts.append(account)
-        except Exception as e:
-            bot.edit_message_text(
-                text=f'⚠️ Kesalahan saat menambahkan akun: <code>{str(e)}</code>',
-                chat_id=m.from_user.id,
-                message_id=msg.message_id,
-                parse_mode='HTML'
-            )
-            return
+    added_accounts = [account['email'] for account in added]
+    duplicate_accounts += [account['token'] for account in duplicates]
 
     t = f'<b>📊 Total {len(accounts)} akun</b>\n\n'
 
@@ -89,10 +142,30 @@ def add_account_next_step_handler(m: Message):
         t += f'❌ Gagal menambahkan {len(failed_accounts)} akun:\n'
         for failed_account in failed_accounts:
             t += f'<code>{failed_account}</code>\n'
+        t += '\n'
 
-    bot.edit_message_text(
-        text=t,
-        chat_id=m.from_user.id,
-        message_id=msg.message_id,
-        parse_mode='HTML'
-    )
+    if error_accounts:
+        t += f'⚠️ {len(error_accounts)} token tidak dapat diperiksa:\n'
+        for error_account, error in error_accounts:
+            t += f'<code>{error_account}</code> | <code>{error}</code>\n'
+        t += '\n'
+
+    if duplicate_accounts:
+        t += f'⚠️ {len(duplicate_accounts)} token sudah terdaftar:\n'
+        for duplicate_account in duplicate_accounts:
+            t += f'<code>{duplicate_account}</code>\n'
+
+    for i, chunk in enumerate(split_message(t)):
+        if i == 0:
+            bot.edit_message_text(
+                text=chunk,
+                chat_id=m.from_user.id,
+                message_id=msg.message_id,
+                parse_mode='HTML'
+            )
+        else:
+            bot.send_message(
+                text=chunk,
+                chat_id=m.from_user.id,
+                parse_mode='HTML'
+            )
@@ -44,9 +44,10 @@ def edit_vps_price(d: Union[Message, CallbackQuery], data: dict = None):
     from _bot import config, logger
     logger.info(f"Checking admin access in admin_tools for user {user_id}")
     logger.info(f"Config admins: {config.admins}")
-    logger.info(f"Is database admin: {is_admin(user_id)}")
+    db_admin = is_admin(user_id)
+    logger.info(f"Is database admin: {db_admin}")
     logger.info(f"User ID type: {type(user_id)}")
-    if not (is_admin(user_id) or int(user_id) in config.admins):
+    if not (db_admin or int(user_id) in config.admins):
         bot.send_message(
             chat_id=user_id,
             text="🚫 Anda tidak memiliki izin untuk menggunakan fitur ini."
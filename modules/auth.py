@@ -1,20 +1,53 @@
-from utils.multiuser_db import UsersDB
+from typing import Any, Dict, Optional
+
+from utils.cache import TTLCache
+from utils.multiuser_db import UsersDB, add_user_listener
+
+# Cache data pengguna (termasuk hasil negatif untuk pengguna yang belum terdaftar)
+USER_CACHE_SIZE = 4096
+USER_CACHE_TTL = 300
+
+_user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+def _on_user_changed(user_id: int, user: Optional[Dict[str, Any]]) -> None:
+    """Write-through dari UsersDB: simpan data terbaru ke cache."""
+    _user_cache.set(user_id, user)
+
+
+add_user_listener(_on_user_changed)
+
+
+def get_user(user_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Mengambil data pengguna dari cache, membaca database hanya saat cache kosong.
+
+    :param user_id: ID pengguna Telegram
+    :return: Data pengguna atau None jika belum terdaftar
+    """
+    return _user_cache.get_or_load(user_id, lambda: UsersDB().get_by_id(user_id))
+
+
+def user_cache_stats() -> Dict[str, Any]:
+    """Statistik cache pengguna (hits, misses, size, hit_rate)."""
+    return _user_cache.stats()
+
 
 def check_auth(user_id: int) -> bool:
     """
     Memeriksa apakah pengguna sudah terdaftar.
-    
+
     :param user_id: ID pengguna Telegram
     :return: True jika terdaftar, False jika belum
     """
-    return bool(UsersDB().get_by_id(user_id))
+    return bool(get_user(user_id))
 
 def is_admin(user_id: int) -> bool:
     """
     Memeriksa apakah pengguna adalah admin.
-    
+
     :param user_id: ID pengguna Telegram
     :return: True jika admin, False jika bukan
     """
-    user = UsersDB().get_by_id(user_id)
+    user = get_user(user_id)
     return bool(user and user.get('is_admin', False))
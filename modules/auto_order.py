@@ -1,5 +1,4 @@
 from typing import Union
-from time import sleep
 
 from telebot.types import (
     Message,
@@ -8,14 +7,16 @@ from telebot.types import (
     InlineKeyboardButton,
 )
 
-import digitalocean
-
-from _bot import bot
-from utils.db import AccountsDB
-from utils.multiuser_db import UsersDB, TransactionsDB, UserDropletsDB
+from _bot import bot, logger
+from utils.catalog import catalog
+from utils.droplet_cache import droplet_cache
+from utils.multiuser_db import UsersDB, LedgerDB, UserDropletsDB
 from utils.localizer import localize_region
 from utils.set_root_password_script import set_root_password_script
 from utils.password_generator import password_generator
+from utils.placement import placement
+from utils.provisioning import ProvisionJob, format_progress, provisioner
+from utils.warm_pool import WarmDroplet, warm_pool
 from modules.register import check_auth
 from modules.wallet import show_wallet
 
@@ -46,10 +47,30 @@ auto_order_dict = {}
 t = '<b>🤖 Auto Order VPS</b>\n\n'
 
 
+def _valid_choice(call: CallbackQuery, check, *args) -> bool:
+    """Validasi parameter callback dengan indeks katalog akun."""
+    try:
+        if check(*args):
+            return True
+    except Exception:
+        # Katalog gagal dimuat; kesalahannya ditampilkan oleh langkah berikutnya
+        return True
+
+    bot.answer_callback_query(
+        callback_query_id=call.id,
+        text='⚠️ Pilihan tidak tersedia, silakan pilih ulang.',
+        show_alert=True
+    )
+    return False
+
+
 def auto_order(d: Union[Message, CallbackQuery], data: dict = None):
     """Handle auto order."""
     data = data or {}
-    next_func = data.get('nf', ['select_account'])[0]
+    next_func = data.get('nf', ['select_region'])[0]
+    # Tombol lama dari sebelum akun dipilih otomatis
+    if next_func == 'select_account':
+        next_func = 'select_region'
     
     # Periksa autentikasi pengguna
     if not check_auth(d.from_user.id):
@@ -70,112 +91,85 @@ def auto_order(d: Union[Message, CallbackQuery], data: dict = None):
         globals()[next_func](*args)
 
 
-def select_account(d: Union[Message, CallbackQuery]):
-    """Pilih akun DigitalOcean untuk auto order."""
-    accounts = AccountsDB().all()
-    
-    if not accounts:
-        markup = InlineKeyboardMarkup()
-        markup.row(
-            InlineKeyboardButton(
-                text='⬅️ Kembali ke Menu',
-                callback_data='start'
-            )
-        )
-        
-        bot.send_message(
+def select_region(d: Union[Message, CallbackQuery]):
+    """Pilih region untuk auto order; akun DigitalOcean dipilih otomatis."""
+    user_id = d.from_user.id
+    auto_order_dict[user_id] = {}
+
+    if isinstance(d, Message):
+        msg = bot.send_message(
             text=f'{t}'
-                 '⚠️ Tidak ada akun DigitalOcean yang tersedia. Silakan hubungi admin.',
-            chat_id=d.from_user.id,
-            parse_mode='HTML',
-            reply_markup=markup
-        )
-        return
-    
-    # Buat markup
-    markup = InlineKeyboardMarkup()
-    for account in accounts:
-        markup.add(
-            InlineKeyboardButton(
-                text=account['email'],
-                callback_data=f'auto_order?nf=select_region&doc_id={account.doc_id}'
-            )
+                 f'🌍 Mengambil daftar Wilayah...',
+            chat_id=user_id,
+            parse_mode='HTML'
         )
-    
-    markup.row(
-        InlineKeyboardButton(
-            text='⬅️ Kembali ke Menu',
-            callback_data='start'
+        message_id = msg.message_id
+    else:
+        message_id = d.message.message_id
+        bot.edit_message_text(
+            text=f'{t}'
+                 f'🌍 Mengambil daftar Wilayah...',
+            chat_id=user_id,
+            message_id=message_id,
+            parse_mode='HTML'
         )
-    )
-    
-    # Kirim pesan
-    bot.send_message(
-        text=f'{t}'
-             '👤 Pilih Akun DigitalOcean',
-        chat_id=d.from_user.id,
-        parse_mode='HTML',
-        reply_markup=markup
-    )
-
-
-def select_region(call: CallbackQuery, data: dict):
-    """Pilih region untuk auto order."""
-    doc_id = data['doc_id'][0]
-    user_id = call.from_user.id
-
-    account = AccountsDB().get(doc_id=doc_id)
-    auto_order_dict[user_id] = {
-        'account': account
-    }
-
-    _t = t + f'👤 Akun: <code>{account["email"]}</code>\n\n'
-
-    bot.edit_message_text(
-        text=f'{_t}'
-             f'🌍 Mengambil daftar Wilayah...',
-        chat_id=user_id,
-        message_id=call.message.message_id,
-        parse_mode='HTML'
-    )
 
     try:
-        regions = digitalocean.Manager(token=account['token']).get_all_regions()
+        placement.ensure_loaded()
+        regions = placement.regions()
     except Exception as e:
         bot.edit_message_text(
-            text=f'{_t}'
+            text=f'{t}'
                  '⚠️ Kesalahan saat mengambil Wilayah: '
                  f'<code>{str(e)}</code>',
             chat_id=user_id,
-            message_id=call.message.message_id,
+            message_id=message_id,
             parse_mode='HTML'
         )
         return
 
+    if not regions:
+        markup = InlineKeyboardMarkup()
+        markup.row(
+            InlineKeyboardButton(
+                text='⬅️ Kembali ke Menu',
+                callback_data='start'
+            )
+        )
+
+        bot.edit_message_text(
+            text=f'{t}'
+                 '⚠️ Tidak ada server yang tersedia saat ini. Silakan hubungi admin.',
+            chat_id=user_id,
+            message_id=message_id,
+            parse_mode='HTML',
+            reply_markup=markup
+        )
+        return
+
     markup = InlineKeyboardMarkup(row_width=2)
     buttons = []
-    for region in regions:
-        if region.available:
-            buttons.append(
-                InlineKeyboardButton(
-                    text=localize_region(slug=region.slug),
-                    callback_data=f'auto_order?nf=select_size&region={region.slug}'
-                )
+    for region_slug in regions:
+        buttons.append(
+            InlineKeyboardButton(
+                text=localize_region(slug=region_slug),
+                callback_data=f'auto_order?nf=select_size&region={region_slug}'
             )
+        )
     markup.add(*buttons)
-    
+
     markup.row(
         InlineKeyboardButton(
-            text='⬅️ Kembali',
-            callback_data='auto_order?nf=select_account'
+            text='⬅️ Kembali ke Menu',
+            callback_data='start'
         )
     )
 
     bot.edit_message_text(
-        text=f'{_t}'
+        text=f'{t}'
              f'🌍 Pilih Wilayah',
         chat_id=user_id,
-        message_id=call.message.message_id,
+        message_id=message_id,
         reply_markup=markup,
         parse_mode='HTML'
     )
@@ -186,12 +180,23 @@ def select_size(call: CallbackQuery, data: dict):
     region_slug = data['region'][0]
     user_id = call.from_user.id
 
-    auto_order_dict[user_id].update({
+    # Akun dengan slot kosong terbanyak di wilayah ini; slotnya dipesan saat konfirmasi
+    account = placement.pick(region_slug)
+    if account is None:
+        bot.answer_callback_query(
+            callback_query_id=call.id,
+            text='⚠️ Wilayah ini sedang penuh, silakan pilih wilayah lain.',
+            show_alert=True
+        )
+        return
+    token = account['token']
+
+    auto_order_dict.setdefault(user_id, {}).update({
+        'account': account,
         'region_slug': region_slug
     })
 
-    _t = t + f'👤 Akun: <code>{auto_order_dict[user_id]["account"]["email"]}</code>\n' \
-             f'🌍 Wilayah: <code>{region_slug}</code>\n\n'
+    _t = t + f'🌍 Wilayah: <code>{region_slug}</code>\n\n'
 
     bot.edit_message_text(
         text=f'{_t}'
@@ -202,7 +207,7 @@ def select_size(call: CallbackQuery, data: dict):
     )
 
     try:
-        sizes = digitalocean.Manager(token=auto_order_dict[user_id]['account']['token']).get_all_sizes()
+        sizes = catalog.sizes_in_region(token, region_slug)
     except Exception as e:
         bot.edit_message_text(
             text=f'{_t}'
@@ -220,11 +225,12 @@ def select_size(call: CallbackQuery, data: dict):
     user_data = UsersDB().get_by_id(user_id)
     balance = user_data.get('balance', 0)
     
+    # Reload prices to get latest updates
+    prices = load_droplet_prices()
+
     for size in sizes:
-        if region_slug in size.regions and size.slug in DROPLET_PRICES:
-            # Reload prices to get latest updates
-            DROPLET_PRICES = load_droplet_prices()
-            price = DROPLET_PRICES.get(size.slug, 70000)
+        if size.slug in prices:
+            price = prices[size.slug]
             if balance >= price:
                 label = f"{size.slug} - Rp {price:,}"
             else:
@@ -241,7 +247,7 @@ def select_size(call: CallbackQuery, data: dict):
     markup.row(
         InlineKeyboardButton(
             text='⬅️ Kembali',
-            callback_data=f'auto_order?nf=select_region&doc_id={auto_order_dict[user_id]["account"].doc_id}'
+            callback_data='auto_order?nf=select_region'
         )
     )
 
@@ -261,13 +267,16 @@ def check_balance(call: CallbackQuery, data: dict):
     size_slug = data['size'][0]
     user_id = call.from_user.id
 
+    if not _valid_choice(call, catalog.has_size, auto_order_dict[user_id]['account']['token'],
+                         auto_order_dict[user_id]['region_slug'], size_slug):
+        return
+
     # Update data pesanan
     auto_order_dict[user_id].update({
         'size_slug': size_slug
     })
 
-    _t = t + f'👤 Akun: <code>{auto_order_dict[user_id]["account"]["email"]}</code>\n' \
-             f'🌍 Wilayah: <code>{auto_order_dict[user_id]["region_slug"]}</code>\n' \
+    _t = t + f'🌍 Wilayah: <code>{auto_order_dict[user_id]["region_slug"]}</code>\n' \
              f'📏 Ukuran: <code>{size_slug}</code>\n\n'
 
     # Periksa saldo
@@ -318,13 +327,15 @@ def select_os(d: Union[Message, CallbackQuery], data: dict):
     """Pilih OS untuk auto order."""
     user_id = d.from_user.id
 
-    _t = t + f'👤 Akun: <code>{auto_order_dict[user_id]["account"]["email"]}</code>\n' \
-             f'🌍 Wilayah: <code>{auto_order_dict[user_id]["region_slug"]}</code>\n' \
+    _t = t + f'🌍 Wilayah: <code>{auto_order_dict[user_id]["region_slug"]}</code>\n' \
              f'📏 Ukuran: <code>{auto_order_dict[user_id]["size_slug"]}</code>\n\n'
 
     def get_os_markup():
         try:
-            images = digitalocean.Manager(token=auto_order_dict[user_id]['account']['token']).get_distro_images()
+            images = catalog.images_in_region(
+                auto_order_dict[user_id]['account']['token'],
+                auto_order_dict[user_id]['region_slug']
+            )
         except Exception as e:
             bot.edit_message_text(
                 text=f'{_t}'
@@ -339,16 +350,12 @@ def select_os(d: Union[Message, CallbackQuery], data: dict):
         markup = InlineKeyboardMarkup(row_width=2)
         buttons = []
         for image in images:
-            if image.distribution in ['Ubuntu', 'CentOS', 'Debian'] \
-                    and image.public \
-                    and image.status == 'available' \
-                    and auto_order_dict[user_id]["region_slug"] in image.regions:
-                buttons.append(
-                    InlineKeyboardButton(
-                        text=f'{image.distribution} {image.name}',
-                        callback_data=f'auto_order?nf=get_name&image={image.slug}'
-                    )
+            buttons.append(
+                InlineKeyboardButton(
+                    text=f'{image.distribution} {image.name}',
+                    callback_data=f'auto_order?nf=get_name&image={image.slug}'
                 )
+            )
         markup.add(*buttons)
         markup.row(
             InlineKeyboardButton(
@@ -398,12 +405,15 @@ def get_name(call: CallbackQuery, data: dict):
     image_slug = data['image'][0]
     user_id = call.from_user.id
 
+    if not _valid_choice(call, catalog.has_image, auto_order_dict[user_id]['account']['token'],
+                         auto_order_dict[user_id]['region_slug'], image_slug):
+        return
+
     auto_order_dict[user_id].update({
         'image_slug': image_slug
     })
 
-    _t = t + f'👤 Akun: <code>{auto_order_dict[user_id]["account"]["email"]}</code>\n' \
-             f'🌍 Wilayah: <code>{auto_order_dict[user_id]["region_slug"]}</code>\n' \
+    _t = t + f'🌍 Wilayah: <code>{auto_order_dict[user_id]["region_slug"]}</code>\n' \
              f'📏 Ukuran: <code>{auto_order_dict[user_id]["size_slug"]}</code>\n' \
              f'🖼️ OS: <code>{image_slug}</code>\n\n'
 
@@ -430,8 +440,7 @@ def ask_create(m: Message):
         'droplet_name': m.text
     })
 
-    _t = t + f'👤 Akun: <code>{auto_order_dict[user_id]["account"]["email"]}</code>\n' \
-             f'🌍 Wilayah: <code>{auto_order_dict[user_id]["region_slug"]}</code>\n' \
+    _t = t + f'🌍 Wilayah: <code>{auto_order_dict[user_id]["region_slug"]}</code>\n' \
              f'📏 Ukuran: <code>{auto_order_dict[user_id]["size_slug"]}</code>\n' \
              f'🖼️ OS: <code>{auto_order_dict[user_id]["image_slug"]}</code>\n' \
              f'📝 Nama: <code>{m.text}</code>\n\n'
@@ -484,6 +493,73 @@ def cancel_create(call: CallbackQuery):
     )
 
 
+def _ready_markup(doc_id: int, droplet_id: int) -> InlineKeyboardMarkup:
+    markup = InlineKeyboardMarkup()
+    markup.row(
+        InlineKeyboardButton(
+            text='🔍 Lihat Detail',
+            callback_data=f'droplet_detail?'
+                          f'doc_id={doc_id}&'
+                          f'droplet_id={droplet_id}'
+        )
+    )
+    markup.row(
+        InlineKeyboardButton(
+            text='⬅️ Kembali ke Menu',
+            callback_data='start'
+        )
+    )
+    return markup
+
+
+def _deliver_warm(call: CallbackQuery, order: dict, price: int, warm: WarmDroplet):
+    """Serahkan droplet dari warm pool: potong saldo, ganti nama dan simpan ke pengguna."""
+    user_id = call.from_user.id
+
+    try:
+        LedgerDB().record(
+            user_id,
+            -price,
+            'purchase',
+            details=f"VPS {order['size_slug']} - {order['droplet_name']}"
+        )
+    except Exception as e:
+        warm_pool.restore(warm)
+        bot.edit_message_text(
+            text=f'{call.message.html_text}\n\n'
+                 f'<b>❌ Gagal memproses pembayaran: {str(e)}</b>',
+            chat_id=user_id,
+            message_id=call.message.message_id,
+            parse_mode='HTML'
+        )
+        return
+
+    try:
+        action = warm.droplet.rename(order['droplet_name'])
+        droplet_cache.mark_transitional(warm.account['token'], warm.droplet.id, action)
+    except Exception as e:
+        # Nama hanya label; VPS tetap diserahkan
+        logger.warning(f"Error renaming warm droplet {warm.droplet.id}: {str(e)}")
+
+    UserDropletsDB().add(
+        user_id=user_id,
+        doc_id=warm.account.doc_id,
+        droplet_id=warm.droplet.id
+    )
+
+    bot.edit_message_text(
+        text=f'{call.message.html_text}\n\n'
+             f'⚡ Diambil dari stok VPS siap pakai\n\n'
+             f'🌐 IP: <code>{warm.droplet.ip_address}</code>\n'
+             f'🔑 Password: <code>{warm.password}</code>\n\n'
+             '<b>✅ VPS berhasil dibuat!</b>',
+        chat_id=user_id,
+        message_id=call.message.message_id,
+        reply_markup=_ready_markup(warm.account.doc_id, warm.droplet.id),
+        parse_mode='HTML'
+    )
+
+
 def confirm_create(call: CallbackQuery):
     """Konfirmasi dan proses pembuatan droplet."""
     user_id = call.from_user.id
@@ -502,115 +578,126 @@ def confirm_create(call: CallbackQuery):
             parse_mode='HTML'
         )
         return
-    
-    # Kurangi saldo
-    try:
-        UsersDB().update_balance(user_id, -price)
-        
-        # Tambahkan transaksi
-        TransactionsDB().add(
-            user_id=user_id,
-            amount=-price,
-            type_='purchase',
-            details=f"VPS {auto_order_dict[user_id]['size_slug']} - {auto_order_dict[user_id]['droplet_name']}"
-        )
-    except Exception as e:
+
+    order = auto_order_dict[user_id]
+
+    # Paket populer langsung diambil dari warm pool bila stoknya ada
+    warm = warm_pool.claim(order['region_slug'], order['size_slug'], order['image_slug'])
+    if warm is not None:
+        _deliver_warm(call, order, price, warm)
+        return
+
+    # Pesan slot droplet sebelum saldo dipotong, agar order tidak gagal karena akun penuh
+    account = placement.reserve(order['region_slug'], preferred=order['account'])
+    if account is not None and account is not order['account']:
+        # Akun pilihan awal sudah penuh; pastikan akun pengganti punya ukuran dan OS yang sama
+        try:
+            available = catalog.has_size(account['token'], order['region_slug'], order['size_slug']) \
+                and catalog.has_image(account['token'], order['region_slug'], order['image_slug'])
+        except Exception:
+            available = False
+        if not available:
+            placement.release(account)
+            account = None
+
+    if account is None:
         bot.edit_message_text(
             text=f'{call.message.html_text}\n\n'
-                 f'<b>❌ Gagal memproses pembayaran: {str(e)}</b>',
+                 '<b>❌ Wilayah ini sedang penuh. Silakan order ulang dengan wilayah lain.</b>',
             chat_id=user_id,
             message_id=call.message.message_id,
             parse_mode='HTML'
         )
         return
-    
-    # Buat droplet
-    bot.edit_message_text(
-        text=f'{call.message.html_text}\n\n'
-             '<b>🔄 Membuat VPS...</b>',
-        chat_id=user_id,
-        message_id=call.message.message_id,
-        parse_mode='HTML'
-    )
-    
+
+    # Kurangi saldo dan catat transaksi dalam satu operasi ledger
     try:
-        password = password_generator()
-        
-        droplet = digitalocean.Droplet(
-            token=auto_order_dict[user_id]['account']['token'],
-            name=auto_order_dict[user_id]['droplet_name'],
-            region=auto_order_dict[user_id]['region_slug'],
-            image=auto_order_dict[user_id]['image_slug'],
-            size_slug=auto_order_dict[user_id]['size_slug'],
-            user_data=set_root_password_script(password)
-        )
-        droplet.create()
-
-        droplet_actions = droplet.get_actions()
-        for action in droplet_actions:
-            while action.status != 'completed':
-                sleep(3)
-                action.load()
-        droplet.load()
-
-        # Menunggu IP address siap
-        while not droplet.ip_address:
-            sleep(3)
-            droplet.load()
-            
-        # Simpan droplet ke database pengguna
-        UserDropletsDB().add(
-            user_id=user_id,
-            doc_id=auto_order_dict[user_id]['account'].doc_id,
-            droplet_id=droplet.id
+        LedgerDB().record(
+            user_id,
+            -price,
+            'purchase',
+            details=f"VPS {auto_order_dict[user_id]['size_slug']} - {auto_order_dict[user_id]['droplet_name']}"
         )
-        
     except Exception as e:
-        # Jika terjadi kesalahan, kembalikan saldo
-        UsersDB().update_balance(user_id, price)
-        
-        # Tambahkan transaksi pengembalian
-        TransactionsDB().add(
-            user_id=user_id,
-            amount=price,
-            type_='refund',
-            details=f"Refund: Gagal membuat VPS - {str(e)}"
-        )
-        
+        placement.release(account)
         bot.edit_message_text(
             text=f'{call.message.html_text}\n\n'
-                 f'<b>❌ Gagal membuat VPS: {str(e)}</b>\n'
-                 f'Saldo telah dikembalikan.',
+                 f'<b>❌ Gagal memproses pembayaran: {str(e)}</b>',
             chat_id=user_id,
             message_id=call.message.message_id,
             parse_mode='HTML'
         )
         return
 
-    markup = InlineKeyboardMarkup()
-    markup.row(
-        InlineKeyboardButton(
-            text='🔍 Lihat Detail',
-            callback_data=f'droplet_detail?'
-                          f'doc_id={auto_order_dict[user_id]["account"].doc_id}&'
-                          f'droplet_id={droplet.id}'
+    header = call.message.html_text
+    password = password_generator()
+
+    def edit_order_message(text: str, markup: InlineKeyboardMarkup = None):
+        bot.edit_message_text(
+            text=text,
+            chat_id=user_id,
+            message_id=call.message.message_id,
+            reply_markup=markup,
+            parse_mode='HTML'
         )
-    )
-    markup.row(
-        InlineKeyboardButton(
-            text='⬅️ Kembali ke Menu',
-            callback_data='start'
+
+    def on_ready(job: ProvisionJob):
+        placement.release(account, created=True)
+
+        # Simpan droplet ke database pengguna
+        UserDropletsDB().add(
+            user_id=user_id,
+            doc_id=account.doc_id,
+            droplet_id=job.droplet.id
         )
-    )
 
-    # Kirim informasi VPS yang berhasil dibuat
-    bot.edit_message_text(
-        text=f'{call.message.html_text}\n'
-             f'🌐 IP: <code>{droplet.ip_address}</code>\n'
-             f'🔑 Password: <code>{password}</code>\n\n'
-             '<b>✅ VPS berhasil dibuat!</b>',
-        chat_id=user_id,
-        reply_markup=markup,
-        message_id=call.message.message_id,
-        parse_mode='HTML'
-    )
+        # Kirim informasi VPS yang berhasil dibuat
+        edit_order_message(
+            f'{header}\n\n'
+            f'{format_progress(job)}\n\n'
+            f'🌐 IP: <code>{job.droplet.ip_address}</code>\n'
+            f'🔑 Password: <code>{password}</code>\n\n'
+            '<b>✅ VPS berhasil dibuat!</b>',
+            _ready_markup(account.doc_id, job.droplet.id)
+        )
+
+    def on_failed(job: ProvisionJob, e: Exception):
+        # Droplet sudah dihapus provisioner; jika gagal dihapus tetap menempati slot
+        placement.release(account, created=job.orphaned)
+
+        # Jika terjadi kesalahan, kembalikan saldo dan catat pengembalian
+        try:
+            LedgerDB().record(
+                user_id,
+                price,
+                'refund',
+                details=f"Refund: Gagal membuat VPS - {str(e)}"
+            )
+            refund_text = 'Saldo telah dikembalikan.'
+        except Exception as refund_error:
+            # Pesan tetap diperbarui; admin mengembalikan saldo secara manual dari log ini
+            logger.error(f"Refund of {price} for user {user_id} (order {order['droplet_name']}) "
+                         f"could not be recorded: {str(refund_error)}")
+            refund_text = '⚠️ Saldo belum bisa dikembalikan otomatis. ' \
+                          'Silakan hubungi admin dengan menyertakan pesan ini.'
+
+        edit_order_message(
+            f'{header}\n\n'
+            f'<b>❌ Gagal membuat VPS: {str(e)}</b>\n'
+            f'{refund_text}'
+        )
+
+    # Pembuatan berjalan di worker provisioning, handler langsung selesai
+    provisioner.submit(ProvisionJob(
+        account['token'],
+        {
+            'name': order['droplet_name'],
+            'region': order['region_slug'],
+            'image': order['image_slug'],
+            'size_slug': order['size_slug'],
+            'user_data': set_root_password_script(password)
+        },
+        on_update=lambda job: edit_order_message(f'{header}\n\n{format_progress(job)}'),
+        on_ready=on_ready,
+        on_failed=on_failed
+    ))
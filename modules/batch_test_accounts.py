@@ -1,5 +1,7 @@
-import json
-from typing import Union
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Optional, Union
 
 from telebot.types import (
     Message,
@@ -8,16 +10,22 @@ from telebot.types import (
     InlineKeyboardButton,
 )
 
-import digitalocean
 from digitalocean import DataReadError
 
 from _bot import bot
-from utils.db import AccountsDB
+from utils.db import AccountsDB, AccountHealthDB, token_fingerprint
+from utils.do_client import clients
+from utils.message import split_message
+from utils.rate_limit import rate_limiter
+
+# Jumlah akun yang diperiksa bersamaan
+MAX_WORKERS = 8
+# Jeda minimum antar update pesan progres (detik)
+PROGRESS_INTERVAL = 2
 
 
 def batch_test_accounts(d: Union[Message, CallbackQuery]):
     t = '<b>🔍 Akun Tes Batch</b>\n\n'
-    markup = InlineKeyboardMarkup()
 
     msg = bot.send_message(
         text=f'{t}'
@@ -26,54 +34,134 @@ def batch_test_accounts(d: Union[Message, CallbackQuery]):
         parse_mode='HTML',
     )
 
-    accounts = AccountsDB().all()
-    checked_accounts = []
-    failed_accounts = []
+    # Pengujian berjalan di thread sendiri agar worker Telegram tidak tertahan
+    threading.Thread(
+        target=_run_batch_test,
+        args=(d.from_user.id, msg.message_id, t),
+        name='batch_test_accounts',
+        daemon=True
+    ).start()
 
-    for account in accounts:
-        try:
-            account_balance = digitalocean.Balance().get_object(api_token=account['token'])
-            account_balance.email = account['email']
 
-            checked_accounts.append(account_balance)
+def _get_balance(token: str):
+    # Tes batch mengalah pada request pengguna saat anggaran API akun menipis
+    with rate_limiter.low_priority():
+        return clients.get_balance(token)
+
+
+def probe_accounts(accounts: list, on_progress: Optional[Callable[[int, int], None]] = None) -> Dict[int, Dict[str, Any]]:
+    """
+    Check the balance API of every account in parallel and return health
+    entries keyed by account doc_id. ``on_progress(done, total)`` is called
+    at most every PROGRESS_INTERVAL seconds.
+    """
+    results = {}
+    last_update = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='batch_test') as pool:
+        futures = {pool.submit(_get_balance, account['token']): account for account in accounts}
+        for future in as_completed(futures):
+            account = futures[future]
+            entry = {
+                'account_id': account.doc_id,
+                'fingerprint': token_fingerprint(account['token']),
+                'status': 'ok',
+                'balance': None,
+                'error': None,
+                'checked_at': time.time()
+            }
+            try:
+                entry['balance'] = future.result().account_balance
+            except DataReadError as e:
+                entry['status'] = 'failed'
+                entry['error'] = str(e)
+            except Exception as e:
+                entry['status'] = 'error'
+                entry['error'] = str(e)
+            results[account.doc_id] = entry
 
-        except DataReadError:
-            failed_accounts.append(account['email'])
-        except Exception as e:
+            if on_progress and time.monotonic() - last_update >= PROGRESS_INTERVAL and len(results) < len(accounts):
+                last_update = time.monotonic()
+                on_progress(len(results), len(accounts))
+
+    return results
+
+
+def _run_batch_test(chat_id: int, message_id: int, t: str):
+    def show_progress(done: int, total: int):
+        try:
             bot.edit_message_text(
                 text=f'{t}'
-                     f'⚠️ Kesalahan saat memeriksa akun: <code>{str(e)}</code>',
-                chat_id=d.from_user.id,
-                message_id=msg.message_id,
+                     f'🔄 {done}/{total} akun diperiksa...',
+                chat_id=chat_id,
+                message_id=message_id,
                 parse_mode='HTML'
             )
-            return
+        except Exception:
+            pass
+
+    try:
+        accounts = AccountsDB().all()
+        results = probe_accounts(accounts, on_progress=show_progress)
+        AccountHealthDB().record(results.values())
+    except Exception as e:
+        bot.edit_message_text(
+            text=f'{t}'
+                 f'⚠️ Kesalahan saat memeriksa akun: <code>{str(e)}</code>',
+            chat_id=chat_id,
+            message_id=message_id,
+            parse_mode='HTML'
+        )
+        return
+
+    checked_accounts = [account for account in accounts if results[account.doc_id]['status'] == 'ok']
+    failed_accounts = [account for account in accounts if results[account.doc_id]['status'] == 'failed']
+    error_accounts = [account for account in accounts if results[account.doc_id]['status'] == 'error']
 
     t += f'<b>Total {len(accounts)} Akun</b>\n\n'
 
     if checked_accounts:
         t += f'✅ Tes Berhasil {len(checked_accounts)} akun:\n'
-        for account_balance in checked_accounts:
-            t += f'<code>{account_balance.email}</code> | Saldo: <code>{account_balance.account_balance}</code>\n'
+        for account in checked_accounts:
+            t += f'<code>{account["email"]}</code> | Saldo: <code>{results[account.doc_id]["balance"]}</code>\n'
         t += '\n'
 
     if failed_accounts:
         t += f'❌ Tes Gagal {len(failed_accounts)} akun:\n'
-        for email in failed_accounts:
-            t += f'<code>{email}</code>\n'
+        for account in failed_accounts:
+            t += f'<code>{account["email"]}</code>\n'
+        t += '\n'
+
+    if error_accounts:
+        t += f'⚠️ Tidak Dapat Diperiksa {len(error_accounts)} akun:\n'
+        for account in error_accounts:
+            t += f'<code>{account["email"]}</code> | <code>{results[account.doc_id]["error"]}</code>\n'
+
+    markup = InlineKeyboardMarkup()
+    if failed_accounts:
         markup.add(
             InlineKeyboardButton(
                 text='🗑️ Hapus Akun Gagal',
-                callback_data=json.dumps({
-                    't': 'batch_test_delete_accounts'
-                })
+                callback_data='batch_test_delete_accounts'
             )
         )
 
-    bot.edit_message_text(
-        text=t,
-        chat_id=d.from_user.id,
-        message_id=msg.message_id,
-        parse_mode='HTML',
-        reply_markup=markup
-    )
+    # Laporan panjang dipecah; pesan pertama menggantikan pesan progres
+    chunks = split_message(t)
+    for i, chunk in enumerate(chunks):
+        reply_markup = markup if i == len(chunks) - 1 else None
+        if i == 0:
+            bot.edit_message_text(
+                text=chunk,
+                chat_id=chat_id,
+                message_id=message_id,
+                parse_mode='HTML',
+                reply_markup=reply_markup
+            )
+        else:
+            bot.send_message(
+                text=chunk,
+                chat_id=chat_id,
+                parse_mode='HTML',
+                reply_markup=reply_markup
+            )
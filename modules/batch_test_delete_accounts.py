@@ -1,10 +1,13 @@
 from telebot.types import CallbackQuery
 
-import digitalocean
-from digitalocean import DataReadError
-
 from _bot import bot
-from utils.db import AccountsDB
+from utils.db import AccountsDB, AccountHealthDB
+from utils.do_client import clients
+from utils.placement import placement
+from modules.batch_test_accounts import probe_accounts
+
+# Hasil tes batch yang lebih tua dari ini diperiksa ulang (detik)
+HEALTH_MAX_AGE = 15 * 60
 
 
 def batch_test_delete_accounts(call: CallbackQuery):
@@ -17,27 +20,38 @@ def batch_test_delete_accounts(call: CallbackQuery):
     )
 
     accounts_db = AccountsDB()
+    health_db = AccountHealthDB()
+
+    try:
+        accounts = accounts_db.all()
+
+        # Pakai hasil tes batch terakhir; hanya akun tanpa hasil segar yang diperiksa ulang
+        results = health_db.fresh(accounts, HEALTH_MAX_AGE)
+        stale_accounts = [account for account in accounts if account.doc_id not in results]
+        if stale_accounts:
+            probed = probe_accounts(stale_accounts)
+            health_db.record(probed.values())
+            results.update(probed)
 
-    accounts = accounts_db.all()
-    for account in accounts:
-        try:
-            digitalocean.Balance().get_object(api_token=account['token'])
-        except DataReadError:
-            try:
-                accounts_db.remove(doc_id=account.doc_id)
-            except Exception as e:
-                bot.edit_message_text(
-                    text=f'{call.message.html_text}\n\n'
-                         f'⚠️ Kesalahan saat menghapus akun: <code>{str(e)}</code>',
-                    chat_id=call.from_user.id,
-                    message_id=call.message.message_id,
-                    parse_mode='HTML'
-                )
-                return
+        failed_accounts = [account for account in accounts if results[account.doc_id]['status'] == 'failed']
+        for account in failed_accounts:
+            accounts_db.remove(doc_id=account.doc_id)
+            clients.close(account['token'])
+            placement.remove(account['token'])
+        health_db.remove([account.doc_id for account in failed_accounts])
+    except Exception as e:
+        bot.edit_message_text(
+            text=f'{call.message.html_text}\n\n'
+                 f'⚠️ Kesalahan saat menghapus akun: <code>{str(e)}</code>',
+            chat_id=call.from_user.id,
+            message_id=call.message.message_id,
+            parse_mode='HTML'
+        )
+        return
 
     bot.edit_message_text(
         text=f'{call.message.html_text}\n\n'
-             f'<b>✅ Akun gagal telah dihapus</b>',
+             f'<b>✅ {len(failed_accounts)} akun gagal telah dihapus</b>',
         chat_id=call.from_user.id,
         message_id=call.message.message_id,
         parse_mode='HTML'
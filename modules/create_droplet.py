@@ -1,5 +1,7 @@
-from typing import Union
-from time import sleep
+import re
+import time
+import threading
+from typing import List, Union
 
 from telebot.types import (
     Message,
@@ -8,19 +10,44 @@ from telebot.types import (
     InlineKeyboardButton,
 )
 
-import digitalocean
-
 from _bot import bot
 from utils.db import AccountsDB
+from utils.catalog import catalog
 from utils.localizer import localize_region
 from utils.set_root_password_script import set_root_password_script
 from utils.password_generator import password_generator
+from utils.message import split_message
+from utils.provisioning import ProvisionJob, create_batch, format_progress, provisioner
 
 user_dict = {}
 
+# Jumlah server maksimum dalam satu permintaan mode banyak server
+MAX_BULK = 50
+# Jeda minimum antar update pesan progres (detik)
+PROGRESS_INTERVAL = 2
+# Nama yang juga dipakai sebagai hostname, agar password per server bisa dipilih
+BULK_NAME_PATTERN = re.compile(r'^[A-Za-z0-9-]+$')
+
 t = '<b>🚀 Buat Instance</b>\n\n'
 
 
+def _valid_choice(call: CallbackQuery, check, *args) -> bool:
+    """Validasi parameter callback dengan indeks katalog akun."""
+    try:
+        if check(*args):
+            return True
+    except Exception:
+        # Katalog gagal dimuat; kesalahannya ditampilkan oleh langkah berikutnya
+        return True
+
+    bot.answer_callback_query(
+        callback_query_id=call.id,
+        text='⚠️ Pilihan tidak tersedia, silakan pilih ulang.',
+        show_alert=True
+    )
+    return False
+
+
 def create_droplet(d: Union[Message, CallbackQuery], data: dict = None):
     data = data or {}
     next_func = data.get('nf', ['select_account'])[0]
@@ -72,7 +99,7 @@ def select_region(call: CallbackQuery, data: dict):
     )
 
     try:
-        regions = digitalocean.Manager(token=account['token']).get_all_regions()
+        regions = catalog.regions(account['token'])
     except Exception as e:
         bot.edit_message_text(
             text=f'{_t}'
@@ -108,6 +135,10 @@ def select_region(call: CallbackQuery, data: dict):
 
 def select_size(call: CallbackQuery, data: dict):
     region_slug = data['region'][0]
+    token = user_dict[call.from_user.id]['account']['token']
+
+    if not _valid_choice(call, catalog.has_region, token, region_slug):
+        return
 
     user_dict[call.from_user.id].update({
         'region_slug': region_slug
@@ -125,7 +156,7 @@ def select_size(call: CallbackQuery, data: dict):
     )
 
     try:
-        sizes = digitalocean.Manager(token=user_dict[call.from_user.id]['account']['token']).get_all_sizes()
+        sizes = catalog.sizes_in_region(token, region_slug)
     except Exception as e:
         bot.edit_message_text(
             text=f'{_t}'
@@ -140,13 +171,12 @@ def select_size(call: CallbackQuery, data: dict):
     markup = InlineKeyboardMarkup(row_width=2)
     buttons = []
     for size in sizes:
-        if region_slug in size.regions:
-            buttons.append(
-                InlineKeyboardButton(
-                    text=size.slug,
-                    callback_data=f'create_droplet?nf=select_os&size={size.slug}'
-                )
+        buttons.append(
+            InlineKeyboardButton(
+                text=size.slug,
+                callback_data=f'create_droplet?nf=select_os&size={size.slug}'
             )
+        )
     markup.add(*buttons)
     markup.row(
         InlineKeyboardButton(
@@ -168,6 +198,11 @@ def select_size(call: CallbackQuery, data: dict):
 def select_os(d: Union[Message, CallbackQuery], data: dict):
     size_slug = data['size'][0]
 
+    if isinstance(d, CallbackQuery) and not _valid_choice(
+            d, catalog.has_size, user_dict[d.from_user.id]['account']['token'],
+            user_dict[d.from_user.id]['region_slug'], size_slug):
+        return
+
     user_dict[d.from_user.id].update({
         'size_slug': size_slug
     })
@@ -178,7 +213,10 @@ def select_os(d: Union[Message, CallbackQuery], data: dict):
 
     def get_os_markup():
         try:
-            images = digitalocean.Manager(token=user_dict[d.from_user.id]['account']['token']).get_distro_images()
+            images = catalog.images_in_region(
+                user_dict[d.from_user.id]['account']['token'],
+                user_dict[d.from_user.id]['region_slug']
+            )
         except Exception as e:
             bot.edit_message_text(
                 text=f'{_t}'
@@ -193,16 +231,12 @@ def select_os(d: Union[Message, CallbackQuery], data: dict):
         markup = InlineKeyboardMarkup(row_width=2)
         buttons = []
         for image in images:
-            if image.distribution in ['Ubuntu', 'CentOS', 'Debian'] \
-                    and image.public \
-                    and image.status == 'available' \
-                    and user_dict[d.from_user.id]["region_slug"] in image.regions:
-                buttons.append(
-                    InlineKeyboardButton(
-                        text=f'{image.distribution} {image.name}',
-                        callback_data=f'create_droplet?nf=get_name&image={image.slug}'
-                    )
+            buttons.append(
+                InlineKeyboardButton(
+                    text=f'{image.distribution} {image.name}',
+                    callback_data=f'create_droplet?nf=get_name&image={image.slug}'
                 )
+            )
         markup.add(*buttons)
         markup.row(
             InlineKeyboardButton(
@@ -250,6 +284,10 @@ def select_os(d: Union[Message, CallbackQuery], data: dict):
 def get_name(call: CallbackQuery, data: dict):
     image_slug = data['image'][0]
 
+    if not _valid_choice(call, catalog.has_image, user_dict[call.from_user.id]['account']['token'],
+                         user_dict[call.from_user.id]['region_slug'], image_slug):
+        return
+
     user_dict[call.from_user.id].update({
         'image_slug': image_slug
     })
@@ -261,7 +299,9 @@ def get_name(call: CallbackQuery, data: dict):
 
     msg = bot.edit_message_text(
         text=f'{_t}'
-             '📝 Harap balas dengan Nama Instance, contoh: FighterTunnel\n\n'
+             '📝 Harap balas dengan Nama Instance, contoh: FighterTunnel\n'
+             f'Untuk banyak server, balas dengan jumlahnya (maks {MAX_BULK}) '
+             'atau daftar nama dipisah spasi/baris baru\n\n'
              '/back ⬅️ Sebelumnya',
         chat_id=call.from_user.id,
         message_id=call.message.message_id,
@@ -270,16 +310,55 @@ def get_name(call: CallbackQuery, data: dict):
     bot.register_next_step_handler(msg, ask_create)
 
 
+def _parse_names(text: str, prefix: str) -> List[str]:
+    """Nama server dari balasan: satu nama, jumlah server, atau daftar nama."""
+    tokens = text.split()
+    if len(tokens) == 1 and tokens[0].isdigit():
+        count = int(tokens[0])
+        if not 1 <= count <= MAX_BULK:
+            raise ValueError(f'Jumlah server harus 1 sampai {MAX_BULK}')
+        return [f'{prefix}-{i}' for i in range(1, count + 1)]
+    if len(tokens) <= 1:
+        return [text]
+
+    if len(tokens) > MAX_BULK:
+        raise ValueError(f'Maksimal {MAX_BULK} server sekaligus')
+    if len({token.lower() for token in tokens}) != len(tokens):
+        raise ValueError('Nama server tidak boleh sama')
+    for token in tokens:
+        if not BULK_NAME_PATTERN.match(token):
+            raise ValueError(f'Nama <code>{token}</code> hanya boleh berisi huruf, angka dan tanda -')
+    return tokens
+
+
 def ask_create(m: Message):
     if m.text == '/back':
         select_os(m, data={'size': [user_dict[m.from_user.id]["size_slug"]]})
         return
 
+    prefix = f'{user_dict[m.from_user.id]["image_slug"].split("-")[0]}-{user_dict[m.from_user.id]["region_slug"]}'
+    try:
+        names = _parse_names(m.text, prefix)
+    except ValueError as e:
+        msg = bot.send_message(
+            text=f'⚠️ {str(e)}\n\n'
+                 '📝 Harap balas lagi dengan Nama Instance\n\n'
+                 '/back ⬅️ Sebelumnya',
+            chat_id=m.from_user.id,
+            parse_mode='HTML'
+        )
+        bot.register_next_step_handler(msg, ask_create)
+        return
+
+    if len(names) > 1:
+        ask_create_bulk(m, names)
+        return
+
     _t = t + f'👤 Akun: <code>{user_dict[m.from_user.id]["account"]["email"]}</code>\n' \
              f'🌍 Wilayah: <code>{user_dict[m.from_user.id]["region_slug"]}</code>\n' \
              f'📏 Ukuran: <code>{user_dict[m.from_user.id]["size_slug"]}</code>\n' \
              f'🖼️ OS: <code>{user_dict[m.from_user.id]["image_slug"]}</code>\n' \
-             f'📝 Nama: <code>{m.text}</code>\n\n'
+             f'📝 Nama: <code>{names[0]}</code>\n\n'
     markup = InlineKeyboardMarkup(row_width=2)
     markup.add(
         InlineKeyboardButton(
@@ -294,7 +373,7 @@ def ask_create(m: Message):
     markup.row(
         InlineKeyboardButton(
             text='✅ Buat',
-            callback_data=f'create_droplet?nf=confirm_create&name={m.text}'
+            callback_data=f'create_droplet?nf=confirm_create&name={names[0]}'
         )
     )
 
@@ -306,6 +385,43 @@ def ask_create(m: Message):
     )
 
 
+def ask_create_bulk(m: Message, names: List[str]):
+    user_dict[m.from_user.id]['names'] = names
+
+    _t = t + f'👤 Akun: <code>{user_dict[m.from_user.id]["account"]["email"]}</code>\n' \
+             f'🌍 Wilayah: <code>{user_dict[m.from_user.id]["region_slug"]}</code>\n' \
+             f'📏 Ukuran: <code>{user_dict[m.from_user.id]["size_slug"]}</code>\n' \
+             f'🖼️ OS: <code>{user_dict[m.from_user.id]["image_slug"]}</code>\n' \
+             f'🔢 Jumlah: <code>{len(names)}</code> server\n' \
+             f'📝 Nama: <code>{", ".join(names)}</code>\n\n'
+    markup = InlineKeyboardMarkup(row_width=2)
+    markup.add(
+        InlineKeyboardButton(
+            text='⬅️ Sebelumnya',
+            callback_data=f'create_droplet?nf=get_name&image={user_dict[m.from_user.id]["image_slug"]}'
+        ),
+        InlineKeyboardButton(
+            text='❌ Membatalkan',
+            callback_data='create_droplet?nf=cancel_create'
+        ),
+    )
+    markup.row(
+        InlineKeyboardButton(
+            text=f'✅ Buat {len(names)} Server',
+            callback_data='create_droplet?nf=confirm_bulk'
+        )
+    )
+
+    chunks = split_message(_t)
+    for i, chunk in enumerate(chunks):
+        bot.send_message(
+            text=chunk,
+            chat_id=m.from_user.id,
+            reply_markup=markup if i == len(chunks) - 1 else None,
+            parse_mode='HTML'
+        )
+
+
 def cancel_create(call: CallbackQuery):
     bot.edit_message_text(
         text=f'{call.message.html_text}\n\n'
@@ -319,64 +435,171 @@ def cancel_create(call: CallbackQuery):
 def confirm_create(call: CallbackQuery, data: dict):
     droplet_name = data['name'][0]
     password = password_generator()
+    account = user_dict[call.from_user.id]['account']
+    header = call.message.html_text
+
+    def edit_order_message(text: str, markup: InlineKeyboardMarkup = None):
+        bot.edit_message_text(
+            text=text,
+            chat_id=call.from_user.id,
+            message_id=call.message.message_id,
+            reply_markup=markup,
+            parse_mode='HTML'
+        )
+
+    def on_ready(job: ProvisionJob):
+        markup = InlineKeyboardMarkup()
+        markup.row(
+            InlineKeyboardButton(
+                text='🔍 Periksa Detailnya',
+                callback_data=f'droplet_detail?'
+                              f'doc_id={account.doc_id}&'
+                              f'droplet_id={job.droplet.id}'
+            )
+        )
+        edit_order_message(
+            f'{header}\n\n'
+            f'{format_progress(job)}\n\n'
+            f'🌐 IP: <code>{job.droplet.ip_address}</code>\n'
+            f'🔑 Kata Sandi: <code>{password}</code>\n\n'
+            '<b>✅ Pembuatan Server Selesai</b>',
+            markup
+        )
+
+    def on_failed(job: ProvisionJob, e: Exception):
+        edit_order_message(
+            f'{header}\n\n'
+            '⚠️ Kesalahan saat membuat Instance: '
+            f'<code>{str(e)}</code>'
+        )
 
+    # Pembuatan berjalan di worker provisioning, handler langsung selesai
+    provisioner.submit(ProvisionJob(
+        account['token'],
+        {
+            'name': droplet_name,
+            'region': user_dict[call.from_user.id]['region_slug'],
+            'image': user_dict[call.from_user.id]['image_slug'],
+            'size_slug': user_dict[call.from_user.id]['size_slug'],
+            'user_data': set_root_password_script(password)
+        },
+        on_update=lambda job: edit_order_message(f'{header}\n\n{format_progress(job)}'),
+        on_ready=on_ready,
+        on_failed=on_failed
+    ))
+
+
+def confirm_bulk(call: CallbackQuery):
+    order = user_dict[call.from_user.id]
+    names = order.pop('names', None)
+    if not names:
+        # Tombol ditekan dua kali atau data sudah hilang
+        bot.answer_callback_query(
+            callback_query_id=call.id,
+            text='⚠️ Permintaan sudah diproses atau kedaluwarsa.',
+            show_alert=True
+        )
+        return
+
+    header = call.message.html_text
     bot.edit_message_text(
-        text=f'{call.message.html_text}\n\n'
-             '<b>🔄 Membuat Instance...</b>',
+        text=f'{header}\n\n'
+             f'🔄 Membuat {len(names)} server...',
         chat_id=call.from_user.id,
         message_id=call.message.message_id,
         parse_mode='HTML'
     )
+
+    # Pembuatan berjalan di thread sendiri agar worker Telegram tidak tertahan
+    threading.Thread(
+        target=_run_bulk,
+        args=(call.from_user.id, call.message.message_id, header, order['account'], names, {
+            'region': order['region_slug'],
+            'size': order['size_slug'],
+            'image': order['image_slug'],
+        }),
+        name='create_droplet_bulk',
+        daemon=True
+    ).start()
+
+
+def _run_bulk(chat_id: int, message_id: int, header: str, account, names: List[str], droplet_params: dict):
+    last_update = time.monotonic()
+
+    def show_progress(ready: int, total: int):
+        nonlocal last_update
+        if time.monotonic() - last_update < PROGRESS_INTERVAL or ready == total:
+            return
+        last_update = time.monotonic()
+        try:
+            bot.edit_message_text(
+                text=f'{header}\n\n'
+                     f'🔄 {ready}/{total} server mendapat IP...',
+                chat_id=chat_id,
+                message_id=message_id,
+                parse_mode='HTML'
+            )
+        except Exception:
+            pass
+
+    start = time.monotonic()
     try:
-        droplet = digitalocean.Droplet(
-            token=user_dict[call.from_user.id]['account']['token'],
-            name=droplet_name,
-            region=user_dict[call.from_user.id]['region_slug'],
-            image=user_dict[call.from_user.id]['image_slug'],
-            size_slug=user_dict[call.from_user.id]['size_slug'],
-            user_data=set_root_password_script(password)
-        )
-        droplet.create()
-
-        droplet_actions = droplet.get_actions()
-        for action in droplet_actions:
-            while action.status != 'completed':
-                sleep(3)
-                action.load()
-        droplet.load()
-
-        # Menunggu IP address siap
-        while not droplet.ip_address:
-            sleep(3)
-            droplet.load()
+        results = create_batch(account['token'], names, droplet_params, on_progress=show_progress)
     except Exception as e:
         bot.edit_message_text(
-            text=f'{call.message.html_text}\n\n'
+            text=f'{header}\n\n'
                  '⚠️ Kesalahan saat membuat Instance: '
                  f'<code>{str(e)}</code>',
-            chat_id=call.from_user.id,
-            message_id=call.message.message_id,
+            chat_id=chat_id,
+            message_id=message_id,
             parse_mode='HTML'
         )
         return
 
+    created = [result for result in results if result['error'] is None]
+    failed = [result for result in results if result['error'] is not None]
+
+    t = f'{header}\n\n'
+    if created:
+        t += f'✅ {len(created)} server selesai dalam {time.monotonic() - start:.0f} detik:\n' \
+             'Nama | IP | Kata Sandi\n'
+        for result in created:
+            t += f'<code>{result["name"]}</code> | <code>{result["ip"]}</code> | <code>{result["password"]}</code>\n'
+        t += '\n'
+    if failed:
+        t += f'⚠️ Gagal {len(failed)} server:\n'
+        for result in failed:
+            t += f'<code>{result["name"]}</code> | <code>{result["error"]}</code>\n'
+        orphaned = [result for result in failed if result['orphaned']]
+        if orphaned:
+            t += f'\n❗ {len(orphaned)} server gagal tidak bisa dihapus, hapus manual:\n'
+            for result in orphaned:
+                t += f'<code>{result["name"]}</code> | ID <code>{result["id"]}</code>\n'
+
     markup = InlineKeyboardMarkup()
     markup.row(
         InlineKeyboardButton(
-            text='🔍 Periksa Detailnya',
-            callback_data=f'droplet_detail?'
-                          f'doc_id={user_dict[call.from_user.id]["account"].doc_id}&'
-                          f'droplet_id={droplet.id}'
+            text='📋 Daftar Instance',
+            callback_data=f'list_droplets?doc_id={account.doc_id}'
         )
     )
 
-    bot.edit_message_text(
-        text=f'{call.message.html_text}\n'
-             f'🌐 IP: <code>{droplet.ip_address}</code>\n'
-             f'🔑 Kata Sandi: <code>{password}</code>\n\n'
-             '<b>✅ Pembuatan Server Selesai</b>',
-        chat_id=call.from_user.id,
-        reply_markup=markup,
-        message_id=call.message.message_id,
-        parse_mode='HTML'
-    )
+    # Tabel panjang dipecah; pesan pertama menggantikan pesan progres
+    chunks = split_message(t)
+    for i, chunk in enumerate(chunks):
+        reply_markup = markup if i == len(chunks) - 1 else None
+        if i == 0:
+            bot.edit_message_text(
+                text=chunk,
+                chat_id=chat_id,
+                message_id=message_id,
+                parse_mode='HTML',
+                reply_markup=reply_markup
+            )
+        else:
+            bot.send_message(
+                text=chunk,
+                chat_id=chat_id,
+                parse_mode='HTML',
+                reply_markup=reply_markup
+            )
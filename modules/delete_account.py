@@ -2,13 +2,20 @@ from telebot.types import CallbackQuery
 
 from _bot import bot
 from utils.db import AccountsDB
+from utils.do_client import clients
+from utils.placement import placement
 
 
 def delete_account(call: CallbackQuery, data: dict):
     doc_id = data['doc_id'][0]
 
     try:
-        AccountsDB().remove(doc_id=doc_id)
+        accounts_db = AccountsDB()
+        account = accounts_db.get(doc_id)
+        accounts_db.remove(doc_id=doc_id)
+        if account:
+            clients.close(account['token'])
+            placement.remove(account['token'])
     except Exception as e:
         bot.edit_message_text(
             text=f'{call.message.html_text}\n\n'
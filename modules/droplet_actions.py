@@ -4,6 +4,7 @@ import digitalocean
 
 from _bot import bot
 from utils.db import AccountsDB
+from utils.droplet_cache import droplet_cache
 
 
 def droplet_actions(call: CallbackQuery, data: dict):
@@ -13,10 +14,7 @@ def droplet_actions(call: CallbackQuery, data: dict):
 
     try:
         account = AccountsDB().get(doc_id=doc_id)
-        droplet = digitalocean.Droplet(
-            token=account['token'],
-            id=droplet_id
-        )
+        droplet = droplet_cache.get(account['token'], droplet_id)
     except Exception as e:
         bot.edit_message_text(
             text=f'⚠️ Kesalahan saat mengambil akun atau droplet: <code>{str(e)}</code>',
@@ -40,8 +38,8 @@ def delete(call: CallbackQuery, droplet: digitalocean.Droplet):
     )
 
     try:
-        droplet.load()
         droplet.destroy()
+        droplet_cache.invalidate(droplet.token, droplet.id)
     except Exception as e:
         bot.edit_message_text(
             text=f'⚠️ Kesalahan saat menghapus droplet: <code>{str(e)}</code>',
@@ -71,8 +69,8 @@ def shutdown(call: CallbackQuery, droplet: digitalocean.Droplet):
     )
 
     try:
-        droplet.load()
-        droplet.shutdown()
+        action = droplet.shutdown()
+        droplet_cache.mark_transitional(droplet.token, droplet.id, action)
     except Exception as e:
         bot.edit_message_text(
             text=f'⚠️ Kesalahan saat mematikan droplet: <code>{str(e)}</code>',
@@ -93,8 +91,8 @@ def reboot(call: CallbackQuery, droplet: digitalocean.Droplet):
     )
 
     try:
-        droplet.load()
-        droplet.reboot()
+        action = droplet.reboot()
+        droplet_cache.mark_transitional(droplet.token, droplet.id, action)
     except Exception as e:
         bot.edit_message_text(
             text=f'⚠️ Kesalahan saat merestart droplet: <code>{str(e)}</code>',
@@ -115,8 +113,8 @@ def power_on(call: CallbackQuery, droplet: digitalocean.Droplet):
     )
 
     try:
-        droplet.load()
-        droplet.power_on()
+        action = droplet.power_on()
+        droplet_cache.mark_transitional(droplet.token, droplet.id, action)
     except Exception as e:
         bot.edit_message_text(
             text=f'⚠️ Kesalahan saat menyalakan droplet: <code>{str(e)}</code>',
@@ -135,8 +133,8 @@ def rebuild(call: CallbackQuery, droplet: digitalocean.Droplet):
     )
 
     try:
-        droplet.load()
-        droplet.rebuild()
+        action = droplet.rebuild()
+        droplet_cache.mark_transitional(droplet.token, droplet.id, action)
 
     except Exception as e:
         bot.edit_message_text(
@@ -166,8 +164,8 @@ def reset_password(call: CallbackQuery, droplet: digitalocean.Droplet):
     )
 
     try:
-        droplet.load()
-        droplet.reset_root_password()
+        action = droplet.reset_root_password()
+        droplet_cache.mark_transitional(droplet.token, droplet.id, action)
     except Exception as e:
         bot.edit_message_text(
             text=f'⚠️ Kesalahan saat mereset password droplet: <code>{str(e)}</code>',
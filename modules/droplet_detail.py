@@ -4,10 +4,9 @@ from telebot.types import (
     InlineKeyboardButton,
 )
 
-import digitalocean
-
 from _bot import bot
 from utils.db import AccountsDB
+from utils.droplet_cache import droplet_cache
 from utils.localizer import localize_region
 
 
@@ -39,10 +38,7 @@ def droplet_detail(call: CallbackQuery, data: dict):
     )
 
     try:
-        droplet = digitalocean.Droplet().get_object(
-            api_token=account['token'],
-            droplet_id=droplet_id
-        )
+        droplet = droplet_cache.get(account['token'], droplet_id, refresh='refresh' in data)
     except Exception as e:
         bot.edit_message_text(
             text=f'{t}'
@@ -95,7 +91,7 @@ def droplet_detail(call: CallbackQuery, data: dict):
     markup.row(
         InlineKeyboardButton(
             text='🔄 Refresh',
-            callback_data=f'droplet_detail?doc_id={account.doc_id}&droplet_id={droplet_id}'
+            callback_data=f'droplet_detail?doc_id={account.doc_id}&droplet_id={droplet_id}&refresh=1'
         ),
         InlineKeyboardButton(
             text='🔙 Kembali',
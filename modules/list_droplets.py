@@ -4,10 +4,10 @@ from telebot.types import (
     InlineKeyboardButton,
 )
 
-import digitalocean
-
 from _bot import bot
 from utils.db import AccountsDB
+from utils.do_client import clients
+from utils.droplet_cache import droplet_cache
 from utils.localizer import localize_region
 
 
@@ -38,7 +38,8 @@ def list_droplets(call: CallbackQuery, data: dict):
     )
 
     try:
-        droplets = digitalocean.Manager(token=account['token']).get_all_droplets()
+        droplets = clients.manager(account['token']).get_all_droplets()
+        droplet_cache.put(account['token'], droplets)
     except Exception as e:
         bot.edit_message_text(
             text=f'{t}'
@@ -10,7 +10,7 @@ from telebot.types import (
 )
 
 from _bot import bot
-from modules.auth import check_auth, is_admin
+from modules.auth import check_auth, is_admin, get_user
 
 # Load config
 try:
@@ -130,8 +130,7 @@ def show_user_menu(d: Union[Message, CallbackQuery]):
     """Tampilkan menu untuk pengguna yang sudah terdaftar."""
     try:
         # Ambil data pengguna untuk menampilkan saldo
-        from utils.multiuser_db import UsersDB
-        user_data = UsersDB().get_by_id(d.from_user.id)
+        user_data = get_user(d.from_user.id)
         balance = user_data.get('balance', 0) if user_data else 0
         
         markup = InlineKeyboardMarkup(row_width=2)
@@ -146,7 +145,7 @@ def show_user_menu(d: Union[Message, CallbackQuery]):
             ),
             InlineKeyboardButton(
                 text='🚀 Auto Order VPS',
-                callback_data='auto_order?nf=select_account'
+                callback_data='auto_order?nf=select_region'
             ),
             InlineKeyboardButton(
                 text='🔍 Lihat VPS Saya',
@@ -223,6 +222,10 @@ def show_admin_menu(d: Union[Message, CallbackQuery]):
             InlineKeyboardButton(
                 text='💰 Edit Harga VPS',
                 callback_data='admin_tools?nf=show'
+            ),
+            InlineKeyboardButton(
+                text='🗄️ Penyimpanan',
+                callback_data='storage_admin?nf=show'
             )
         )
         
@@ -247,7 +250,8 @@ def show_admin_menu(d: Union[Message, CallbackQuery]):
             '/sett_do - Kelola akun\n' \
             '/bath_do - Uji batch akun\n' \
             '/add_vps - Buat droplets\n' \
-            '/sett_vps - Kelola droplets\n'
+            '/sett_vps - Kelola droplets\n' \
+            '/storage - Kompaksi & backup database\n'
         
         if multi_user_mode:
             t += '/wallet - Cek saldo dan top up\n' \
@@ -0,0 +1,185 @@
+from datetime import datetime
+from typing import Union
+
+from telebot.types import (
+    Message,
+    CallbackQuery,
+    InlineKeyboardMarkup,
+    InlineKeyboardButton,
+)
+
+from _bot import bot
+from modules.auth import user_cache_stats
+from utils.catalog import catalog
+from utils.db import AccountsDB, token_fingerprint
+from utils.do_client import clients
+from utils.droplet_cache import droplet_cache
+from utils.maintenance import compact_storage, last_results, snapshot_storage
+from utils.placement import placement
+from utils.provisioning import provisioner
+from utils.action_watcher import watcher
+from utils.warm_pool import warm_pool
+from utils.rate_limit import rate_limiter
+from utils.storage import SQLiteBackend, get_backend, writer_stats
+
+
+def _format_size(size: int) -> str:
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{size:.1f} GB'
+
+
+# Jumlah akun dengan anggaran API terendah yang ditampilkan
+BUDGET_ROWS = 10
+
+
+def _format_budgets() -> str:
+    budgets = []
+    for account in AccountsDB().all():
+        budget = rate_limiter.budget(token_fingerprint(account['token']))
+        if budget is not None:
+            budgets.append((budget['remaining'] / max(budget['limit'], 1), account['email'], budget))
+    if not budgets:
+        return 'Belum ada request ke API\n'
+
+    budgets.sort(key=lambda item: item[0])
+    t = ''
+    for _, email, budget in budgets[:BUDGET_ROWS]:
+        t += f'<code>{email}</code>: {budget["remaining"]}/{budget["limit"]} ' \
+             f'(reset {budget["reset_in"] / 60:.0f} menit, {budget["minute_tokens"]}/menit)\n'
+    if len(budgets) > BUDGET_ROWS:
+        t += f'... dan {len(budgets) - BUDGET_ROWS} akun lainnya\n'
+    return t
+
+
+def storage_admin(d: Union[Message, CallbackQuery], data: dict = None):
+    """Menu admin penyimpanan: ukuran, metrik writer, kompaksi dan snapshot."""
+    data = data or {}
+    next_func = data.get('nf', ['show'])[0]
+
+    if isinstance(d, Message):
+        msg = bot.send_message(
+            text='🔄 Memuat status penyimpanan...',
+            chat_id=d.from_user.id
+        )
+        message_id = msg.message_id
+    else:
+        message_id = d.message.message_id
+
+    t = '<b>🗄️ Penyimpanan</b>\n\n'
+
+    try:
+        if next_func == 'compact':
+            bot.edit_message_text(
+                text=f'{t}⏳ Kompaksi sedang berjalan...',
+                chat_id=d.from_user.id,
+                message_id=message_id,
+                parse_mode='HTML'
+            )
+            result = compact_storage()
+            if result.get('skipped'):
+                t += 'ℹ️ Kompaksi hanya untuk backend SQLite: file JSON/msgpack sudah ditulis ulang utuh setiap commit\n\n'
+            else:
+                t += f'✅ Kompaksi selesai dalam {result["duration"]:.2f} detik\n' \
+                     f'Ukuran: {_format_size(result["size_before"])} → {_format_size(result["size_after"])}\n\n'
+        elif next_func == 'snapshot':
+            bot.edit_message_text(
+                text=f'{t}⏳ Membuat snapshot...',
+                chat_id=d.from_user.id,
+                message_id=message_id,
+                parse_mode='HTML'
+            )
+            result = snapshot_storage()
+            t += f'✅ Snapshot selesai dalam {result["duration"]:.2f} detik\n' \
+                 f'File: <code>{result["path"]}</code> ({_format_size(result["size"])})\n\n'
+
+        backend = get_backend()
+        stats = writer_stats()
+        catalog_stats = catalog.stats()
+        droplet_stats = droplet_cache.stats()
+        user_stats = user_cache_stats()
+        client_stats = clients.stats()
+        provisioning_stats = provisioner.stats()
+        placement_stats = placement.stats()
+        warm_pool_stats = warm_pool.stats()
+        watcher_stats = watcher.stats()
+        rate_limit_stats = rate_limiter.stats()
+        budgets = _format_budgets()
+    except Exception as e:
+        bot.edit_message_text(
+            text=f'{t}⚠️ Kesalahan pada penyimpanan: <code>{str(e)}</code>',
+            chat_id=d.from_user.id,
+            message_id=message_id,
+            parse_mode='HTML'
+        )
+        return
+
+    t += f'Backend: <code>{type(backend).__name__}</code>\n' \
+         f'Ukuran: {_format_size(backend.size())}\n\n' \
+         f'<b>Writer</b>\n' \
+         f'Antrian: {stats["queue_depth"]} | Batch rata-rata: {stats["avg_batch"]:.1f} (maks {stats["max_batch"]})\n' \
+         f'Flush: {stats["avg_flush_ms"]:.2f} ms rata-rata, {stats["max_flush_ms"]:.2f} ms maks\n'
+
+    if not isinstance(backend, SQLiteBackend):
+        t += 'Kompaksi: tidak diperlukan, file ditulis ulang utuh setiap commit\n'
+    for key, label in (('compact', 'Kompaksi'), ('snapshot', 'Snapshot')):
+        if key in last_results:
+            finished_at = datetime.fromtimestamp(last_results[key]['finished_at'])
+            t += f'{label} terakhir: {finished_at.strftime("%d/%m/%Y %H:%M")}\n'
+
+    t += f'\n<b>Cache &amp; API DigitalOcean</b>\n' \
+         f'Pengguna: {user_stats["hit_rate"]:.0%} hit ({user_stats["hits"]}/{user_stats["hits"] + user_stats["misses"]}), ' \
+         f'{user_stats["size"]} tersimpan\n' \
+         f'Katalog: {catalog_stats["hit_rate"]:.0%} hit ({catalog_stats["hits"]}/{catalog_stats["hits"] + catalog_stats["misses"]}), ' \
+         f'{catalog_stats["loads"]} muat\n' \
+         f'Droplet: {droplet_stats["hit_rate"]:.0%} hit ({droplet_stats["hits"]}/{droplet_stats["hits"] + droplet_stats["misses"]}), ' \
+         f'{droplet_stats["loads"]} muat, {droplet_stats["bypasses"]} bypass, {droplet_stats["transitional"]} transisi\n' \
+         f'Koneksi: {client_stats["connections_reused"]} dipakai ulang, {client_stats["connections_created"]} baru ' \
+         f'({client_stats["sessions"]} sesi)\n' \
+         f'Provisioning: {provisioning_stats["queued"]} antrian, {provisioning_stats["running"]} berjalan, ' \
+         f'{provisioning_stats["completed"]} selesai, {provisioning_stats["failed"]} gagal\n' \
+         f'Penempatan: {placement_stats["healthy"]}/{placement_stats["accounts"]} akun sehat, ' \
+         f'{placement_stats["free_slots"]} slot kosong, {placement_stats["placed"]} order ditempatkan, ' \
+         f'{placement_stats["rejected"]} ditolak\n' \
+         f'Warm pool: {warm_pool_stats["ready"]} siap, {warm_pool_stats["filling"]} diisi, ' \
+         f'{warm_pool_stats["hit_rate"]:.0%} hit ({warm_pool_stats["hits"]}/{warm_pool_stats["hits"] + warm_pool_stats["misses"]}), ' \
+         f'jeda isi ulang {warm_pool_stats["avg_refill_lag"]:.0f} detik (maks {warm_pool_stats["max_refill_lag"]:.0f}), ' \
+         f'biaya menganggur ${warm_pool_stats["idle_cost"]:.2f}\n' \
+         f'Watcher aksi: {watcher_stats["watching"]} ditunggu di {watcher_stats["accounts"]} akun, ' \
+         f'{watcher_stats["api_calls"]} request untuk {watcher_stats["finished"]} aksi\n'
+
+    t += f'\n<b>Anggaran API per Akun</b>\n' \
+         f'{rate_limit_stats["waited"]} request menunggu, {rate_limit_stats["shed"]} ditolak, ' \
+         f'{rate_limit_stats["throttled"]} kena 429\n' \
+         f'{budgets}'
+
+    buttons = [
+        InlineKeyboardButton(
+            text='💾 Snapshot',
+            callback_data='storage_admin?nf=snapshot'
+        )
+    ]
+    if isinstance(backend, SQLiteBackend):
+        buttons.insert(0, InlineKeyboardButton(
+            text='🗜️ Kompaksi',
+            callback_data='storage_admin?nf=compact'
+        ))
+
+    markup = InlineKeyboardMarkup()
+    markup.row(*buttons)
+    markup.row(
+        InlineKeyboardButton(
+            text='⬅️ Kembali',
+            callback_data='start'
+        )
+    )
+
+    bot.edit_message_text(
+        text=t,
+        chat_id=d.from_user.id,
+        message_id=message_id,
+        parse_mode='HTML',
+        reply_markup=markup
+    )
@@ -1,4 +1,5 @@
-from typing import Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Union
 
 from telebot.types import (
     Message,
@@ -7,13 +8,16 @@ from telebot.types import (
     InlineKeyboardButton,
 )
 
-import digitalocean
-
 from _bot import bot
 from utils.db import AccountsDB
+from utils.do_client import clients
+from utils.droplet_cache import droplet_cache
 from utils.multiuser_db import UsersDB, UserDropletsDB
 from modules.register import check_auth
 
+# Jumlah akun DO yang diambil daftar droplet-nya bersamaan
+MAX_WORKERS = 4
+
 
 def user_droplets(d: Union[Message, CallbackQuery], data: dict = None):
     """Handle menu droplet pengguna."""
@@ -39,6 +43,57 @@ def user_droplets(d: Union[Message, CallbackQuery], data: dict = None):
         globals()[next_func](*args)
 
 
+def _account_doc_id(item: Dict[str, Any]):
+    # Entri disimpan dengan field 'doc_id'; 'account_doc_id' untuk data lama
+    return item.get('doc_id', item.get('account_doc_id'))
+
+
+def _fetch_account_droplets(token: str, droplet_ids: List[int]) -> Dict[int, Any]:
+    """Droplets of one account by id: cache, then one listing call, per-droplet fetches only for misses."""
+    droplets = droplet_cache.cached(token, droplet_ids)
+    missing = [droplet_id for droplet_id in droplet_ids if droplet_id not in droplets]
+
+    # Satu droplet cukup diambil langsung tanpa listing seluruh akun
+    if len(missing) > 1:
+        try:
+            listed = [droplet for droplet in clients.manager(token).get_all_droplets() if droplet.id in missing]
+            droplet_cache.put(token, listed)
+            droplets.update((droplet.id, droplet) for droplet in listed)
+        except Exception:
+            pass
+
+    for droplet_id in missing:
+        if droplet_id not in droplets:
+            try:
+                droplets[droplet_id] = droplet_cache.get(token, droplet_id)
+            except Exception:
+                droplets[droplet_id] = None
+    return droplets
+
+
+def fetch_user_droplets(user_droplets: List[Dict[str, Any]]) -> Dict[int, Any]:
+    """
+    Fetch the droplets of a user grouped by DO account, one account per
+    worker. Returns droplet_id -> droplet, or None when it could not be loaded.
+    """
+    accounts_db = AccountsDB()
+    by_account: Dict[int, List[int]] = {}
+    for item in user_droplets:
+        by_account.setdefault(_account_doc_id(item), []).append(int(item.get('droplet_id')))
+
+    droplets = {}
+    tasks = []
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='user_droplets') as pool:
+        for account_doc_id, droplet_ids in by_account.items():
+            account = accounts_db.get(account_doc_id) if account_doc_id is not None else None
+            if not account:
+                continue
+            tasks.append(pool.submit(_fetch_account_droplets, account['token'], droplet_ids))
+        for task in tasks:
+            droplets.update(task.result())
+    return droplets
+
+
 def show_droplets(d: Union[Message, CallbackQuery], data: dict = None):
     """Menampilkan daftar droplet milik pengguna."""
     user_id = d.from_user.id
@@ -51,7 +106,7 @@ def show_droplets(d: Union[Message, CallbackQuery], data: dict = None):
         markup.row(
             InlineKeyboardButton(
                 text='🚀 Order VPS Baru',
-                callback_data='auto_order?nf=select_account'
+                callback_data='auto_order?nf=select_region'
             )
         )
         markup.row(
@@ -88,48 +143,44 @@ def show_droplets(d: Union[Message, CallbackQuery], data: dict = None):
     # Siapkan markup
     markup = InlineKeyboardMarkup()
     
-    # Ambil detail masing-masing droplet
+    # Ambil detail semua droplet, dikelompokkan per akun
+    droplets = fetch_user_droplets(user_droplets)
+    
     for item in user_droplets:
-        account_doc_id = item.get('account_doc_id')
-        droplet_id = item.get('droplet_id')
+        account_doc_id = _account_doc_id(item)
+        droplet_id = int(item.get('droplet_id'))
         
-        account = AccountsDB().get(doc_id=account_doc_id)
-        if not account:
+        if droplet_id not in droplets:
             continue
         
-        try:
-            # Ambil informasi droplet dari DigitalOcean API
-            droplet = digitalocean.Droplet.get_object(
-                api_token=account['token'],
-                droplet_id=droplet_id
-            )
-            
-            # Tambahkan ke pesan
-            status_emoji = '🟢' if droplet.status == 'active' else '🔴'
-            msg += f'{status_emoji} <b>{droplet.name}</b>\n' \
-                   f'IP: <code>{droplet.ip_address}</code>\n' \
-                   f'Status: {droplet.status}\n' \
-                   f'Region: {droplet.region["name"]}\n' \
-                   f'Size: {droplet.size_slug}\n\n'
-            
-            # Tambahkan tombol aksi
-            markup.add(
-                InlineKeyboardButton(
-                    text=f'🔧 {droplet.name}',
-                    callback_data=f'user_droplet_action?doc_id={account_doc_id}&droplet_id={droplet_id}'
-                )
-            )
-            
-        except Exception:
+        droplet = droplets[droplet_id]
+        if droplet is None:
             # Jika gagal mengambil detail droplet, tampilkan pesan sederhana
             msg += f'❓ <b>Droplet #{droplet_id}</b>\n' \
                    f'Status: Tidak dapat mengambil detail\n\n'
+            continue
+        
+        # Tambahkan ke pesan
+        status_emoji = '🟢' if droplet.status == 'active' else '🔴'
+        msg += f'{status_emoji} <b>{droplet.name}</b>\n' \
+               f'IP: <code>{droplet.ip_address}</code>\n' \
+               f'Status: {droplet.status}\n' \
+               f'Region: {droplet.region["name"]}\n' \
+               f'Size: {droplet.size_slug}\n\n'
+        
+        # Tambahkan tombol aksi
+        markup.add(
+            InlineKeyboardButton(
+                text=f'🔧 {droplet.name}',
+                callback_data=f'user_droplet_action?doc_id={account_doc_id}&droplet_id={droplet_id}'
+            )
+        )
     
     # Tambahkan tombol kembali dan order baru
     markup.row(
         InlineKeyboardButton(
             text='🚀 Order VPS Baru',
-            callback_data='auto_order?nf=select_account'
+            callback_data='auto_order?nf=select_region'
         )
     )
     markup.row(
@@ -174,10 +225,7 @@ def user_droplet_action(call: CallbackQuery, data: dict):
     
     try:
         # Ambil informasi droplet dari DigitalOcean API
-        droplet = digitalocean.Droplet.get_object(
-            api_token=account['token'],
-            droplet_id=droplet_id
-        )
+        droplet = droplet_cache.get(account['token'], droplet_id)
         
         # Siapkan pesan
         msg = f'🔧 <b>Aksi untuk {droplet.name}</b>\n\n' \
@@ -272,27 +320,27 @@ def user_droplet_control(call: CallbackQuery, data: dict):
         return
     
     try:
-        droplet = digitalocean.Droplet.get_object(
-            api_token=account['token'],
-            droplet_id=droplet_id
-        )
+        droplet = droplet_cache.get(account['token'], droplet_id)
         
         # Jalankan aksi berdasarkan permintaan
         if action == 'reboot':
             # Reboot droplet
-            droplet.reboot()
+            result = droplet.reboot()
+            droplet_cache.mark_transitional(account['token'], droplet_id, result)
             action_name = 'Reboot'
             success_msg = 'VPS sedang direstart.'
         
         elif action == 'power_off':
             # Power off droplet
-            droplet.power_off()
+            result = droplet.power_off()
+            droplet_cache.mark_transitional(account['token'], droplet_id, result)
             action_name = 'Power Off'
             success_msg = 'VPS dimatikan.'
         
         elif action == 'power_on':
             # Power on droplet
-            droplet.power_on()
+            result = droplet.power_on()
+            droplet_cache.mark_transitional(account['token'], droplet_id, result)
             action_name = 'Power On'
             success_msg = 'VPS dinyalakan.'
         
@@ -379,14 +427,12 @@ def user_droplet_confirm_delete(call: CallbackQuery, data: dict):
     
     try:
         # Ambil informasi droplet sebelum dihapus
-        droplet = digitalocean.Droplet.get_object(
-            api_token=account['token'],
-            droplet_id=droplet_id
-        )
+        droplet = droplet_cache.get(account['token'], droplet_id)
         droplet_name = droplet.name
         
         # Hapus droplet
         droplet.destroy()
+        droplet_cache.invalidate(account['token'], droplet_id)
         
         # Hapus dari database pengguna
         UserDropletsDB().remove(user_id, droplet_id)
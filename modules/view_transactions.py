@@ -0,0 +1,80 @@
+from datetime import datetime
+
+from telebot.types import (
+    CallbackQuery,
+    InlineKeyboardMarkup,
+    InlineKeyboardButton,
+)
+
+from _bot import bot
+from utils.multiuser_db import LedgerDB
+
+PAGE_SIZE = 15
+
+
+def view_transactions(call: CallbackQuery, data: dict = None):
+    """Laporan admin: transaksi terbaru semua pengguna dari ledger."""
+    data = data or {}
+    t = '<b>💳 Transaksi Pengguna</b>\n\n'
+
+    try:
+        entries, older, newer = LedgerDB().history(
+            None,
+            limit=PAGE_SIZE,
+            before=data.get('before', [None])[0],
+            after=data.get('after', [None])[0]
+        )
+    except Exception as e:
+        bot.edit_message_text(
+            text=f'{t}'
+                 '⚠️ Kesalahan saat mengambil transaksi: '
+                 f'<code>{str(e)}</code>',
+            chat_id=call.from_user.id,
+            message_id=call.message.message_id,
+            parse_mode='HTML'
+        )
+        return
+
+    if not entries:
+        t += 'Belum ada transaksi.'
+
+    for entry in entries:
+        entry_time = datetime.fromtimestamp(entry.get('timestamp', 0))
+        amount = entry.get('amount', 0)
+        t += f'📅 {entry_time.strftime("%d/%m/%Y %H:%M")} | ' \
+             f'👤 <code>{entry.get("user_id")}</code>\n' \
+             f'💰 {"-" if amount < 0 else "+"}Rp {abs(amount):,.0f} ' \
+             f'({entry.get("type", "")}, {entry.get("status", "")})\n\n'
+
+    markup = InlineKeyboardMarkup()
+    page_buttons = []
+    if newer:
+        page_buttons.append(
+            InlineKeyboardButton(
+                text='⏪ Lebih Baru',
+                callback_data=f'view_transactions?after={newer}'
+            )
+        )
+    if older:
+        page_buttons.append(
+            InlineKeyboardButton(
+                text='Lebih Lama ⏩',
+                callback_data=f'view_transactions?before={older}'
+            )
+        )
+    if page_buttons:
+        markup.row(*page_buttons)
+    markup.row(
+        InlineKeyboardButton(
+            text='⬅️ Kembali',
+            callback_data='start'
+        )
+    )
+
+    bot.edit_message_text(
+        text=t,
+        chat_id=call.from_user.id,
+        message_id=call.message.message_id,
+        parse_mode='HTML',
+        reply_markup=markup
+    )
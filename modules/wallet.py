@@ -12,7 +12,7 @@ from telebot.types import (
 )
 
 from _bot import bot
-from utils.multiuser_db import UsersDB
+from utils.multiuser_db import UsersDB, LedgerDB
 from modules.auth import check_auth
 from modules.payment_gateway import create_payment, check_payment_status, register_payment_callback
 
@@ -24,7 +24,11 @@ def wallet(d: Union[Message, CallbackQuery], data: dict = None) -> None:
     if next_func == 'show_wallet':
         show_wallet(d)
     elif next_func == 'show_history':
-        show_history(d)
+        show_history(
+            d,
+            before=data.get('before', [None])[0],
+            after=data.get('after', [None])[0]
+        )
     elif next_func == 'topup':
         handle_topup(d)
     elif next_func == 'topup_options':
@@ -86,13 +90,19 @@ def show_wallet(d: Union[Message, CallbackQuery]) -> None:
             text=f'❌ Terjadi kesalahan: {str(e)}'
         )
 
-def show_history(d: Union[Message, CallbackQuery]):
-    """Show transaction history."""
+HISTORY_PAGE_SIZE = 10
+
+def show_history(d: Union[Message, CallbackQuery], before: str = None, after: str = None):
+    """Show transaction history, paginated with ledger cursors."""
     user_id = d.from_user.id
     
     try:
-        db = UsersDB()
-        transactions = db.get_transactions(user_id, limit=10)
+        transactions, older, newer = LedgerDB().history(
+            user_id,
+            limit=HISTORY_PAGE_SIZE,
+            before=before,
+            after=after
+        )
         
         if not transactions:
             t = '<b>📋 Riwayat Transaksi</b>\n\n' \
@@ -104,15 +114,32 @@ def show_history(d: Union[Message, CallbackQuery]):
                 tx_type = tx.get('type', '')
                 tx_amount = tx.get('amount', 0)
                 tx_status = tx.get('status', '')
-                tx_ref = tx.get('ref', '')
+                tx_ref = tx.get('ref') or tx.get('details') or '-'
                 
                 t += f'📅 {tx_time.strftime("%d/%m/%Y %H:%M")}\n' \
-                     f'💰 {"+" if tx_type == "topup" else "-"}Rp {tx_amount:,.0f}\n' \
+                     f'💰 {"-" if tx_amount < 0 else "+"}Rp {abs(tx_amount):,.0f} ({tx_type})\n' \
                      f'📝 Status: {tx_status}\n' \
                      f'🔗 Ref: {tx_ref}\n' \
                      f'{"─" * 20}\n\n'
         
         markup = InlineKeyboardMarkup()
+        page_buttons = []
+        if newer:
+            page_buttons.append(
+                InlineKeyboardButton(
+                    text='⏪ Lebih Baru',
+                    callback_data=f'wallet?nf=show_history&after={newer}'
+                )
+            )
+        if older:
+            page_buttons.append(
+                InlineKeyboardButton(
+                    text='Lebih Lama ⏩',
+                    callback_data=f'wallet?nf=show_history&before={older}'
+                )
+            )
+        if page_buttons:
+            markup.row(*page_buttons)
         markup.row(
             InlineKeyboardButton(
                 text='⬅️ Kembali ke Wallet',
@@ -264,21 +291,15 @@ def process_topup(d: Union[Message, CallbackQuery], amount: int):
 def handle_payment_success(payment_data: Dict[str, Any], user_id: int, message_id: int) -> None:
     """Handle successful payment notification."""
     try:
-        db = UsersDB()
-        
-        # Update balance
-        new_balance = db.update_balance(user_id, payment_data['amount'])
-        
-        # Add transaction to history
-        transaction = {
-            'type': 'topup',
-            'amount': payment_data['amount'],
-            'status': 'success',
-            'ref': payment_data['payment_details']['ref'],
-            'bank': payment_data['payment_details']['bank'],
-            'buyer': payment_data['payment_details']['buyer']
-        }
-        db.add_transaction(user_id, transaction)
+        # Update balance and add transaction to history in one ledger write
+        new_balance = LedgerDB().record(
+            user_id,
+            payment_data['amount'],
+            'topup',
+            ref=payment_data['payment_details']['ref'],
+            bank=payment_data['payment_details']['bank'],
+            buyer=payment_data['payment_details']['buyer']
+        )
         
         # Create success message
         t = f'<b>✅ Pembayaran Berhasil!</b>\n\n' \
@@ -0,0 +1,217 @@
+"""
+Satu watcher untuk semua aksi DigitalOcean yang sedang ditunggu.
+
+Provisioning dan aksi power mendaftarkan ID aksi beserta callback. Watcher
+memeriksa setiap akun dengan satu request ke daftar aksi terbaru (aksi lama
+yang tidak ada di halaman itu diambil satu per satu), lalu menjadwalkan
+pemeriksaan berikutnya dengan exponential backoff dan jitter. Callback
+dipanggil dengan data aksi begitu statusnya ``completed`` atau ``errored``.
+"""
+import json
+import time
+import random
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from digitalocean import NotFoundError
+
+from utils.db import token_fingerprint
+from utils.do_client import clients
+
+logger = logging.getLogger('action_watcher')
+
+DEFAULT_ACTION_WATCHER_CONFIG: Dict[str, Any] = {
+    'MIN_INTERVAL': 2,
+    'MAX_INTERVAL': 30,
+    'BACKOFF': 1.5,
+    'JITTER': 0.2,
+    # Jumlah aksi terbaru yang diambil per request
+    'PAGE_SIZE': 50,
+}
+
+FINISHED = ('completed', 'errored')
+
+
+def load_action_watcher_config() -> Dict[str, Any]:
+    """Load the ACTION_WATCHER section of config.json, falling back to defaults."""
+    action_watcher_config = dict(DEFAULT_ACTION_WATCHER_CONFIG)
+    try:
+        with open('config.json', 'r') as f:
+            config = json.load(f)
+        action_watcher_config.update(config.get('BOT', {}).get('ACTION_WATCHER', {}))
+    except Exception as e:
+        logger.warning(f"Using default action watcher configuration: {str(e)}")
+    return action_watcher_config
+
+
+ACTION_WATCHER_CONFIG = load_action_watcher_config()
+
+
+class _Account:
+    __slots__ = ('token', 'actions', 'interval', 'next_poll')
+
+    def __init__(self, token: str, interval: float):
+        self.token = token
+        self.actions: Dict[int, List[Callable[[Dict[str, Any]], None]]] = {}
+        self.interval = interval
+        self.next_poll = time.monotonic() + interval
+
+
+class ActionWatcher:
+    """Polls in-flight actions per account on one thread."""
+
+    def __init__(self, min_interval: float = 2, max_interval: float = 30,
+                 backoff: float = 1.5, jitter: float = 0.2, page_size: int = 50):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.page_size = page_size
+        self._accounts: Dict[str, _Account] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+        # Metrik
+        self.polls = 0
+        self.api_calls = 0
+        self.finished = 0
+        self.errors = 0
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='action_watcher', daemon=True)
+                self._thread.start()
+
+    def watch(self, token: str, action_id: int, callback: Callable[[Dict[str, Any]], None]) -> None:
+        """Call ``callback(action)`` once the action is completed or errored."""
+        self.start()
+        fingerprint = token_fingerprint(token)
+        with self._cond:
+            account = self._accounts.get(fingerprint)
+            if account is None:
+                account = self._accounts[fingerprint] = _Account(token, self.min_interval)
+            else:
+                # Aksi baru: periksa akun ini lagi dengan interval minimum
+                account.interval = self.min_interval
+                account.next_poll = min(account.next_poll, time.monotonic() + self.min_interval)
+            account.actions.setdefault(int(action_id), []).append(callback)
+            self._cond.notify()
+
+    def wait(self, token: str, action_id: int, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Block until the action finishes and return it; raises on timeout."""
+        done = threading.Event()
+        result: Dict[str, Any] = {}
+
+        def finished(action: Dict[str, Any]):
+            result.update(action)
+            done.set()
+
+        self.watch(token, action_id, finished)
+        if not done.wait(timeout):
+            self.unwatch(token, action_id, finished)
+            raise Exception(f'Waktu tunggu aksi {action_id} habis')
+        return result
+
+    def unwatch(self, token: str, action_id: int, callback: Callable[[Dict[str, Any]], None]) -> None:
+        with self._cond:
+            account = self._accounts.get(token_fingerprint(token))
+            if account is None:
+                return
+            callbacks = account.actions.get(int(action_id), [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+            if not callbacks:
+                account.actions.pop(int(action_id), None)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                due = [account for account in self._accounts.values() if account.next_poll <= now]
+                if not due:
+                    next_poll = min((account.next_poll for account in self._accounts.values()), default=None)
+                    self._cond.wait(None if next_poll is None else next_poll - now)
+                    continue
+
+            for account in due:
+                try:
+                    self._poll(account)
+                except Exception as e:
+                    self.errors += 1
+                    logger.error(f"Error polling actions: {str(e)}")
+                    self._schedule(account, progressed=False)
+
+    def _fetch(self, account: _Account, action_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Current state of ``action_ids``: one listing call, single lookups for older actions."""
+        manager = clients.manager(account.token)
+        # Dengan 'page' diisi python-digitalocean tidak mengambil halaman berikutnya
+        data = manager.get_data('actions/', params={'page': 1, 'per_page': self.page_size})
+        self.api_calls += 1
+        actions = {action['id']: action for action in data.get('actions', []) if action['id'] in action_ids}
+
+        for action_id in action_ids:
+            if action_id not in actions:
+                self.api_calls += 1
+                try:
+                    actions[action_id] = manager.get_data(f'actions/{action_id}')['action']
+                except NotFoundError:
+                    actions[action_id] = {'id': action_id, 'status': 'errored'}
+        return actions
+
+    def _poll(self, account: _Account) -> None:
+        with self._cond:
+            action_ids = list(account.actions)
+        self.polls += 1
+
+        finished = []
+        for action_id, action in self._fetch(account, action_ids).items():
+            if action.get('status') in FINISHED:
+                with self._cond:
+                    callbacks = account.actions.pop(action_id, [])
+                finished.append((action, callbacks))
+
+        for action, callbacks in finished:
+            self.finished += 1
+            for callback in callbacks:
+                try:
+                    callback(action)
+                except Exception as e:
+                    logger.error(f"Error in action callback: {str(e)}")
+
+        self._schedule(account, progressed=bool(finished))
+
+    def _schedule(self, account: _Account, progressed: bool) -> None:
+        with self._cond:
+            if not account.actions:
+                self._accounts.pop(token_fingerprint(account.token), None)
+                return
+            if progressed:
+                account.interval = self.min_interval
+            else:
+                account.interval = min(account.interval * self.backoff, self.max_interval)
+            jitter = random.uniform(1 - self.jitter, 1 + self.jitter)
+            account.next_poll = time.monotonic() + account.interval * jitter
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            watching = sum(len(account.actions) for account in self._accounts.values())
+            accounts = len(self._accounts)
+        return {
+            'watching': watching,
+            'accounts': accounts,
+            'polls': self.polls,
+            'api_calls': self.api_calls,
+            'finished': self.finished,
+            'errors': self.errors,
+        }
+
+
+watcher = ActionWatcher(
+    min_interval=float(ACTION_WATCHER_CONFIG.get('MIN_INTERVAL', 2)),
+    max_interval=float(ACTION_WATCHER_CONFIG.get('MAX_INTERVAL', 30)),
+    backoff=float(ACTION_WATCHER_CONFIG.get('BACKOFF', 1.5)),
+    jitter=float(ACTION_WATCHER_CONFIG.get('JITTER', 0.2)),
+    page_size=int(ACTION_WATCHER_CONFIG.get('PAGE_SIZE', 50))
+)
@@ -0,0 +1,303 @@
+"""
+Cache katalog DigitalOcean (region, ukuran, image distro) per akun.
+
+Saat dimuat, setiap katalog langsung diindeks (ukuran per region, image per
+region dan distribusi, semua per slug) sehingga handler wizard cukup melakukan
+lookup, dan indeks yang sama dipakai untuk memvalidasi parameter callback.
+
+Data dianggap segar selama ``TTL`` detik. Setelah itu data lama tetap
+dikembalikan sambil dimuat ulang di background, sampai ``MAX_STALE`` detik;
+lebih dari itu pemanggil menunggu data baru. Permintaan bersamaan untuk key
+yang sama hanya memicu satu request ke API (single-flight).
+"""
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import digitalocean
+
+from utils.cache import TTLCache
+from utils.db import AccountsDB, token_fingerprint
+from utils.do_client import clients
+from utils.rate_limit import rate_limiter
+
+logger = logging.getLogger('catalog')
+
+DEFAULT_CATALOG_CONFIG: Dict[str, Any] = {
+    'TTL': 600,
+    'MAX_STALE': 3600,
+    # Pre-warm saat start dan refresh terjadwal semua akun (detik, 0 = nonaktif)
+    'REFRESH_INTERVAL': 540,
+    'WARMUP_WORKERS': 4,
+}
+
+
+def load_catalog_config() -> Dict[str, Any]:
+    """Load the CATALOG section of config.json, falling back to defaults."""
+    catalog_config = dict(DEFAULT_CATALOG_CONFIG)
+    try:
+        with open('config.json', 'r') as f:
+            config = json.load(f)
+        catalog_config.update(config.get('BOT', {}).get('CATALOG', {}))
+    except Exception as e:
+        logger.warning(f"Using default catalog configuration: {str(e)}")
+    return catalog_config
+
+
+CATALOG_CONFIG = load_catalog_config()
+
+# Distribusi yang ditawarkan di wizard order
+DISTRIBUTIONS = ('Ubuntu', 'CentOS', 'Debian')
+
+
+def index_regions(regions: list) -> Dict[str, Any]:
+    available = [region for region in regions if region.available]
+    return {
+        'items': regions,
+        'available': available,
+        'by_slug': {region.slug: region for region in available},
+    }
+
+
+def index_sizes(sizes: list) -> Dict[str, Any]:
+    by_region: Dict[str, list] = {}
+    for size in sizes:
+        for region_slug in size.regions:
+            by_region.setdefault(region_slug, []).append(size)
+    return {
+        'items': sizes,
+        'by_region': by_region,
+        'by_slug': {size.slug: size for size in sizes},
+    }
+
+
+def index_images(images: list) -> Dict[str, Any]:
+    by_region: Dict[str, Dict[str, list]] = {}
+    for image in images:
+        if not image.public or image.status != 'available':
+            continue
+        for region_slug in image.regions:
+            by_region.setdefault(region_slug, {}).setdefault(image.distribution, []).append(image)
+    return {
+        'items': images,
+        'by_region': by_region,
+        'by_slug': {image.slug: image for image in images if image.slug},
+    }
+
+
+class _Flight:
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class CatalogService:
+    """Per-account catalog with stale-while-revalidate and single-flight loads."""
+
+    LOADERS: Dict[str, Callable[[digitalocean.Manager], Any]] = {
+        'regions': lambda manager: manager.get_all_regions(),
+        'sizes': lambda manager: manager.get_all_sizes(),
+        'images': lambda manager: manager.get_distro_images(),
+    }
+    INDEXERS: Dict[str, Callable[[list], Dict[str, Any]]] = {
+        'regions': index_regions,
+        'sizes': index_sizes,
+        'images': index_images,
+    }
+
+    def __init__(self, ttl: float = 600, max_stale: float = 3600, maxsize: int = 1024):
+        self.ttl = ttl
+        self._cache = TTLCache(maxsize=maxsize, ttl=max(ttl, max_stale))
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+
+        # Metrik
+        self.loads = 0
+        self.background_refreshes = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def regions(self, token: str) -> list:
+        return self.get(token, 'regions')['items']
+
+    def sizes(self, token: str) -> list:
+        return self.get(token, 'sizes')['items']
+
+    def images(self, token: str) -> list:
+        return self.get(token, 'images')['items']
+
+    def available_regions(self, token: str) -> list:
+        return self.get(token, 'regions')['available']
+
+    def sizes_in_region(self, token: str, region_slug: str) -> list:
+        return self.get(token, 'sizes')['by_region'].get(region_slug, [])
+
+    def images_in_region(self, token: str, region_slug: str,
+                         distributions: Iterable[str] = DISTRIBUTIONS) -> List[Any]:
+        """Public, available images of ``distributions`` in a region, grouped by distribution."""
+        by_distribution = self.get(token, 'images')['by_region'].get(region_slug, {})
+        return [image for distribution in distributions for image in by_distribution.get(distribution, [])]
+
+    def has_region(self, token: str, region_slug: str) -> bool:
+        return region_slug in self.get(token, 'regions')['by_slug']
+
+    def has_size(self, token: str, region_slug: str, size_slug: str) -> bool:
+        size = self.get(token, 'sizes')['by_slug'].get(size_slug)
+        return size is not None and region_slug in size.regions
+
+    def has_image(self, token: str, region_slug: str, image_slug: str,
+                  distributions: Iterable[str] = DISTRIBUTIONS) -> bool:
+        image = self.get(token, 'images')['by_slug'].get(image_slug)
+        return image is not None \
+            and image.public \
+            and image.status == 'available' \
+            and image.distribution in distributions \
+            and region_slug in image.regions
+
+    def get(self, token: str, kind: str, refresh: bool = False) -> Dict[str, Any]:
+        """Return the indexed ``kind`` catalog of an account, loading it when missing or too old."""
+        key = (token_fingerprint(token), kind)
+        entry = None if refresh else self._cache.get(key)
+        if entry is not None:
+            loaded_at, value = entry
+            if time.monotonic() - loaded_at > self.ttl:
+                self._refresh_in_background(key, token, kind)
+            return value
+        return self._load(key, token, kind)
+
+    def _begin(self, key: Hashable) -> Tuple[_Flight, bool]:
+        with self._lock:
+            flight = self._inflight.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self._inflight[key] = _Flight()
+            return flight, True
+
+    def _run(self, key: Hashable, flight: _Flight, token: str, kind: str) -> None:
+        start = time.perf_counter()
+        try:
+            flight.value = self.INDEXERS[kind](self.LOADERS[kind](clients.manager(token)))
+            self._cache.set(key, (time.monotonic(), flight.value))
+            self.loads += 1
+            logger.info(f"Loaded {kind} catalog in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            flight.error = e
+            self.errors += 1
+            logger.error(f"Error loading {kind} catalog: {str(e)}")
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def _run_low_priority(self, key: Hashable, flight: _Flight, token: str, kind: str) -> None:
+        with rate_limiter.low_priority():
+            self._run(key, flight, token, kind)
+
+    def _load(self, key: Hashable, token: str, kind: str) -> Any:
+        flight, leader = self._begin(key)
+        if leader:
+            self._run(key, flight, token, kind)
+        else:
+            self.coalesced += 1
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def _refresh_in_background(self, key: Hashable, token: str, kind: str) -> None:
+        flight, leader = self._begin(key)
+        if not leader:
+            return
+        self.background_refreshes += 1
+        threading.Thread(
+            target=self._run_low_priority,
+            args=(key, flight, token, kind),
+            name='catalog_refresh',
+            daemon=True
+        ).start()
+
+    def warm_account(self, account: Dict[str, Any]) -> float:
+        """Reload every catalog of one account; returns the elapsed seconds."""
+        start = time.perf_counter()
+        with rate_limiter.low_priority():
+            for kind in self.LOADERS:
+                self.get(account['token'], kind, refresh=True)
+        return time.perf_counter() - start
+
+    def warm_up(self, accounts: Optional[list] = None, max_workers: int = 4) -> Dict[str, Optional[float]]:
+        """
+        Load the catalogs of every account concurrently with a bounded pool.
+
+        Returns the warm-up time per account email (None when it failed).
+        """
+        accounts = AccountsDB().all() if accounts is None else accounts
+        if not accounts:
+            return {}
+
+        start = time.perf_counter()
+        timings: Dict[str, Optional[float]] = {}
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='catalog_warmup') as pool:
+            futures = {pool.submit(self.warm_account, account): account for account in accounts}
+            for future, account in futures.items():
+                email = account.get('email', str(account.doc_id))
+                try:
+                    timings[email] = future.result()
+                    logger.info(f"Warmed catalog for {email} in {timings[email]:.2f}s")
+                except Exception as e:
+                    timings[email] = None
+                    logger.error(f"Catalog warm-up failed for {email}: {str(e)}")
+
+        logger.info(f"Catalog warm-up of {len(accounts)} accounts took {time.perf_counter() - start:.2f}s")
+        return timings
+
+    def invalidate(self, token: Optional[str] = None) -> None:
+        """Drop the cached catalogs of one account, or of every account."""
+        if token is None:
+            self._cache.clear()
+            return
+        for kind in self.LOADERS:
+            self._cache.invalidate((token_fingerprint(token), kind))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._cache.stats(),
+            'loads': self.loads,
+            'background_refreshes': self.background_refreshes,
+            'coalesced': self.coalesced,
+            'errors': self.errors,
+        }
+
+
+catalog = CatalogService(
+    ttl=float(CATALOG_CONFIG.get('TTL', 600)),
+    max_stale=float(CATALOG_CONFIG.get('MAX_STALE', 3600))
+)
+
+
+def start_catalog_scheduler() -> Optional[threading.Thread]:
+    """Warm every account's catalog now, then refresh it every REFRESH_INTERVAL seconds."""
+    interval = float(CATALOG_CONFIG.get('REFRESH_INTERVAL', 540))
+    max_workers = int(CATALOG_CONFIG.get('WARMUP_WORKERS', 4))
+    if interval <= 0:
+        logger.info("Catalog warm-up disabled")
+        return None
+
+    def refresh_task():
+        while True:
+            try:
+                catalog.warm_up(max_workers=max_workers)
+            except Exception as e:
+                logger.error(f"Error in catalog refresh: {str(e)}")
+            finally:
+                time.sleep(interval)
+
+    refresh_thread = threading.Thread(target=refresh_task, name="catalog_refresh")
+    refresh_thread.daemon = True
+    refresh_thread.start()
+    return refresh_thread
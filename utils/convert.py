@@ -0,0 +1,149 @@
+"""
+Konversi file database TinyDB antara JSON dan msgpack (dua arah).
+
+File sumber dibiarkan apa adanya. Format terakhir hasil konversi dicatat di
+``_meta`` (kedua format), jadi konversi hanya berjalan saat format yang
+dikonfigurasi berubah; file lama yang dipulihkan atau disalin tidak pernah
+menimpa data aktif. Tanpa catatan (instalasi lama) hanya file tujuan yang
+belum ada atau kosong yang ditulis, kecuali dengan ``--force``.
+
+Jalankan manual dengan:  python -m utils.convert msgpack|json [direktori] [--force]
+"""
+import os
+import sys
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from utils.storage import (
+    LEGACY_JSON_LAYOUT,
+    MSGPACK_MAGIC,
+    SHARD_KEYS,
+    decode_msgpack,
+    encode_msgpack,
+    msgpack,
+)
+
+logger = logging.getLogger('storage')
+
+EXTENSIONS = {'json': '.json', 'msgpack': '.msgpack'}
+FILE_FORMAT_KEY = 'file_format'
+
+
+def read_tinydb_file(path: str) -> Dict[str, Any]:
+    """Read a TinyDB file in either format, detected from the msgpack header."""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if not raw:
+        return {}
+    if raw.startswith(MSGPACK_MAGIC):
+        return decode_msgpack(raw)
+    return json.loads(raw.decode('utf-8'))
+
+
+def write_tinydb_file(path: str, data: Dict[str, Any], file_format: str) -> None:
+    """Write ``data`` in ``file_format`` through a temp file and an atomic rename."""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(encode_msgpack(data) if file_format == 'msgpack' else json.dumps(data).encode('utf-8'))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def table_files(directory: str, file_format: str) -> List[str]:
+    """Paths (without extension) of every bot table file in ``directory``."""
+    names = [os.path.splitext(file_name)[0] for file_name, _ in LEGACY_JSON_LAYOUT.values()]
+    names += ['ledger', '_meta']
+    bases = [os.path.join(directory, name) for name in names]
+
+    for name in SHARD_KEYS:
+        shard_dir = os.path.join(directory, name)
+        if os.path.isdir(shard_dir):
+            bases += [
+                os.path.join(shard_dir, os.path.splitext(file_name)[0])
+                for file_name in os.listdir(shard_dir)
+                if file_name != 'index.json' and os.path.splitext(file_name)[1] in EXTENSIONS.values()
+            ]
+    return sorted(set(bases))
+
+
+def _meta_paths(directory: str) -> Dict[str, str]:
+    return {file_format: os.path.join(directory, '_meta' + extension) for file_format, extension in EXTENSIONS.items()}
+
+
+def recorded_format(directory: str = '.') -> Optional[str]:
+    """Format of the last conversion in ``directory``, or None when none was recorded."""
+    for path in _meta_paths(directory).values():
+        if not os.path.exists(path):
+            continue
+        for document in read_tinydb_file(path).get('_default', {}).values():
+            if document.get('key') == FILE_FORMAT_KEY:
+                return document.get('format')
+    return None
+
+
+def record_format(directory: str, file_format: str) -> None:
+    """Store ``file_format`` in the ``_meta`` file of both formats."""
+    for meta_format, path in _meta_paths(directory).items():
+        if meta_format != file_format and not os.path.exists(path):
+            continue
+        data = read_tinydb_file(path) if os.path.exists(path) else {}
+        table = data.setdefault('_default', {})
+        doc_id = next((doc_id for doc_id, document in table.items() if document.get('key') == FILE_FORMAT_KEY), None)
+        if doc_id is None:
+            doc_id = str(max((int(doc_id) for doc_id in table), default=0) + 1)
+        table[doc_id] = {'key': FILE_FORMAT_KEY, 'format': file_format}
+        write_tinydb_file(path, data, meta_format)
+
+
+def convert_directory(directory: str = '.', file_format: str = 'msgpack', force: bool = False) -> Dict[str, int]:
+    """
+    Convert every table file in ``directory`` to ``file_format`` when the
+    recorded format differs. Without a recorded format, existing non-empty
+    target files are kept unless ``force`` is set.
+
+    Returns the number of documents written per converted file.
+    """
+    if file_format not in EXTENSIONS:
+        raise ValueError(f"Unknown file format: {file_format}")
+    if file_format == 'msgpack' and msgpack is None:
+        raise Exception("Converting to msgpack needs the msgpack package (pip install msgpack)")
+
+    recorded = recorded_format(directory)
+    if recorded == file_format and not force:
+        return {}
+
+    source_format = 'json' if file_format == 'msgpack' else 'msgpack'
+    converted = {}
+    for base in table_files(directory, file_format):
+        source = base + EXTENSIONS[source_format]
+        target = base + EXTENSIONS[file_format]
+        if not os.path.exists(source) or not os.path.getsize(source):
+            continue
+        if recorded is None and not force and os.path.exists(target) and os.path.getsize(target):
+            logger.warning(f"Kept {target}: it already has data and no conversion was recorded "
+                           f"(use python -m utils.convert {file_format} --force to overwrite it)")
+            continue
+
+        data = read_tinydb_file(source)
+        write_tinydb_file(target, data, file_format)
+        converted[os.path.relpath(target, directory)] = sum(len(table) for table in data.values())
+        logger.info(f"Converted {source} to {target}")
+
+    record_format(directory, file_format)
+    return converted
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    force = '--force' in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg != '--force']
+    if not args or args[0] not in EXTENSIONS:
+        print('Usage: python -m utils.convert msgpack|json [directory] [--force]')
+        sys.exit(1)
+    result = convert_directory(args[1] if len(args) > 1 else '.', args[0], force=force)
+    if not result:
+        print('Nothing to convert')
+    for file_name, count in result.items():
+        print(f'{file_name}: {count} documents')
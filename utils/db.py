@@ -1,35 +1,236 @@
-from tinydb import TinyDB, where
+import time
+import hashlib
+import threading
 from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-db_file = 'db.json'
+from utils.storage import after_commit, open_table, writes
+
+
+def token_fingerprint(token: str) -> str:
+    """SHA-256 of a token, so the index never holds raw tokens."""
+    return hashlib.sha256(token.strip().encode()).hexdigest()
+
+
+class _AccountIndex:
+    """
+    In-memory token-fingerprint -> doc_id and email -> doc_ids indexes,
+    built from the accounts table on first use and kept in step by AccountsDB.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.tokens: Optional[Dict[str, int]] = None
+        self.emails: Dict[str, List[int]] = {}
+        self._fingerprints: Dict[int, Tuple[str, str]] = {}
+
+    def load(self, accounts) -> None:
+        with self.lock:
+            if self.tokens is not None:
+                return
+            self.tokens = {}
+            self.emails = {}
+            self._fingerprints = {}
+            for account in accounts.all():
+                self._add(account.doc_id, account)
+
+    def _add(self, doc_id: int, account: Dict[str, Any]) -> None:
+        fingerprint = token_fingerprint(account['token'])
+        email = account.get('email', '').lower()
+        self.tokens[fingerprint] = doc_id
+        self.emails.setdefault(email, []).append(doc_id)
+        self._fingerprints[doc_id] = (fingerprint, email)
+
+    def add(self, doc_id: int, account: Dict[str, Any]) -> None:
+        with self.lock:
+            if self.tokens is not None:
+                self._add(doc_id, account)
+
+    def discard(self, doc_id: int) -> None:
+        with self.lock:
+            if self.tokens is None or doc_id not in self._fingerprints:
+                return
+            fingerprint, email = self._fingerprints.pop(doc_id)
+            if self.tokens.get(fingerprint) == doc_id:
+                del self.tokens[fingerprint]
+            doc_ids = self.emails.get(email, [])
+            if doc_id in doc_ids:
+                doc_ids.remove(doc_id)
+                if not doc_ids:
+                    del self.emails[email]
+
+
+_index = _AccountIndex()
 
 
 class AccountsDB:
 
     def __init__(self):
-        db = TinyDB(db_file)
-        self.accounts = db.table('Accounts')
+        self.accounts = open_table('accounts', indexes=('token',))
+        _index.load(self.accounts)
+
+    def get_by_token(self, token: str):
+        """Look up an account by token through the fingerprint index."""
+        fingerprint = token_fingerprint(token)
+        with _index.lock:
+            doc_id = _index.tokens.get(fingerprint)
+        if doc_id is None:
+            return None
+
+        account = self.accounts.get(doc_id=doc_id)
+        # Entri basi (mis. batch yang gagal di-commit) dibuang dari index
+        if not account or token_fingerprint(account['token']) != fingerprint:
+            with _index.lock:
+                if _index.tokens.get(fingerprint) == doc_id:
+                    del _index.tokens[fingerprint]
+            return None
+        return account
+
+    def has_token(self, token: str) -> bool:
+        return self.get_by_token(token) is not None
+
+    def get_by_email(self, email: str) -> list:
+        with _index.lock:
+            doc_ids = list(_index.emails.get(email.strip().lower(), []))
+        return [account for account in (self.get(doc_id) for doc_id in doc_ids) if account]
 
+    @writes
     def save(self, email: str, token: str, remarks: str = ''):
         email = email.strip()
         token = token.strip()
         date = datetime.today().strftime('%Y-%m-%d')
 
-        if self.accounts.get(where('token') == token):
+        if self.has_token(token):
             raise Exception('Token Exists')
         else:
-            self.accounts.insert({
+            account = {
                 'email': email,
                 'token': token,
                 'remarks': remarks,
                 'date': date
+            }
+            doc_id = self.accounts.insert(account)
+            # Index hanya diubah setelah commit, seperti remove()
+            after_commit(lambda: _index.add(doc_id, account))
+
+    @writes
+    def save_many(self, accounts: Iterable[Dict[str, str]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Save a batch of ``{'email', 'token', 'remarks'}`` dicts in one write.
+
+        Tokens already stored or repeated inside the batch are skipped.
+        Returns ``(added, duplicates)``.
+        """
+        date = datetime.today().strftime('%Y-%m-%d')
+        added = []
+        duplicates = []
+        seen = set()
+
+        for account in accounts:
+            token = account['token'].strip()
+            fingerprint = token_fingerprint(token)
+            if fingerprint in seen or self.has_token(token):
+                duplicates.append(account)
+                continue
+            seen.add(fingerprint)
+            added.append({
+                'email': account.get('email', '').strip(),
+                'token': token,
+                'remarks': account.get('remarks', ''),
+                'date': date
             })
 
+        if added:
+            doc_ids = self.accounts.insert_multiple(added)
+
+            def index_added():
+                for doc_id, account in zip(doc_ids, added):
+                    _index.add(doc_id, account)
+
+            after_commit(index_added)
+        return added, duplicates
+
     def all(self):
         return self.accounts.all()
 
     def get(self, doc_id: int):
         return self.accounts.get(doc_id=int(doc_id))
 
+    @writes
     def remove(self, doc_id: int):
         self.accounts.remove(doc_ids=[int(doc_id)])
+        after_commit(lambda: _index.discard(int(doc_id)))
+
+
+class AccountHealthDB:
+    """
+    Last batch-test result per account, keyed by the account doc_id.
+
+    The token fingerprint is stored with every entry so a result never
+    applies to a different account that later reuses the same doc_id.
+    """
+
+    def __init__(self):
+        self.health = open_table('account_health', indexes=('account_id',))
+
+    def snapshot(self) -> Dict[int, Dict[str, Any]]:
+        return {entry['account_id']: entry for entry in self.health.all()}
+
+    def fresh(self, accounts: Iterable[Dict[str, Any]], max_age: float) -> Dict[int, Dict[str, Any]]:
+        """Entries of ``accounts`` checked within ``max_age`` seconds."""
+        snapshot = self.snapshot()
+        now = time.time()
+        fresh = {}
+        for account in accounts:
+            entry = snapshot.get(account.doc_id)
+            if entry is not None \
+                    and entry.get('fingerprint') == token_fingerprint(account['token']) \
+                    and now - entry.get('checked_at', 0) <= max_age:
+                fresh[account.doc_id] = entry
+        return fresh
+
+    @writes
+    def record(self, entries: Iterable[Dict[str, Any]]) -> None:
+        """Store ``{'account_id', 'fingerprint', 'status', ...}`` entries, replacing older ones."""
+        existing = {entry['account_id']: entry.doc_id for entry in self.health.all()}
+        new_entries = []
+        for entry in entries:
+            entry = dict(entry)
+            entry.setdefault('checked_at', time.time())
+            if entry['account_id'] in existing:
+                self.health.update(entry, doc_ids=[existing[entry['account_id']]])
+            else:
+                new_entries.append(entry)
+        if new_entries:
+            self.health.insert_multiple(new_entries)
+
+    @writes
+    def remove(self, account_ids: Iterable[int]) -> None:
+        for account_id in account_ids:
+            self.health.remove(filters={'account_id': int(account_id)})
+
+
+class WarmPoolDB:
+    """
+    Pre-provisioned droplets waiting for an auto order. Each entry keeps the
+    root password set at creation, since the bot is the only one that knows it,
+    encrypted by the warm pool; the table is left out of storage snapshots.
+    """
+
+    def __init__(self):
+        self.pool = open_table('warm_pool', indexes=('droplet_id',))
+
+    def all(self):
+        return self.pool.all()
+
+    @writes
+    def add(self, entry: Dict[str, Any]) -> int:
+        """Store ``{'account_id', 'fingerprint', 'droplet_id', 'region', 'size', 'image', 'password', ...}``."""
+        entry = dict(entry)
+        entry.setdefault('ready_at', time.time())
+        return self.pool.insert(entry)
+
+    @writes
+    def remove(self, droplet_ids: Iterable[int]) -> None:
+        for droplet_id in droplet_ids:
+            self.pool.remove(filters={'droplet_id': int(droplet_id)})
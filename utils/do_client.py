@@ -0,0 +1,180 @@
+"""
+Registry klien DigitalOcean per token.
+
+Setiap token memakai satu ``requests.Session`` dengan keep-alive dan pool
+koneksi berukuran tetap, sehingga Manager, Droplet, Balance dan Action untuk
+akun yang sama tidak membuka koneksi TLS baru di setiap handler.
+
+Setiap request lewat pool juga mengambil jatah dari ``rate_limiter`` akun
+itu, dan header RateLimit responsnya dipakai untuk menyinkronkan anggaran.
+
+Catatan: python-digitalocean mengirim POST/PATCH (create, aksi droplet) lewat
+``requests.post``/``requests.patch`` langsung, jadi hanya GET, PUT dan DELETE
+yang melewati pool dan pembatas ini.
+"""
+import json
+import logging
+import threading
+from typing import Any, Dict, Optional, TypeVar
+
+import digitalocean
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.db import token_fingerprint
+from utils.rate_limit import rate_limiter
+
+logger = logging.getLogger('do_client')
+
+DEFAULT_DO_API_CONFIG: Dict[str, Any] = {
+    # Koneksi keep-alive maksimum per token
+    'POOL_SIZE': 10,
+    # Timeout default setiap request lewat pool (detik)
+    'TIMEOUT': 30,
+}
+
+T = TypeVar('T', bound=digitalocean.baseapi.BaseAPI)
+
+
+def load_do_api_config() -> Dict[str, Any]:
+    """Load the DO_API section of config.json, falling back to defaults."""
+    do_api_config = dict(DEFAULT_DO_API_CONFIG)
+    try:
+        with open('config.json', 'r') as f:
+            config = json.load(f)
+        do_api_config.update(config.get('BOT', {}).get('DO_API', {}))
+    except Exception as e:
+        logger.warning(f"Using default DO API configuration: {str(e)}")
+    return do_api_config
+
+
+DO_API_CONFIG = load_do_api_config()
+
+
+class _AccountAdapter(HTTPAdapter):
+    """
+    HTTPAdapter for one account: applies a default timeout to requests sent
+    without one and passes every request through the account's rate limit.
+    """
+
+    def __init__(self, fingerprint: str, timeout: Optional[float] = None, **kwargs):
+        self.fingerprint = fingerprint
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        rate_limiter.acquire(self.fingerprint)
+        response = super().send(request, timeout=timeout if timeout is not None else self.timeout, **kwargs)
+        rate_limiter.update(self.fingerprint, response.status_code, response.headers)
+        return response
+
+
+class DOClients:
+    """Per-token pooled sessions and factories for python-digitalocean objects."""
+
+    def __init__(self, pool_size: int = 10, timeout: Optional[float] = 30):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+        # Metrik sesi yang sudah ditutup, agar stats() tetap kumulatif
+        self._closed_requests = 0
+        self._closed_connections = 0
+
+    def session(self, token: str) -> requests.Session:
+        fingerprint = token_fingerprint(token)
+        with self._lock:
+            session = self._sessions.get(fingerprint)
+            if session is None:
+                session = requests.Session()
+                adapter = _AccountAdapter(fingerprint, timeout=self.timeout, pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._sessions[fingerprint] = session
+            return session
+
+    def bind(self, token: str, obj: T) -> T:
+        """Make an object created by python-digitalocean (e.g. an Action) use the pooled session."""
+        obj._session = self.session(token)
+        return obj
+
+    def manager(self, token: str) -> digitalocean.Manager:
+        return digitalocean.Manager(token=token, _session=self.session(token))
+
+    def droplet(self, token: str, **kwargs) -> digitalocean.Droplet:
+        return digitalocean.Droplet(token=token, _session=self.session(token), **kwargs)
+
+    def get_droplet(self, token: str, droplet_id) -> digitalocean.Droplet:
+        droplet = self.droplet(token, id=droplet_id)
+        droplet.load()
+        return droplet
+
+    def get_balance(self, token: str) -> digitalocean.Balance:
+        balance = digitalocean.Balance(token=token, _session=self.session(token))
+        balance.load()
+        return balance
+
+    def get_account(self, token: str) -> digitalocean.Account:
+        account = digitalocean.Account(token=token, _session=self.session(token))
+        account.load()
+        return account
+
+    def get_actions(self, droplet: digitalocean.Droplet) -> list:
+        """``droplet.get_actions()`` with every action bound to the droplet's session."""
+        return [self.bind(droplet.token, action) for action in droplet.get_actions()]
+
+    def close(self, token: Optional[str] = None) -> None:
+        """Close the session of one token, or every session."""
+        with self._lock:
+            if token is None:
+                sessions = list(self._sessions.values())
+                self._sessions.clear()
+            else:
+                fingerprint = token_fingerprint(token)
+                session = self._sessions.pop(fingerprint, None)
+                sessions = [session] if session is not None else []
+                rate_limiter.forget(fingerprint)
+            for session in sessions:
+                requests_count, connections = self._pool_counts(session)
+                self._closed_requests += requests_count
+                self._closed_connections += connections
+
+        for session in sessions:
+            session.close()
+
+    @staticmethod
+    def _pool_counts(session: requests.Session):
+        requests_count = 0
+        connections = 0
+        adapter = session.get_adapter('https://')
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                requests_count += pool.num_requests
+                connections += pool.num_connections
+        return requests_count, connections
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            requests_count = self._closed_requests
+            connections = self._closed_connections
+            for session in self._sessions.values():
+                session_requests, session_connections = self._pool_counts(session)
+                requests_count += session_requests
+                connections += session_connections
+            sessions = len(self._sessions)
+
+        return {
+            'sessions': sessions,
+            'requests': requests_count,
+            'connections_created': connections,
+            'connections_reused': max(requests_count - connections, 0),
+        }
+
+
+clients = DOClients(
+    pool_size=int(DO_API_CONFIG.get('POOL_SIZE', 10)),
+    timeout=float(DO_API_CONFIG.get('TIMEOUT', 30)) or None
+)
@@ -0,0 +1,145 @@
+"""
+Cache status droplet per (akun, droplet_id) dengan TTL pendek.
+
+Aksi yang mengubah status (reboot, shutdown, power on, rebuild, reset
+password) menandai droplet sebagai transisional: sampai aksinya selesai
+(dipantau action watcher), paling lama ``TRANSITION`` detik, droplet selalu
+dimuat ulang dari API agar status yang tampil tidak basi.
+Droplet yang dihapus langsung dibuang dari cache.
+"""
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+import digitalocean
+
+from utils.action_watcher import watcher
+from utils.cache import TTLCache
+from utils.db import token_fingerprint
+from utils.do_client import clients
+
+logger = logging.getLogger('droplet_cache')
+
+DEFAULT_DROPLET_CACHE_CONFIG: Dict[str, Any] = {
+    'TTL': 30,
+    'TRANSITION': 120,
+    'MAX_SIZE': 2048,
+}
+
+
+def load_droplet_cache_config() -> Dict[str, Any]:
+    """Load the DROPLET_CACHE section of config.json, falling back to defaults."""
+    droplet_cache_config = dict(DEFAULT_DROPLET_CACHE_CONFIG)
+    try:
+        with open('config.json', 'r') as f:
+            config = json.load(f)
+        droplet_cache_config.update(config.get('BOT', {}).get('DROPLET_CACHE', {}))
+    except Exception as e:
+        logger.warning(f"Using default droplet cache configuration: {str(e)}")
+    return droplet_cache_config
+
+
+DROPLET_CACHE_CONFIG = load_droplet_cache_config()
+
+
+class DropletCache:
+    """Short-lived droplet objects keyed by account token and droplet id."""
+
+    def __init__(self, ttl: float = 30, transition: float = 120, maxsize: int = 2048):
+        self.transition = transition
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._transitional: Dict[Hashable, float] = {}
+        self._lock = threading.Lock()
+
+        # Metrik
+        self.loads = 0
+        self.bypasses = 0
+
+    @staticmethod
+    def _key(token: str, droplet_id) -> Hashable:
+        return token_fingerprint(token), int(droplet_id)
+
+    def _in_transition(self, key: Hashable) -> bool:
+        with self._lock:
+            deadline = self._transitional.get(key)
+            if deadline is None:
+                return False
+            if deadline < time.monotonic():
+                del self._transitional[key]
+                return False
+            return True
+
+    def get(self, token: str, droplet_id, refresh: bool = False) -> digitalocean.Droplet:
+        """Return the droplet, loading it when missing, transitional or ``refresh`` is set."""
+        key = self._key(token, droplet_id)
+        if refresh or self._in_transition(key):
+            self.bypasses += 1
+        else:
+            droplet = self._cache.get(key)
+            if droplet is not None:
+                return droplet
+
+        droplet = clients.get_droplet(token, droplet_id)
+        self.loads += 1
+        self._cache.set(key, droplet)
+        return droplet
+
+    def cached(self, token: str, droplet_ids: Iterable[int]) -> Dict[int, digitalocean.Droplet]:
+        """Cached, non-transitional droplets among ``droplet_ids``."""
+        droplets = {}
+        for droplet_id in droplet_ids:
+            key = self._key(token, droplet_id)
+            if self._in_transition(key):
+                continue
+            droplet = self._cache.get(key)
+            if droplet is not None:
+                droplets[int(droplet_id)] = droplet
+        return droplets
+
+    def put(self, token: str, droplets: Iterable[digitalocean.Droplet]) -> None:
+        """Store droplets fetched elsewhere, e.g. from an account listing."""
+        for droplet in droplets:
+            key = self._key(token, droplet.id)
+            if not self._in_transition(key):
+                self._cache.set(key, clients.bind(token, droplet))
+
+    def mark_transitional(self, token: str, droplet_id, action: Optional[Dict[str, Any]] = None) -> None:
+        """
+        An action changed the droplet: reload it on every read until ``action``
+        (the API response of the action) finishes, or for TRANSITION seconds.
+        """
+        key = self._key(token, droplet_id)
+        self._cache.invalidate(key)
+        now = time.monotonic()
+        with self._lock:
+            for expired in [k for k, deadline in self._transitional.items() if deadline < now]:
+                del self._transitional[expired]
+            self._transitional[key] = now + self.transition
+
+        if action and 'action' in action:
+            watcher.watch(token, action['action']['id'], lambda finished: self.invalidate(token, droplet_id))
+
+    def invalidate(self, token: str, droplet_id) -> None:
+        key = self._key(token, droplet_id)
+        self._cache.invalidate(key)
+        with self._lock:
+            self._transitional.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            transitional = len(self._transitional)
+        return {
+            **self._cache.stats(),
+            'loads': self.loads,
+            'bypasses': self.bypasses,
+            'transitional': transitional,
+        }
+
+
+droplet_cache = DropletCache(
+    ttl=float(DROPLET_CACHE_CONFIG.get('TTL', 30)),
+    transition=float(DROPLET_CACHE_CONFIG.get('TRANSITION', 120)),
+    maxsize=int(DROPLET_CACHE_CONFIG.get('MAX_SIZE', 2048))
+)
@@ -0,0 +1,123 @@
+"""
+Kompaksi dan snapshot (backup point-in-time) penyimpanan bot.
+
+Dipakai oleh scheduler berkala dan perintah admin /storage.
+"""
+import os
+import time
+import shutil
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from utils.storage import STORAGE_CONFIG, SQLiteBackend, get_backend
+
+logger = logging.getLogger('storage')
+
+SNAPSHOT_PREFIX = 'digibot-'
+
+# Hasil kompaksi / snapshot terakhir untuk ditampilkan di menu admin
+last_results: Dict[str, Dict[str, Any]] = {}
+_maintenance_lock = threading.Lock()
+
+
+def _path_size(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(root, file_name))
+        for root, _, file_names in os.walk(path)
+        for file_name in file_names
+    )
+
+
+def compact_storage() -> Dict[str, Any]:
+    """
+    VACUUM the SQLite database; returns sizes before/after and duration.
+
+    The json/msgpack backends are skipped (``skipped`` is True): every commit
+    already rewrites their files in full, so compacting them would only write
+    the same documents again.
+    """
+    backend = get_backend()
+    if not isinstance(backend, SQLiteBackend):
+        return {'skipped': True, 'size_before': backend.size(), 'size_after': backend.size(), 'duration': 0.0}
+    with _maintenance_lock:
+        start = time.perf_counter()
+        size_before = backend.size()
+        backend.compact()
+        result = {
+            'size_before': size_before,
+            'size_after': backend.size(),
+            'duration': time.perf_counter() - start,
+            'finished_at': datetime.now().timestamp()
+        }
+    last_results['compact'] = result
+    logger.info(f"Storage compacted: {result}")
+    return result
+
+
+def snapshot_storage(backup_dir: Optional[str] = None, keep: Optional[int] = None) -> Dict[str, Any]:
+    """Write a point-in-time snapshot to ``backup_dir`` and prune old ones."""
+    backend = get_backend()
+    backup_dir = backup_dir or STORAGE_CONFIG.get('BACKUP_DIR', os.path.join('data', 'backups'))
+    keep = keep if keep is not None else int(STORAGE_CONFIG.get('BACKUP_KEEP', 7))
+    os.makedirs(backup_dir, exist_ok=True)
+
+    name = SNAPSHOT_PREFIX + datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    if isinstance(backend, SQLiteBackend):
+        name += '.sqlite3'
+    dest = os.path.join(backup_dir, name)
+
+    with _maintenance_lock:
+        start = time.perf_counter()
+        backend.snapshot(dest)
+        result = {
+            'path': dest,
+            'size': _path_size(dest),
+            'duration': time.perf_counter() - start,
+            'finished_at': datetime.now().timestamp()
+        }
+    result['pruned'] = prune_snapshots(backup_dir, keep)
+    last_results['snapshot'] = result
+    logger.info(f"Storage snapshot written: {result}")
+    return result
+
+
+def prune_snapshots(backup_dir: str, keep: int) -> int:
+    """Delete all but the newest ``keep`` snapshots; returns how many were removed."""
+    snapshots = sorted(
+        name for name in os.listdir(backup_dir)
+        if name.startswith(SNAPSHOT_PREFIX) and not name.endswith('.tmp')
+    )
+    stale = snapshots[:-keep] if keep > 0 else []
+    for name in stale:
+        path = os.path.join(backup_dir, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+    return len(stale)
+
+
+def start_maintenance_scheduler() -> Optional[threading.Thread]:
+    """Compact and snapshot the storage every MAINTENANCE_INTERVAL_HOURS."""
+    interval = float(STORAGE_CONFIG.get('MAINTENANCE_INTERVAL_HOURS', 24)) * 3600
+    if interval <= 0:
+        logger.info("Storage maintenance scheduler disabled")
+        return None
+
+    def maintenance_task():
+        while True:
+            time.sleep(interval)
+            try:
+                compact_storage()
+                snapshot_storage()
+            except Exception as e:
+                logger.error(f"Error in storage maintenance: {str(e)}")
+
+    maintenance_thread = threading.Thread(target=maintenance_task, name="storage_maintenance")
+    maintenance_thread.daemon = True
+    maintenance_thread.start()
+    return maintenance_thread
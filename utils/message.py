@@ -0,0 +1,27 @@
+from typing import List
+
+# Batas panjang teks pesan Telegram
+MAX_MESSAGE_LENGTH = 4096
+
+
+def split_message(text: str, limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
+    """
+    Split text into chunks of at most ``limit`` characters on line boundaries,
+    so HTML tags that open and close on one line are never cut in half.
+    """
+    chunks = []
+    current = ''
+    for line in text.splitlines(keepends=True):
+        while len(line) > limit:
+            if current:
+                chunks.append(current)
+                current = ''
+            chunks.append(line[:limit])
+            line = line[limit:]
+        if len(current) + len(line) > limit:
+            chunks.append(current)
+            current = ''
+        current += line
+    if current or not chunks:
+        chunks.append(current)
+    return chunks
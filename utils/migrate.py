@@ -0,0 +1,194 @@
+"""
+Migrasi satu kali dari file TinyDB lama (users.json, transactions.json,
+user_droplets.json, db.json) ke backend penyimpanan yang dikonfigurasi.
+
+Juga memindahkan daftar 'transactions' yang tertanam di dokumen pengguna
+dan isi tabel transactions (pembelian/refund) ke tabel ledger.
+
+Pada backend msgpack, file JSON diubah ke msgpack lebih dulu (lihat
+utils/convert.py). Pada backend json/msgpack dengan JSON_SHARDS, users.json dan ledger.json dipecah
+ke file shard per pengguna.
+
+Jalankan manual dengan:  python -m utils.migrate [direktori_json]
+"""
+import os
+import sys
+import logging
+from typing import Dict
+
+from tinydb import TinyDB
+
+from utils.convert import convert_directory, read_tinydb_file
+from utils.storage import LEGACY_JSON_LAYOUT, SHARD_KEYS, JSONBackend, get_backend
+
+logger = logging.getLogger('storage')
+
+MIGRATION_KEY = 'legacy_json'
+EMBEDDED_TRANSACTIONS_KEY = 'embedded_transactions'
+TRANSACTIONS_TABLE_KEY = 'transactions_table'
+JSON_SHARDS_KEY = 'json_shards'
+
+
+def migrate_legacy_json(backend=None, source_dir: str = '.') -> Dict[str, int]:
+    """
+    Copy every legacy TinyDB table into ``backend``, keeping doc_ids intact.
+
+    The migration is recorded in the ``_meta`` table so it only ever runs once.
+    Returns the number of documents copied per table.
+    """
+    backend = backend or get_backend()
+    if isinstance(backend, JSONBackend):
+        logger.info("JSON backend selected, nothing to migrate")
+        return {}
+
+    meta = backend.table('_meta', indexes=('key',))
+    if meta.find({'key': MIGRATION_KEY}):
+        return {}
+
+    migrated = {}
+    with backend.transaction():
+        for name, (file_name, table_name) in LEGACY_JSON_LAYOUT.items():
+            path = os.path.join(source_dir, file_name)
+            if not os.path.exists(path):
+                continue
+
+            legacy_db = TinyDB(path)
+            try:
+                documents = legacy_db.table(table_name).all()
+            finally:
+                legacy_db.close()
+
+            table = backend.table(name)
+            for document in documents:
+                table.insert(document, doc_id=document.doc_id)
+            migrated[name] = len(documents)
+            logger.info(f"Migrated {len(documents)} documents from {file_name} to '{name}'")
+
+        meta.insert({'key': MIGRATION_KEY, 'tables': migrated})
+
+    return migrated
+
+
+def migrate_file_format(backend=None) -> Dict[str, int]:
+    """Bring the TinyDB files in line with the configured format (json or msgpack)."""
+    backend = backend or get_backend()
+    if not isinstance(backend, JSONBackend):
+        return {}
+    return convert_directory(backend.directory, backend.file_format)
+
+
+def migrate_json_shards(backend=None, source_dir: str = '.') -> Dict[str, int]:
+    """
+    Split the single-file users and ledger tables into per-user shard files.
+
+    Only applies to the JSON backend with ``JSON_SHARDS`` set. Documents get
+    new doc_ids (the shard is encoded in them); the old files are left as-is.
+    """
+    backend = backend or get_backend()
+    if not isinstance(backend, JSONBackend) or not backend.shards:
+        return {}
+
+    meta = backend.table('_meta', indexes=('key',))
+    if meta.find({'key': JSON_SHARDS_KEY}):
+        return {}
+
+    moved = {}
+    with backend.transaction():
+        for name in SHARD_KEYS:
+            table_name = LEGACY_JSON_LAYOUT.get(name, (None, '_default'))[1]
+            path = os.path.join(source_dir, backend.file_name(name))
+            if not os.path.exists(path):
+                continue
+
+            documents = read_tinydb_file(path).get(table_name, {})
+            table = backend.table(name)
+            for document in documents.values():
+                table.insert(document)
+            moved[f'{name}_shards'] = len(documents)
+            logger.info(f"Split {len(documents)} documents from {path} into {backend.shards} shards")
+
+        meta.insert({'key': JSON_SHARDS_KEY, 'shards': backend.shards, 'tables': moved})
+
+    return moved
+
+
+def migrate_embedded_transactions(backend=None) -> Dict[str, int]:
+    """
+    Move the ``transactions`` list embedded in each user document into the
+    append-only ledger table and drop it from the user document.
+    """
+    backend = backend or get_backend()
+
+    meta = backend.table('_meta', indexes=('key',))
+    if meta.find({'key': EMBEDDED_TRANSACTIONS_KEY}):
+        return {}
+
+    users = backend.table('users', indexes=('id',))
+    ledger = backend.table('ledger', indexes=(('user_id', 'timestamp'), 'timestamp'))
+
+    moved = 0
+    with backend.transaction():
+        for user in users.all():
+            if 'transactions' not in user:
+                continue
+            for transaction in sorted(user['transactions'], key=lambda x: x.get('timestamp', 0)):
+                ledger.insert({
+                    **transaction,
+                    'user_id': user['id'],
+                    'timestamp': transaction.get('timestamp', 0)
+                })
+                moved += 1
+            users.unset(['transactions'], doc_ids=[user.doc_id])
+
+        meta.insert({'key': EMBEDDED_TRANSACTIONS_KEY, 'entries': moved})
+
+    logger.info(f"Moved {moved} embedded transactions into the ledger")
+    return {'ledger': moved}
+
+
+def migrate_transactions_table(backend=None) -> Dict[str, int]:
+    """Move purchase/refund records from the transactions table into the ledger."""
+    backend = backend or get_backend()
+
+    meta = backend.table('_meta', indexes=('key',))
+    if meta.find({'key': TRANSACTIONS_TABLE_KEY}):
+        return {}
+
+    transactions = backend.table('transactions')
+    ledger = backend.table('ledger', indexes=(('user_id', 'timestamp'), 'timestamp'))
+
+    moved = 0
+    with backend.transaction():
+        for transaction in transactions.all():
+            ledger.insert({
+                'status': 'success',
+                **transaction,
+                'timestamp': transaction.get('timestamp', 0)
+            })
+            moved += 1
+        transactions.remove()
+
+        meta.insert({'key': TRANSACTIONS_TABLE_KEY, 'entries': moved})
+
+    logger.info(f"Moved {moved} purchase/refund records into the ledger")
+    return {'ledger_purchases': moved}
+
+
+def run_migrations(backend=None, source_dir: str = '.') -> Dict[str, int]:
+    """Run every pending migration in order."""
+    backend = backend or get_backend()
+    result = migrate_file_format(backend)
+    result.update(migrate_legacy_json(backend, source_dir))
+    result.update(migrate_json_shards(backend, source_dir))
+    result.update(migrate_embedded_transactions(backend))
+    result.update(migrate_transactions_table(backend))
+    return result
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    result = run_migrations(source_dir=sys.argv[1] if len(sys.argv) > 1 else '.')
+    if not result:
+        print('Nothing to migrate')
+    for table_name, count in result.items():
+        print(f'{table_name}: {count} documents')
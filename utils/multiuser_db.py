@@ -1,17 +1,37 @@
-import json
-from typing import Dict, Any, Optional, List
-from tinydb import TinyDB, Query
+from typing import Callable, Dict, Any, Optional, List, Tuple
 from datetime import datetime
 
+from tinydb.table import Document
+
+from utils.storage import after_commit, open_table, writes
+
+# Dipanggil setelah data pengguna berubah: listener(user_id, data_terbaru)
+_user_listeners: List[Callable[[int, Optional[Dict[str, Any]]], None]] = []
+
+
+def add_user_listener(listener: Callable[[int, Optional[Dict[str, Any]]], None]) -> None:
+    """Register a callback notified with the fresh user record after every write."""
+    _user_listeners.append(listener)
+
+
+def _notify_user_changed(user_id: int, user: Optional[Dict[str, Any]]) -> None:
+    def notify():
+        for listener in _user_listeners:
+            listener(user_id, user)
+
+    # Caches only see the new record once the write batch is committed
+    after_commit(notify)
+
+
 class UsersDB:
     def __init__(self):
-        self.db = TinyDB('users.json')
-        self.User = Query()
+        self.db = open_table('users', indexes=('id',))
 
     def get_by_id(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Get user by ID."""
-        return self.db.get(self.User.id == user_id)
+        return self.db.find({'id': user_id})
         
+    @writes
     def register(self, user_id: int, username: str, first_name: str) -> None:
         """Register a new user."""
         # Check if user already exists
@@ -24,12 +44,12 @@ class UsersDB:
             'username': username,
             'first_name': first_name,
             'balance': 0,
-            'transactions': [],
             'created_at': datetime.now().timestamp()
         }
         
         # Insert new user
-        self.db.insert(user_data)
+        doc_id = self.db.insert(user_data)
+        _notify_user_changed(user_id, Document(user_data, doc_id=doc_id))
 
     def get_balance(self, user_id: int) -> int:
         """Get user balance."""
@@ -38,6 +58,7 @@ class UsersDB:
             raise Exception("User not found")
         return user.get('balance', 0)
 
+    @writes
     def update_balance(self, user_id: int, amount: int) -> int:
         """Update user balance and return new balance."""
         user = self.get_by_id(user_id)
@@ -50,9 +71,11 @@ class UsersDB:
         if new_balance < 0:
             raise Exception("Insufficient balance")
         
-        self.db.update({'balance': new_balance}, self.User.id == user_id)
+        self.db.update({'balance': new_balance}, {'id': user_id})
+        _notify_user_changed(user_id, Document({**user, 'balance': new_balance}, doc_id=user.doc_id))
         return new_balance
 
+    @writes
     def update_user(self, user_id: int, data: Dict[str, Any]) -> None:
         """Update user data."""
         user = self.get_by_id(user_id)
@@ -61,8 +84,10 @@ class UsersDB:
         
         # Merge existing data with new data
         updated_data = {**user, **data}
-        self.db.update(updated_data, self.User.id == user_id)
+        self.db.update(updated_data, {'id': user_id})
+        _notify_user_changed(user_id, Document(updated_data, doc_id=user.doc_id))
 
+    @writes
     def add_transaction(self, user_id: int, transaction: Dict[str, Any]) -> None:
         """Add transaction to user history."""
         user = self.get_by_id(user_id)
@@ -75,17 +100,8 @@ class UsersDB:
             if field not in transaction:
                 raise Exception(f"Missing required transaction field: {field}")
         
-        # Get existing transactions or create empty list
-        transactions = user.get('transactions', [])
-        
-        # Add new transaction
-        transactions.append({
-            **transaction,
-            'timestamp': datetime.now().timestamp()
-        })
-        
-        # Update user with new transactions
-        self.update_user(user_id, {'transactions': transactions})
+        # Append to the ledger instead of rewriting the user document
+        LedgerDB().append(user_id, transaction)
 
     def get_transactions(self, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
         """Get user transactions with limit."""
@@ -93,45 +109,128 @@ class UsersDB:
         if not user:
             raise Exception("User not found")
         
-        transactions = user.get('transactions', [])
-        
-        # Sort by timestamp (newest first) and limit
-        return sorted(
-            transactions,
-            key=lambda x: x.get('timestamp', 0),
-            reverse=True
-        )[:limit]
+        # Newest first, read through the (user_id, timestamp) index
+        transactions, _, _ = LedgerDB().history(user_id, limit=limit)
+        return transactions
+
+class LedgerDB:
+    """
+    Append-only wallet ledger, one document per transaction.
+
+    Topups, purchases and refunds all live here; the user's ``balance`` field
+    is a cached running total kept in step by ``record``.
+    """
+
+    def __init__(self):
+        self.db = open_table('ledger', indexes=(('user_id', 'timestamp'), 'timestamp'))
+        self.users = open_table('users', indexes=('id',))
+
+    @writes
+    def append(self, user_id: int, entry: Dict[str, Any]) -> int:
+        """Append a ledger entry without touching the balance and return its doc_id."""
+        return self.db.insert({
+            **entry,
+            'user_id': user_id,
+            'timestamp': entry.get('timestamp') or datetime.now().timestamp()
+        })
+
+    @writes
+    def record(self, user_id: int, amount: int, type_: str, status: str = 'success',
+               **details: Any) -> int:
+        """
+        Record a balance-changing entry and update the cached balance atomically.
+
+        ``amount`` is signed: positive for topups and refunds, negative for
+        purchases. Returns the new balance.
+        """
+        # Runs on the writer thread inside a savepoint, so both writes land together
+        user = self.users.find({'id': user_id})
+        if not user:
+            raise Exception("User not found")
+
+        new_balance = user.get('balance', 0) + amount
+        if new_balance < 0:
+            raise Exception("Insufficient balance")
+
+        self.users.update({'balance': new_balance}, doc_ids=[user.doc_id])
+        self.append(user_id, {
+            **details,
+            'type': type_,
+            'amount': amount,
+            'status': status,
+            'balance_after': new_balance
+        })
+
+        _notify_user_changed(user_id, Document({**user, 'balance': new_balance}, doc_id=user.doc_id))
+        return new_balance
+
+    def history(self, user_id: Optional[int], limit: int = 10, before: str = None,
+                after: str = None) -> Tuple[List[Dict[str, Any]], Optional[str], Optional[str]]:
+        """
+        Get one page of a user's history (or of all users when ``user_id`` is
+        None), newest first.
+
+        ``before``/``after`` are cursors from a previous page. Returns the entries
+        plus the cursors for the older and newer pages (None when there is none).
+        """
+        before_key = self.decode_cursor(before) if before else None
+        after_key = self.decode_cursor(after) if after else None
+
+        # Fetch one extra entry to know whether another page exists
+        entries = self.db.seek(
+            {'user_id': user_id} if user_id is not None else {},
+            order_by='timestamp', limit=limit + 1,
+            before=before_key, after=after_key
+        )
+
+        if after_key:
+            has_newer = len(entries) > limit
+            entries = entries[1:] if has_newer else entries
+            has_older = True
+        else:
+            has_older = len(entries) > limit
+            entries = entries[:limit]
+            has_newer = before_key is not None
+
+        older = self.encode_cursor(entries[-1]) if entries and has_older else None
+        newer = self.encode_cursor(entries[0]) if entries and has_newer else None
+        return entries, older, newer
+
+    @staticmethod
+    def encode_cursor(entry) -> str:
+        return f"{entry.get('timestamp', 0)}_{entry.doc_id}"
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[float, int]:
+        timestamp, doc_id = cursor.split('_')
+        return float(timestamp), int(doc_id)
 
 class TransactionsDB:
+    """Compatibility wrapper; purchases and refunds now live in the ledger."""
+
     def __init__(self):
-        self.db = TinyDB('transactions.json')
-        self.Transaction = Query()
+        self.ledger = LedgerDB()
         
+    @writes
     def add(self, user_id: int, amount: int, type_: str, details: str = None) -> None:
-        """Add a new transaction."""
-        transaction = {
-            'user_id': user_id,
+        """Add a new transaction (does not change the balance, see LedgerDB.record)."""
+        self.ledger.append(user_id, {
             'amount': amount,
             'type': type_,
-            'details': details,
-            'timestamp': datetime.now().timestamp()
-        }
-        self.db.insert(transaction)
+            'status': 'success',
+            'details': details
+        })
         
     def get_by_user(self, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
         """Get transactions for a specific user."""
-        transactions = self.db.search(self.Transaction.user_id == user_id)
-        return sorted(
-            transactions,
-            key=lambda x: x.get('timestamp', 0),
-            reverse=True
-        )[:limit]
+        transactions, _, _ = self.ledger.history(user_id, limit=limit)
+        return transactions
 
 class UserDropletsDB:
     def __init__(self):
-        self.db = TinyDB('user_droplets.json')
-        self.UserDroplet = Query()
+        self.db = open_table('user_droplets', indexes=('user_id', 'droplet_id'))
         
+    @writes
     def add(self, user_id: int, doc_id: int, droplet_id: int) -> None:
         """Add a new droplet association."""
         data = {
@@ -144,4 +243,13 @@ class UserDropletsDB:
         
     def get_by_user(self, user_id: int) -> List[Dict[str, Any]]:
         """Get all droplets for a specific user."""
-        return self.db.search(self.UserDroplet.user_id == user_id)
+        return self.db.search({'user_id': user_id})
+
+    def get_droplet(self, user_id: int, droplet_id: int) -> Optional[Dict[str, Any]]:
+        """Get a droplet association owned by a specific user."""
+        return self.db.find({'droplet_id': droplet_id, 'user_id': user_id})
+
+    @writes
+    def remove(self, user_id: int, droplet_id: int) -> None:
+        """Remove a droplet association."""
+        self.db.remove({'droplet_id': droplet_id, 'user_id': user_id})
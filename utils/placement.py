@@ -0,0 +1,269 @@
+"""
+Penempatan order otomatis ke akun DigitalOcean.
+
+Untuk setiap akun disimpan ``droplet_limit``, jumlah droplet, status akun
+dan region yang tersedia (dari katalog). Data ini dimuat ulang di background
+setiap ``REFRESH_INTERVAL`` detik, jadi memilih akun untuk order tidak
+memanggil API sama sekali: setiap region punya heap akun berdasarkan sisa
+slot droplet, dan akun dengan slot terbanyak diambil dari puncak heap.
+
+Slot dipesan (``reserve``) sebelum saldo pengguna dipotong dan dilepas lagi
+(``release``) setelah provisioning selesai atau gagal.
+"""
+import json
+import time
+import heapq
+import logging
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from digitalocean import DataReadError
+
+from utils.catalog import catalog
+from utils.db import AccountsDB, AccountHealthDB, token_fingerprint
+from utils.do_client import clients
+from utils.rate_limit import rate_limiter
+
+logger = logging.getLogger('placement')
+
+DEFAULT_PLACEMENT_CONFIG: Dict[str, Any] = {
+    'REFRESH_INTERVAL': 300,
+    'WORKERS': 4,
+}
+
+
+def load_placement_config() -> Dict[str, Any]:
+    """Load the PLACEMENT section of config.json, falling back to defaults."""
+    placement_config = dict(DEFAULT_PLACEMENT_CONFIG)
+    try:
+        with open('config.json', 'r') as f:
+            config = json.load(f)
+        placement_config.update(config.get('BOT', {}).get('PLACEMENT', {}))
+    except Exception as e:
+        logger.warning(f"Using default placement configuration: {str(e)}")
+    return placement_config
+
+
+PLACEMENT_CONFIG = load_placement_config()
+
+
+class _Slot:
+    __slots__ = ('account', 'limit', 'droplets', 'pending', 'regions', 'healthy', 'version')
+
+    def __init__(self, account: Dict[str, Any]):
+        self.account = account
+        self.limit = 0
+        self.droplets = 0
+        # Order yang sudah memesan slot tetapi droplet-nya belum jadi
+        self.pending = 0
+        self.regions: Set[str] = set()
+        self.healthy = False
+        self.version = 0
+
+    @property
+    def free(self) -> int:
+        return self.limit - self.droplets - self.pending
+
+
+class PlacementEngine:
+    """Picks the account with the most free droplet slots in a region."""
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+        self._slots: Dict[str, _Slot] = {}
+        # Per region: (-slot kosong, urutan, fingerprint, versi); entri lama dibuang saat sampai di puncak
+        self._heaps: Dict[str, List[Tuple[int, int, str, int]]] = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.refreshed_at: Optional[float] = None
+
+        # Metrik
+        self.placed = 0
+        self.rejected = 0
+        self.refresh_errors = 0
+
+    def _push(self, fingerprint: str, slot: _Slot) -> None:
+        """Publish the slot's current free count to the heaps of its regions."""
+        slot.version += 1
+        if not slot.healthy or slot.free <= 0:
+            return
+        for region in slot.regions:
+            heapq.heappush(self._heaps.setdefault(region, []), (-slot.free, next(self._seq), fingerprint, slot.version))
+
+    def _top(self, region_slug: str) -> Optional[Tuple[str, _Slot]]:
+        heap = self._heaps.get(region_slug)
+        while heap:
+            _, _, fingerprint, version = heap[0]
+            slot = self._slots.get(fingerprint)
+            if slot is not None and slot.version == version:
+                return fingerprint, slot
+            heapq.heappop(heap)
+        return None
+
+    def _probe(self, account: Dict[str, Any]) -> Dict[str, Any]:
+        """Droplet limit, droplet count, status and available regions of one account."""
+        token = account['token']
+        with rate_limiter.low_priority():
+            do_account = clients.get_account(token)
+            # Satu halaman berisi satu droplet cukup untuk membaca meta.total
+            data = clients.manager(token).get_data('droplets/', params={'page': 1, 'per_page': 1})
+            regions = {region.slug for region in catalog.available_regions(token)}
+        return {
+            'limit': do_account.droplet_limit,
+            'droplets': data.get('meta', {}).get('total', 0),
+            'healthy': do_account.status == 'active',
+            'regions': regions,
+        }
+
+    def refresh(self) -> None:
+        """Reload every account's placement data in parallel and rebuild the heaps."""
+        with self._refresh_lock:
+            accounts = AccountsDB().all()
+            tested = AccountHealthDB().snapshot()
+            start = time.perf_counter()
+
+            results: Dict[str, Optional[Dict[str, Any]]] = {}
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='placement') as pool:
+                futures = {pool.submit(self._probe, account): account for account in accounts}
+                for future, account in futures.items():
+                    fingerprint = token_fingerprint(account['token'])
+                    try:
+                        results[fingerprint] = future.result()
+                    except DataReadError as e:
+                        results[fingerprint] = {'healthy': False}
+                        logger.warning(f"Account {account['email']} excluded from placement: {str(e)}")
+                    except Exception as e:
+                        # Gangguan sementara: pakai data sebelumnya
+                        results[fingerprint] = None
+                        self.refresh_errors += 1
+                        logger.error(f"Error refreshing placement for {account['email']}: {str(e)}")
+
+            with self._lock:
+                slots = {}
+                for account in accounts:
+                    fingerprint = token_fingerprint(account['token'])
+                    slot = self._slots.get(fingerprint) or _Slot(account)
+                    slot.account = account
+                    result = results.get(fingerprint)
+                    if result is not None:
+                        slot.healthy = result['healthy']
+                        if result['healthy']:
+                            slot.limit = result['limit']
+                            slot.droplets = result['droplets']
+                            slot.regions = result['regions']
+
+                    # Akun yang gagal pada tes batch terakhir tidak dipakai
+                    entry = tested.get(account.doc_id)
+                    if entry is not None and entry.get('fingerprint') == fingerprint and entry.get('status') == 'failed':
+                        slot.healthy = False
+                    slots[fingerprint] = slot
+
+                self._slots = slots
+                self._heaps = {}
+                for fingerprint, slot in slots.items():
+                    self._push(fingerprint, slot)
+                self.refreshed_at = time.time()
+
+            logger.info(f"Placement refresh of {len(accounts)} accounts took {time.perf_counter() - start:.2f}s")
+
+    def ensure_loaded(self) -> None:
+        """Refresh once when no data has been loaded yet (e.g. right after start-up)."""
+        if self.refreshed_at is None:
+            self.refresh()
+
+    def regions(self) -> List[str]:
+        """Region slugs where at least one account can take an order."""
+        with self._lock:
+            return sorted(region for region in self._heaps if self._top(region) is not None)
+
+    def pick(self, region_slug: str) -> Optional[Dict[str, Any]]:
+        """Account that would get an order in ``region_slug`` now, without reserving it."""
+        with self._lock:
+            top = self._top(region_slug)
+            return top[1].account if top is not None else None
+
+    def reserve(self, region_slug: str, preferred: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Reserve a droplet slot in ``region_slug`` and return its account, or
+        None when every account is full. ``preferred`` is kept while it still
+        has a free slot there.
+        """
+        with self._lock:
+            top = None
+            if preferred is not None:
+                fingerprint = token_fingerprint(preferred['token'])
+                slot = self._slots.get(fingerprint)
+                if slot is not None and slot.healthy and slot.free > 0 and region_slug in slot.regions:
+                    top = fingerprint, slot
+            if top is None:
+                top = self._top(region_slug)
+            if top is None:
+                self.rejected += 1
+                return None
+
+            fingerprint, slot = top
+            slot.pending += 1
+            self._push(fingerprint, slot)
+            self.placed += 1
+            return slot.account
+
+    def release(self, account: Dict[str, Any], created: bool = False) -> None:
+        """Release a reserved slot; with ``created`` the droplet now counts towards the account."""
+        fingerprint = token_fingerprint(account['token'])
+        with self._lock:
+            slot = self._slots.get(fingerprint)
+            if slot is None:
+                return
+            slot.pending = max(slot.pending - 1, 0)
+            if created:
+                slot.droplets += 1
+            self._push(fingerprint, slot)
+
+    def remove(self, token: str) -> None:
+        """Stop placing orders on a deleted account before the next refresh."""
+        with self._lock:
+            slot = self._slots.pop(token_fingerprint(token), None)
+            if slot is not None:
+                slot.version += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            slots = list(self._slots.values())
+        healthy = [slot for slot in slots if slot.healthy]
+        return {
+            'accounts': len(slots),
+            'healthy': len(healthy),
+            'free_slots': sum(max(slot.free, 0) for slot in healthy),
+            'pending': sum(slot.pending for slot in slots),
+            'placed': self.placed,
+            'rejected': self.rejected,
+            'refreshed_at': self.refreshed_at,
+        }
+
+
+placement = PlacementEngine(max_workers=int(PLACEMENT_CONFIG.get('WORKERS', 4)))
+
+
+def start_placement_scheduler() -> Optional[threading.Thread]:
+    """Load placement data now, then every REFRESH_INTERVAL seconds."""
+    interval = float(PLACEMENT_CONFIG.get('REFRESH_INTERVAL', 300))
+    if interval <= 0:
+        logger.info("Placement refresh disabled")
+        return None
+
+    def refresh_task():
+        while True:
+            try:
+                placement.refresh()
+            except Exception as e:
+                logger.error(f"Error in placement refresh: {str(e)}")
+            finally:
+                time.sleep(interval)
+
+    refresh_thread = threading.Thread(target=refresh_task, name="placement_refresh")
+    refresh_thread.daemon = True
+    refresh_thread.start()
+    return refresh_thread
@@ -0,0 +1,371 @@
+"""
+Antrian provisioning droplet dengan worker pool sendiri.
+
+Handler Telegram cukup memasukkan ``ProvisionJob`` ke antrian lalu selesai;
+worker menjalankan job melalui tahap queued -> creating -> booting -> ready
+(atau failed) dan memanggil callback job di setiap perubahan tahap atau
+posisi antrian.
+
+``create_batch`` membuat banyak droplet sekaligus lewat request multi-create
+DigitalOcean, di luar antrian, untuk mode banyak server di menu admin.
+"""
+import json
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from digitalocean.baseapi import POST
+
+from utils.action_watcher import watcher
+from utils.do_client import clients
+from utils.password_generator import password_generator
+from utils.set_root_password_script import set_root_passwords_script
+
+logger = logging.getLogger('provisioning')
+
+DEFAULT_PROVISIONING_CONFIG: Dict[str, Any] = {
+    'WORKERS': 4,
+    # Jeda pemeriksaan IP setelah aksi pembuatan selesai (detik)
+    'POLL_INTERVAL': 3,
+    # Batas waktu satu job sejak mulai dibuat (detik)
+    'TIMEOUT': 900,
+}
+
+# Jumlah nama maksimum per request multi-create DigitalOcean
+MULTI_CREATE_LIMIT = 10
+
+STAGES = ('queued', 'creating', 'booting', 'ready')
+
+STAGE_LABELS = {
+    'queued': '⏳ Dalam antrian',
+    'creating': '🔨 Membuat VPS',
+    'booting': '🚀 Menyalakan VPS',
+    'ready': '✅ Siap',
+    'failed': '❌ Gagal',
+}
+
+
+def load_provisioning_config() -> Dict[str, Any]:
+    """Load the PROVISIONING section of config.json, falling back to defaults."""
+    provisioning_config = dict(DEFAULT_PROVISIONING_CONFIG)
+    try:
+        with open('config.json', 'r') as f:
+            config = json.load(f)
+        provisioning_config.update(config.get('BOT', {}).get('PROVISIONING', {}))
+    except Exception as e:
+        logger.warning(f"Using default provisioning configuration: {str(e)}")
+    return provisioning_config
+
+
+PROVISIONING_CONFIG = load_provisioning_config()
+
+
+class ProvisionJob:
+    """
+    One droplet to create. ``droplet_params`` are passed to ``Droplet`` as is;
+    the callbacks receive the job (``on_failed`` also the exception).
+
+    A droplet created by a failed job is destroyed before ``on_failed`` runs;
+    ``orphaned`` is set when that destroy failed and the droplet still exists.
+    """
+
+    def __init__(self, token: str, droplet_params: Dict[str, Any],
+                 on_update: Optional[Callable[['ProvisionJob'], None]] = None,
+                 on_ready: Optional[Callable[['ProvisionJob'], None]] = None,
+                 on_failed: Optional[Callable[['ProvisionJob', Exception], None]] = None):
+        self.token = token
+        self.droplet_params = droplet_params
+        self.on_update = on_update
+        self.on_ready = on_ready
+        self.on_failed = on_failed
+
+        self.stage = 'queued'
+        self.position = 0
+        self.droplet = None
+        self.orphaned = False
+        self.error: Optional[Exception] = None
+        self.timings: Dict[str, float] = {}
+        self._stage_started = time.monotonic()
+        # Urutkan callback agar update posisi antrian tidak menimpa tahap berikutnya
+        self.lock = threading.Lock()
+
+    def enter(self, stage: str) -> None:
+        now = time.monotonic()
+        self.timings[self.stage] = now - self._stage_started
+        self.stage = stage
+        self._stage_started = now
+
+
+def format_progress(job: ProvisionJob) -> str:
+    """Stage lines for the order message: finished stages with their timings, then the current one."""
+    lines = []
+    for stage in STAGES:
+        if stage in job.timings and stage != job.stage:
+            lines.append(f'✔️ {STAGE_LABELS[stage]} ({job.timings[stage]:.0f} detik)')
+    if job.stage == 'queued':
+        lines.append(f'{STAGE_LABELS["queued"]} (posisi {job.position})')
+    elif job.stage != 'ready':
+        lines.append(f'{STAGE_LABELS[job.stage]}...' if job.stage != 'failed' else STAGE_LABELS['failed'])
+    return '\n'.join(lines)
+
+
+class Provisioner:
+    """Worker pool that creates droplets and waits for them to boot."""
+
+    def __init__(self, workers: int = 4, poll_interval: float = 3, timeout: float = 900):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._pending: Deque[ProvisionJob] = deque()
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+
+        # Metrik
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self._stage_totals: Dict[str, float] = {}
+
+    def start(self) -> None:
+        with self._cond:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            for i in range(len(self._threads), self.workers):
+                thread = threading.Thread(target=self._worker, name=f'provisioning_{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, job: ProvisionJob) -> int:
+        """Queue a job and return its 1-based position."""
+        self.start()
+        with self._cond:
+            self._pending.append(job)
+            job.position = len(self._pending)
+            self._cond.notify()
+        self._notify(job)
+        return job.position
+
+    def _notify(self, job: ProvisionJob, stage: Optional[str] = None) -> None:
+        """Call ``on_update``; with ``stage`` only while the job is still in it."""
+        if job.on_update is None:
+            return
+        with job.lock:
+            if stage is not None and job.stage != stage:
+                return
+            try:
+                job.on_update(job)
+            except Exception as e:
+                logger.error(f"Error in provisioning update callback: {str(e)}")
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                job = self._pending.popleft()
+                queued = list(self._pending)
+                for position, other in enumerate(queued, start=1):
+                    other.position = position
+                self.running += 1
+
+            for other in queued:
+                self._notify(other, stage='queued')
+
+            try:
+                self._run(job)
+            finally:
+                with self._cond:
+                    self.running -= 1
+
+    def _wait(self, job: ProvisionJob, deadline: float, done: Callable[[], bool]) -> None:
+        while not done():
+            if time.monotonic() > deadline:
+                raise Exception(f'Waktu tunggu habis pada tahap {job.stage}')
+            time.sleep(self.poll_interval)
+
+    def _run(self, job: ProvisionJob) -> None:
+        deadline = time.monotonic() + self.timeout
+        try:
+            job.enter('creating')
+            self._notify(job)
+            droplet = job.droplet = clients.droplet(job.token, **job.droplet_params)
+            droplet.create()
+
+            # Status aksi dipantau watcher bersama, bukan polling per job
+            for action_id in droplet.action_ids:
+                action = watcher.wait(job.token, action_id, timeout=max(deadline - time.monotonic(), 0))
+                if action.get('status') != 'completed':
+                    raise Exception('Aksi pembuatan VPS gagal')
+
+            job.enter('booting')
+            self._notify(job)
+
+            def has_ip() -> bool:
+                droplet.load()
+                return bool(droplet.ip_address)
+
+            self._wait(job, deadline, has_ip)
+            job.enter('ready')
+        except Exception as e:
+            job.error = e
+            job.enter('failed')
+            with self._cond:
+                self.failed += 1
+            logger.error(f"Provisioning failed after {sum(job.timings.values()):.1f}s: {str(e)}")
+            self._discard(job)
+            if job.on_failed is not None:
+                try:
+                    job.on_failed(job, e)
+                except Exception as callback_error:
+                    logger.error(f"Error in provisioning failure callback: {str(callback_error)}")
+            return
+
+        with self._cond:
+            self.completed += 1
+            for stage, seconds in job.timings.items():
+                self._stage_totals[stage] = self._stage_totals.get(stage, 0.0) + seconds
+        timings = ', '.join(f'{stage} {seconds:.1f}s' for stage, seconds in job.timings.items())
+        logger.info(f"Provisioned droplet {droplet.id}: {timings}")
+        if job.on_ready is not None:
+            try:
+                job.on_ready(job)
+            except Exception as e:
+                logger.error(f"Error in provisioning ready callback: {str(e)}")
+
+    @staticmethod
+    def _discard(job: ProvisionJob) -> None:
+        """Destroy the droplet of a failed job so it is not billed without an owner."""
+        if job.droplet is None or not getattr(job.droplet, 'id', None):
+            return
+        try:
+            job.droplet.destroy()
+            logger.info(f"Destroyed droplet {job.droplet.id} of a failed provisioning job")
+        except Exception as e:
+            job.orphaned = True
+            logger.error(f"Could not destroy droplet {job.droplet.id} of a failed provisioning job, "
+                         f"remove it manually: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'queued': len(self._pending),
+                'running': self.running,
+                'completed': self.completed,
+                'failed': self.failed,
+                'avg_stage_seconds': {
+                    stage: total / self.completed for stage, total in self._stage_totals.items()
+                } if self.completed else {},
+            }
+
+
+provisioner = Provisioner(
+    workers=int(PROVISIONING_CONFIG.get('WORKERS', 4)),
+    poll_interval=float(PROVISIONING_CONFIG.get('POLL_INTERVAL', 3)),
+    timeout=float(PROVISIONING_CONFIG.get('TIMEOUT', 900))
+)
+
+
+def create_batch(token: str, names: List[str], droplet_params: Dict[str, Any],
+                 on_progress: Optional[Callable[[int, int], None]] = None) -> List[Dict[str, Any]]:
+    """
+    Create one droplet per name with DigitalOcean multi-create requests
+    (MULTI_CREATE_LIMIT names each, sent in parallel), wait for all create
+    actions together through the watcher, then for the IPs with one droplet
+    listing per poll. ``droplet_params`` holds the API fields ``region``,
+    ``size`` and ``image``. Every droplet gets its own root password.
+
+    Returns ``{'name', 'id', 'ip', 'password', 'error', 'orphaned'}`` per name,
+    in order. Droplets of failed names are destroyed; ``orphaned`` marks those
+    that could not be.
+    ``on_progress(ready, total)`` is called on every IP poll. API errors are
+    recorded per name instead of raised, so the passwords are never lost.
+    """
+    deadline = time.monotonic() + provisioner.timeout
+    results = {
+        name: {'name': name, 'id': None, 'ip': None, 'password': password_generator(), 'error': None,
+               'orphaned': False}
+        for name in names
+    }
+    chunks = [names[i:i + MULTI_CREATE_LIMIT] for i in range(0, len(names), MULTI_CREATE_LIMIT)]
+
+    def create_chunk(chunk: List[str]) -> Dict[str, Any]:
+        return clients.manager(token).get_data('droplets/', type=POST, params={
+            **droplet_params,
+            'names': chunk,
+            'user_data': set_root_passwords_script({name: results[name]['password'] for name in chunk})
+        })
+
+    action_ids = []
+    by_id: Dict[int, Dict[str, Any]] = {}
+    with ThreadPoolExecutor(max_workers=min(len(chunks), provisioner.workers) or 1,
+                            thread_name_prefix='create_batch') as pool:
+        futures = {pool.submit(create_chunk, chunk): chunk for chunk in chunks}
+        for future, chunk in futures.items():
+            try:
+                data = future.result()
+            except Exception as e:
+                for name in chunk:
+                    results[name]['error'] = str(e)
+                continue
+            for droplet in data.get('droplets', []):
+                results[droplet['name']]['id'] = droplet['id']
+                by_id[droplet['id']] = results[droplet['name']]
+            action_ids.extend(action['id'] for action in data.get('links', {}).get('actions', []))
+
+    # Semua aksi create ditunggu bersamaan oleh watcher bersama
+    finished: Dict[int, Dict[str, Any]] = {}
+    done = threading.Condition()
+
+    def on_finished(action: Dict[str, Any]):
+        with done:
+            finished[action['id']] = action
+            done.notify()
+
+    for action_id in action_ids:
+        watcher.watch(token, action_id, on_finished)
+    with done:
+        while len(finished) < len(action_ids) and time.monotonic() < deadline:
+            done.wait(deadline - time.monotonic())
+    for action_id in action_ids:
+        if action_id not in finished:
+            watcher.unwatch(token, action_id, on_finished)
+
+    for action in finished.values():
+        result = by_id.get(action.get('resource_id'))
+        if result is not None and action.get('status') != 'completed':
+            result['error'] = 'Aksi pembuatan VPS gagal'
+
+    waiting = {droplet_id: result for droplet_id, result in by_id.items() if result['error'] is None}
+    total = len(waiting)
+    while waiting and time.monotonic() < deadline:
+        try:
+            droplets = clients.manager(token).get_all_droplets()
+        except Exception as e:
+            # Gangguan sementara (atau RateLimited): password droplet yang sudah ada jangan sampai hilang
+            logger.warning(f"Error polling IPs of bulk droplets: {str(e)}")
+            droplets = []
+        for droplet in droplets:
+            if droplet.id in waiting and droplet.ip_address:
+                waiting.pop(droplet.id)['ip'] = droplet.ip_address
+        if on_progress is not None:
+            on_progress(total - len(waiting), total)
+        if waiting:
+            time.sleep(provisioner.poll_interval)
+    for result in waiting.values():
+        result['error'] = 'Waktu tunggu habis'
+
+    # Droplet nama yang gagal tetap ditagih tanpa pemilik: hapus seperti Provisioner._discard
+    for droplet_id, result in by_id.items():
+        if result['error'] is None:
+            continue
+        try:
+            clients.droplet(token, id=droplet_id).destroy()
+            logger.info(f"Destroyed droplet {droplet_id} of a failed bulk create")
+        except Exception as e:
+            result['orphaned'] = True
+            logger.error(f"Could not destroy droplet {droplet_id} of a failed bulk create, "
+                         f"remove it manually: {str(e)}")
+
+    return [results[name] for name in names]
@@ -0,0 +1,228 @@
+"""
+Pembatas request DigitalOcean per akun.
+
+Setiap akun punya dua anggaran: kuota per jam yang diisi ulang dari header
+``RateLimit-Remaining``/``RateLimit-Reset`` setiap respons, dan token bucket
+per menit untuk meredam lonjakan. Request prioritas rendah (refresh katalog,
+tes batch) berhenti lebih awal dan menyisakan ``LOW_PRIORITY_RESERVE`` dari
+anggaran untuk handler pengguna; jika harus menunggu terlalu lama request
+ditolak dengan ``RateLimited`` alih-alih dikirim dan gagal di API.
+"""
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Mapping, Optional
+
+logger = logging.getLogger('rate_limit')
+
+DEFAULT_RATE_LIMIT_CONFIG: Dict[str, Any] = {
+    # Batas DigitalOcean per token
+    'HOURLY_LIMIT': 5000,
+    'MINUTE_LIMIT': 250,
+    # Bagian anggaran yang tidak boleh dipakai request prioritas rendah
+    'LOW_PRIORITY_RESERVE': 0.2,
+    # Waktu tunggu maksimum sebelum request ditolak (detik)
+    'MAX_WAIT': 10,
+    'LOW_PRIORITY_MAX_WAIT': 30,
+}
+
+HIGH = 'high'
+LOW = 'low'
+
+
+def load_rate_limit_config() -> Dict[str, Any]:
+    """Load the RATE_LIMIT section of config.json, falling back to defaults."""
+    rate_limit_config = dict(DEFAULT_RATE_LIMIT_CONFIG)
+    try:
+        with open('config.json', 'r') as f:
+            config = json.load(f)
+        rate_limit_config.update(config.get('BOT', {}).get('RATE_LIMIT', {}))
+    except Exception as e:
+        logger.warning(f"Using default rate limit configuration: {str(e)}")
+    return rate_limit_config
+
+
+RATE_LIMIT_CONFIG = load_rate_limit_config()
+
+
+class RateLimited(Exception):
+    """The account has no request budget left for this call."""
+
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(f'Batas request API akun ini tercapai, coba lagi dalam {retry_after:.0f} detik')
+
+
+class _Budget:
+    __slots__ = ('limit', 'remaining', 'reset_at', 'tokens', 'refilled_at', 'waiting_high')
+
+    def __init__(self, hourly_limit: int, minute_limit: int):
+        self.limit = hourly_limit
+        self.remaining = float(hourly_limit)
+        # Waktu epoch saat kuota per jam terisi lagi (dari RateLimit-Reset)
+        self.reset_at = time.time() + 3600
+        self.tokens = float(minute_limit)
+        self.refilled_at = time.monotonic()
+        self.waiting_high = 0
+
+
+class RateLimiter:
+    """Per-account request budgets keyed by token fingerprint."""
+
+    def __init__(self, hourly_limit: int = 5000, minute_limit: int = 250, low_priority_reserve: float = 0.2,
+                 max_wait: float = 10, low_priority_max_wait: float = 30):
+        self.hourly_limit = hourly_limit
+        self.minute_limit = minute_limit
+        self.low_priority_reserve = low_priority_reserve
+        self.max_wait = max_wait
+        self.low_priority_max_wait = low_priority_max_wait
+        self._budgets: Dict[str, _Budget] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        # Metrik
+        self.acquired = 0
+        self.waited = 0
+        self.shed = 0
+        self.throttled = 0
+
+    @contextmanager
+    def low_priority(self) -> Iterator[None]:
+        """Mark the API calls made by the current thread as background work."""
+        previous = getattr(self._local, 'priority', HIGH)
+        self._local.priority = LOW
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def priority(self) -> str:
+        return getattr(self._local, 'priority', HIGH)
+
+    def _budget(self, fingerprint: str) -> _Budget:
+        budget = self._budgets.get(fingerprint)
+        if budget is None:
+            budget = self._budgets[fingerprint] = _Budget(self.hourly_limit, self.minute_limit)
+        return budget
+
+    def _refill(self, budget: _Budget) -> None:
+        now = time.monotonic()
+        budget.tokens = min(budget.tokens + (now - budget.refilled_at) * self.minute_limit / 60, self.minute_limit)
+        budget.refilled_at = now
+        if budget.reset_at <= time.time():
+            budget.remaining = float(budget.limit)
+            budget.reset_at = time.time() + 3600
+
+    def _delay(self, budget: _Budget, priority: str) -> float:
+        """Seconds until a call of ``priority`` may be sent; 0 when it may go now."""
+        reserve = self.low_priority_reserve if priority == LOW else 0
+        if priority == LOW and budget.waiting_high:
+            return 1
+        if budget.remaining < 1 + budget.limit * reserve:
+            return max(budget.reset_at - time.time(), 1)
+        needed = 1 + self.minute_limit * reserve
+        if budget.tokens < needed:
+            return (needed - budget.tokens) * 60 / self.minute_limit
+        return 0
+
+    def acquire(self, fingerprint: str) -> None:
+        """Take one request from the account's budget, waiting or raising ``RateLimited``."""
+        priority = self.priority()
+        max_wait = self.low_priority_max_wait if priority == LOW else self.max_wait
+        deadline = time.monotonic() + max_wait
+        waiting = False
+        # Anggaran yang menghitung request ini di waiting_high; forget() bisa menggantinya saat menunggu
+        counted: Optional[_Budget] = None
+
+        try:
+            while True:
+                with self._lock:
+                    budget = self._budget(fingerprint)
+                    self._refill(budget)
+                    delay = self._delay(budget, priority)
+                    if not delay:
+                        budget.remaining -= 1
+                        budget.tokens -= 1
+                        self.acquired += 1
+                        return
+                    if time.monotonic() + delay > deadline:
+                        self.shed += 1
+                        raise RateLimited(delay)
+                    if not waiting:
+                        waiting = True
+                        self.waited += 1
+                    if priority == HIGH and budget is not counted:
+                        if counted is not None:
+                            counted.waiting_high -= 1
+                        budget.waiting_high += 1
+                        counted = budget
+                time.sleep(min(delay, 1))
+        finally:
+            if counted is not None:
+                with self._lock:
+                    counted.waiting_high -= 1
+
+    def update(self, fingerprint: str, status_code: int, headers: Mapping[str, str]) -> None:
+        """Sync the hourly budget with the RateLimit headers of a response."""
+        try:
+            limit = int(headers['RateLimit-Limit'])
+            remaining = int(headers['RateLimit-Remaining'])
+            reset_at = float(headers['RateLimit-Reset'])
+        except (KeyError, ValueError):
+            limit = remaining = reset_at = None
+
+        with self._lock:
+            budget = self._budget(fingerprint)
+            if remaining is not None:
+                budget.limit = limit
+                # Respons bisa datang tidak berurutan: dalam satu jendela ambil sisa terkecil
+                if reset_at > budget.reset_at + 1:
+                    budget.remaining = float(remaining)
+                else:
+                    budget.remaining = min(budget.remaining, float(remaining))
+                budget.reset_at = reset_at
+            if status_code == 429:
+                self.throttled += 1
+                # Kuota per jam masih ada berarti batas per menit yang tercapai
+                budget.tokens = 0
+                logger.warning(f"DigitalOcean rate limit hit, {budget.remaining:.0f} requests left this hour")
+
+    def forget(self, fingerprint: str) -> None:
+        with self._lock:
+            self._budgets.pop(fingerprint, None)
+
+    def budget(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Current budget of one account, or None before its first request."""
+        with self._lock:
+            budget = self._budgets.get(fingerprint)
+            if budget is None:
+                return None
+            self._refill(budget)
+            return {
+                'limit': budget.limit,
+                'remaining': max(int(budget.remaining), 0),
+                'reset_in': max(budget.reset_at - time.time(), 0),
+                'minute_tokens': max(int(budget.tokens), 0),
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            accounts = len(self._budgets)
+        return {
+            'accounts': accounts,
+            'acquired': self.acquired,
+            'waited': self.waited,
+            'shed': self.shed,
+            'throttled': self.throttled,
+        }
+
+
+rate_limiter = RateLimiter(
+    hourly_limit=int(RATE_LIMIT_CONFIG.get('HOURLY_LIMIT', 5000)),
+    minute_limit=int(RATE_LIMIT_CONFIG.get('MINUTE_LIMIT', 250)),
+    low_priority_reserve=float(RATE_LIMIT_CONFIG.get('LOW_PRIORITY_RESERVE', 0.2)),
+    max_wait=float(RATE_LIMIT_CONFIG.get('MAX_WAIT', 10)),
+    low_priority_max_wait=float(RATE_LIMIT_CONFIG.get('LOW_PRIORITY_MAX_WAIT', 30))
+)
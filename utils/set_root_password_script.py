@@ -1,6 +1,24 @@
+from typing import Dict
+
+
 def set_root_password_script(password: str):
     return '#!/bin/bash\n' \
            f'echo root:{password} | sudo chpasswd root\n' \
            'sudo sed -i "s/^.*PermitRootLogin.*/PermitRootLogin yes/g" /etc/ssh/sshd_config\n' \
            'sudo sed -i "s/^.*PasswordAuthentication.*/PasswordAuthentication yes/g" /etc/ssh/sshd_config\n' \
            'sudo systemctl restart sshd\n'
+
+
+def set_root_passwords_script(passwords: Dict[str, str]):
+    """One user_data for a multi-create request: each droplet picks its password by hostname."""
+    script = '#!/bin/bash\n' \
+             'case "$(hostname | tr \'[:upper:]\' \'[:lower:]\')" in\n'
+    for name, password in passwords.items():
+        script += f'  {name.lower()}) PASSWORD={password} ;;\n'
+    script += 'esac\n' \
+              '[ -n "$PASSWORD" ] || exit 1\n' \
+              'echo root:$PASSWORD | sudo chpasswd root\n' \
+              'sudo sed -i "s/^.*PermitRootLogin.*/PermitRootLogin yes/g" /etc/ssh/sshd_config\n' \
+              'sudo sed -i "s/^.*PasswordAuthentication.*/PasswordAuthentication yes/g" /etc/ssh/sshd_config\n' \
+              'sudo systemctl restart sshd\n'
+    return script
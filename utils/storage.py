@@ -0,0 +1,943 @@
+import os
+import json
+import glob
+import zlib
+import shutil
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from functools import partial, reduce, wraps
+from operator import and_
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from tinydb import TinyDB, where
+from tinydb.storages import JSONStorage
+from tinydb.table import Document
+
+from utils.writer import StorageWriter
+
+logger = logging.getLogger('storage')
+
+# Lokasi file JSON lama (TinyDB) untuk tiap tabel logis: (nama file, nama tabel TinyDB)
+LEGACY_JSON_LAYOUT: Dict[str, Tuple[str, str]] = {
+    'users': ('users.json', '_default'),
+    'transactions': ('transactions.json', '_default'),
+    'user_droplets': ('user_droplets.json', '_default'),
+    'accounts': ('db.json', 'Accounts'),
+}
+
+DEFAULT_STORAGE_CONFIG: Dict[str, Any] = {
+    'BACKEND': 'sqlite',
+    'PATH': os.path.join('data', 'digibot.sqlite3'),
+    'JSON_DIR': '.',
+    # full: fsync setiap commit, normal: SQLite synchronous=NORMAL / file JSON tanpa fsync per commit, off: tanpa fsync
+    'DURABILITY': 'normal',
+    # Jumlah maksimum penulisan yang digabung dalam satu commit
+    'MAX_BATCH': 256,
+    # Waktu tunggu (ms) untuk mengumpulkan penulisan lain sebelum commit
+    'COMMIT_WINDOW_MS': 0,
+    # Backend json: jumlah file shard untuk tabel per pengguna (0 = satu file seperti dulu)
+    'JSON_SHARDS': 0,
+    # Kompaksi + snapshot berkala (jam, 0 = nonaktif) dan jumlah snapshot yang disimpan
+    'MAINTENANCE_INTERVAL_HOURS': 24,
+    'BACKUP_DIR': os.path.join('data', 'backups'),
+    'BACKUP_KEEP': 7,
+}
+
+# Tabel yang dipecah per pengguna pada backend json: nama tabel -> field kunci shard
+SHARD_KEYS: Dict[str, str] = {
+    'users': 'id',
+    'ledger': 'user_id',
+}
+
+# Tabel berisi rahasia yang tidak ikut snapshot (password root droplet warm pool)
+SNAPSHOT_EXCLUDE = ('warm_pool',)
+
+SQLITE_SYNCHRONOUS = {'full': 'FULL', 'normal': 'NORMAL', 'off': 'OFF'}
+
+# Header file msgpack: magic + versi format
+MSGPACK_MAGIC = b'DGBM'
+MSGPACK_VERSION = 1
+
+
+def load_storage_config() -> Dict[str, Any]:
+    """Load the STORAGE section of config.json, falling back to defaults."""
+    storage_config = dict(DEFAULT_STORAGE_CONFIG)
+    try:
+        with open('config.json', 'r') as f:
+            config = json.load(f)
+        storage_config.update(config.get('BOT', {}).get('STORAGE', {}))
+    except Exception as e:
+        logger.warning(f"Using default storage configuration: {str(e)}")
+    # Gagal saat start, bukan saat penulisan pertama
+    if str(storage_config.get('BACKEND', 'sqlite')).lower() == 'msgpack' and msgpack is None:
+        raise Exception("STORAGE.BACKEND is msgpack but the msgpack package is not installed (pip install msgpack)")
+    return storage_config
+
+
+STORAGE_CONFIG = load_storage_config()
+
+# Index satu field ('user_id') atau gabungan beberapa field (('user_id', 'timestamp'))
+IndexSpec = Union[str, Tuple[str, ...]]
+# Posisi halaman untuk seek(): (nilai field urutan, doc_id)
+Cursor = Tuple[Any, int]
+
+
+class Table:
+    """Document table with the small query surface the DB classes need."""
+
+    def ensure_indexes(self, indexes: Iterable[IndexSpec]) -> None:
+        """Create lookup indexes where the backend supports them."""
+
+    def insert(self, document: Dict[str, Any], doc_id: Optional[int] = None) -> int:
+        raise NotImplementedError
+
+    def insert_multiple(self, documents: Iterable[Dict[str, Any]]) -> List[int]:
+        return [self.insert(document) for document in documents]
+
+    def get(self, doc_id: int) -> Optional[Document]:
+        raise NotImplementedError
+
+    def find(self, filters: Dict[str, Any]) -> Optional[Document]:
+        """Return the first document whose fields equal ``filters``."""
+        documents = self.search(filters, limit=1)
+        return documents[0] if documents else None
+
+    def search(self, filters: Dict[str, Any], order_by: Optional[str] = None,
+               desc: bool = False, limit: Optional[int] = None) -> List[Document]:
+        raise NotImplementedError
+
+    def seek(self, filters: Dict[str, Any], order_by: str, limit: int,
+             before: Optional[Cursor] = None, after: Optional[Cursor] = None) -> List[Document]:
+        """
+        Keyset pagination on ``(order_by, doc_id)``, returned newest first.
+
+        ``before`` returns the page just older than the cursor, ``after`` the page
+        just newer than it; without either the newest page is returned.
+        """
+        raise NotImplementedError
+
+    def all(self) -> List[Document]:
+        return self.search({})
+
+    def update(self, fields: Dict[str, Any], filters: Optional[Dict[str, Any]] = None,
+               doc_ids: Optional[Iterable[int]] = None) -> None:
+        raise NotImplementedError
+
+    def unset(self, fields: Iterable[str], doc_ids: Iterable[int]) -> None:
+        """Delete ``fields`` from the given documents."""
+        raise NotImplementedError
+
+    def remove(self, filters: Optional[Dict[str, Any]] = None,
+               doc_ids: Optional[Iterable[int]] = None) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        return len(self.all())
+
+
+class SQLiteTable(Table):
+    """Table stored as JSON documents in SQLite with expression indexes."""
+
+    def __init__(self, backend: 'SQLiteBackend', name: str, indexes: Iterable[IndexSpec] = ()):
+        self.backend = backend
+        self.name = name
+        self._indexes = set()
+
+        with backend.lock:
+            backend.conn.execute(
+                f'CREATE TABLE IF NOT EXISTS "{name}" ('
+                'doc_id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'data TEXT NOT NULL)'
+            )
+        self.ensure_indexes(indexes)
+
+    def ensure_indexes(self, indexes: Iterable[IndexSpec]) -> None:
+        missing = [
+            fields for fields in ((index,) if isinstance(index, str) else tuple(index) for index in indexes)
+            if fields not in self._indexes
+        ]
+        if not missing:
+            return
+        with self.backend.lock:
+            for fields in missing:
+                columns = ', '.join(self._field(field) for field in fields)
+                self.backend.conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS "{self.name}_{"_".join(fields)}" '
+                    f'ON "{self.name}" ({columns})'
+                )
+                self._indexes.add(fields)
+
+    @staticmethod
+    def _field(field: str) -> str:
+        return f"json_extract(data, '$.{field}')"
+
+    def _where(self, filters: Optional[Dict[str, Any]],
+               doc_ids: Optional[Iterable[int]] = None) -> Tuple[str, list]:
+        clauses = []
+        params = []
+        for field, value in (filters or {}).items():
+            clauses.append(f'{self._field(field)} = ?')
+            params.append(value)
+        if doc_ids is not None:
+            doc_ids = [int(doc_id) for doc_id in doc_ids]
+            clauses.append(f'doc_id IN ({", ".join("?" * len(doc_ids))})')
+            params.extend(doc_ids)
+        if not clauses:
+            return '', params
+        return ' WHERE ' + ' AND '.join(clauses), params
+
+    @staticmethod
+    def _document(row) -> Document:
+        return Document(json.loads(row[1]), doc_id=row[0])
+
+    def insert(self, document: Dict[str, Any], doc_id: Optional[int] = None) -> int:
+        with self.backend.lock:
+            cursor = self.backend.conn.execute(
+                f'INSERT INTO "{self.name}" (doc_id, data) VALUES (?, ?)',
+                (doc_id, json.dumps(dict(document)))
+            )
+            return cursor.lastrowid
+
+    def insert_multiple(self, documents: Iterable[Dict[str, Any]]) -> List[int]:
+        with self.backend.transaction():
+            return [self.insert(document) for document in documents]
+
+    def get(self, doc_id: int) -> Optional[Document]:
+        with self.backend.lock:
+            row = self.backend.conn.execute(
+                f'SELECT doc_id, data FROM "{self.name}" WHERE doc_id = ?',
+                (int(doc_id),)
+            ).fetchone()
+        return self._document(row) if row else None
+
+    def search(self, filters: Dict[str, Any], order_by: Optional[str] = None,
+               desc: bool = False, limit: Optional[int] = None) -> List[Document]:
+        where_sql, params = self._where(filters)
+        sql = f'SELECT doc_id, data FROM "{self.name}"{where_sql}'
+        if order_by:
+            sql += f' ORDER BY {self._field(order_by)} {"DESC" if desc else "ASC"}'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(int(limit))
+        with self.backend.lock:
+            rows = self.backend.conn.execute(sql, params).fetchall()
+        return [self._document(row) for row in rows]
+
+    def seek(self, filters: Dict[str, Any], order_by: str, limit: int,
+             before: Optional[Cursor] = None, after: Optional[Cursor] = None) -> List[Document]:
+        where_sql, params = self._where(filters)
+        key = f'({self._field(order_by)}, doc_id)'
+        direction = 'DESC'
+        if before is not None:
+            where_sql += (' AND ' if where_sql else ' WHERE ') + f'{key} < (?, ?)'
+            params.extend(before)
+        elif after is not None:
+            where_sql += (' AND ' if where_sql else ' WHERE ') + f'{key} > (?, ?)'
+            params.extend(after)
+            direction = 'ASC'
+        sql = (f'SELECT doc_id, data FROM "{self.name}"{where_sql} '
+               f'ORDER BY {self._field(order_by)} {direction}, doc_id {direction} LIMIT ?')
+        params.append(int(limit))
+        with self.backend.lock:
+            rows = self.backend.conn.execute(sql, params).fetchall()
+        documents = [self._document(row) for row in rows]
+        return documents[::-1] if direction == 'ASC' else documents
+
+    def update(self, fields: Dict[str, Any], filters: Optional[Dict[str, Any]] = None,
+               doc_ids: Optional[Iterable[int]] = None) -> None:
+        if not fields:
+            return
+        setters = ', '.join(f"'$.{field}', json(?)" for field in fields)
+        where_sql, params = self._where(filters, doc_ids)
+        values = [json.dumps(value) for value in fields.values()]
+        with self.backend.lock:
+            self.backend.conn.execute(
+                f'UPDATE "{self.name}" SET data = json_set(data, {setters}){where_sql}',
+                values + params
+            )
+
+    def unset(self, fields: Iterable[str], doc_ids: Iterable[int]) -> None:
+        paths = ', '.join(f"'$.{field}'" for field in fields)
+        where_sql, params = self._where(None, doc_ids)
+        with self.backend.lock:
+            self.backend.conn.execute(
+                f'UPDATE "{self.name}" SET data = json_remove(data, {paths}){where_sql}',
+                params
+            )
+
+    def remove(self, filters: Optional[Dict[str, Any]] = None,
+               doc_ids: Optional[Iterable[int]] = None) -> None:
+        where_sql, params = self._where(filters, doc_ids)
+        with self.backend.lock:
+            self.backend.conn.execute(f'DELETE FROM "{self.name}"{where_sql}', params)
+
+    def __len__(self) -> int:
+        with self.backend.lock:
+            return self.backend.conn.execute(f'SELECT COUNT(*) FROM "{self.name}"').fetchone()[0]
+
+
+class TinyDBTable(Table):
+    """Table backed by a TinyDB JSON file (legacy layout)."""
+
+    def __init__(self, table, lock: threading.RLock):
+        self.table = table
+        self.lock = lock
+
+    @staticmethod
+    def _cond(filters: Dict[str, Any]):
+        return reduce(and_, [where(field) == value for field, value in filters.items()])
+
+    def insert(self, document: Dict[str, Any], doc_id: Optional[int] = None) -> int:
+        with self.lock:
+            if doc_id is not None:
+                return self.table.insert(Document(dict(document), doc_id=int(doc_id)))
+            return self.table.insert(dict(document))
+
+    def insert_multiple(self, documents: Iterable[Dict[str, Any]]) -> List[int]:
+        with self.lock:
+            return self.table.insert_multiple([dict(document) for document in documents])
+
+    def get(self, doc_id: int) -> Optional[Document]:
+        with self.lock:
+            return self.table.get(doc_id=int(doc_id))
+
+    def search(self, filters: Dict[str, Any], order_by: Optional[str] = None,
+               desc: bool = False, limit: Optional[int] = None) -> List[Document]:
+        with self.lock:
+            documents = self.table.search(self._cond(filters)) if filters else self.table.all()
+        if order_by:
+            documents = sorted(documents, key=lambda x: x.get(order_by, 0), reverse=desc)
+        if limit is not None:
+            documents = documents[:limit]
+        return documents
+
+    def seek(self, filters: Dict[str, Any], order_by: str, limit: int,
+             before: Optional[Cursor] = None, after: Optional[Cursor] = None) -> List[Document]:
+        with self.lock:
+            documents = self.table.search(self._cond(filters)) if filters else self.table.all()
+        key = lambda x: (x.get(order_by, 0), x.doc_id)
+        documents = sorted(documents, key=key, reverse=True)
+        if before is not None:
+            return [document for document in documents if key(document) < tuple(before)][:limit]
+        if after is not None:
+            return [document for document in documents if key(document) > tuple(after)][-limit:]
+        return documents[:limit]
+
+    def update(self, fields: Dict[str, Any], filters: Optional[Dict[str, Any]] = None,
+               doc_ids: Optional[Iterable[int]] = None) -> None:
+        with self.lock:
+            if doc_ids is not None:
+                self.table.update(fields, doc_ids=[int(doc_id) for doc_id in doc_ids])
+            elif filters:
+                self.table.update(fields, self._cond(filters))
+            else:
+                self.table.update(fields)
+
+    def unset(self, fields: Iterable[str], doc_ids: Iterable[int]) -> None:
+        fields = list(fields)
+
+        def transform(document):
+            for field in fields:
+                document.pop(field, None)
+
+        with self.lock:
+            self.table.update(transform, doc_ids=[int(doc_id) for doc_id in doc_ids])
+
+    def remove(self, filters: Optional[Dict[str, Any]] = None,
+               doc_ids: Optional[Iterable[int]] = None) -> None:
+        with self.lock:
+            if doc_ids is not None:
+                self.table.remove(doc_ids=[int(doc_id) for doc_id in doc_ids])
+            elif filters:
+                self.table.remove(self._cond(filters))
+            else:
+                self.table.truncate()
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.table)
+
+
+class ShardedTable(Table):
+    """
+    Table split over hash-bucketed TinyDB files keyed by one field (the user id),
+    so a write only rewrites the small shard holding that user.
+
+    The shard is encoded in the doc_id (``doc_id % shards``), which keeps
+    doc_ids unique across shards and makes ``get`` a single-file read.
+    """
+
+    def __init__(self, backend: 'JSONBackend', directory: str, key: str, shards: int):
+        self.backend = backend
+        self.directory = directory
+        self.key = key
+        self.shards = shards
+        self.lock = backend.lock
+        self._tables: Dict[int, TinyDBTable] = {}
+        self._next_ids: Dict[int, int] = {}
+        self._check_manifest()
+
+    def _check_manifest(self) -> None:
+        """Write index.json once and refuse to reopen with a different shard count."""
+        path = os.path.join(self.directory, 'index.json')
+        manifest = {'key': self.key, 'shards': self.shards}
+        with self.lock:
+            if os.path.exists(path):
+                with open(path, 'r') as f:
+                    existing = json.load(f)
+                if existing != manifest:
+                    raise ValueError(f"{self.directory} was created with {existing}, not {manifest}")
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump(manifest, f)
+
+    def shard_for(self, value: Any) -> int:
+        return zlib.crc32(str(value).encode()) % self.shards
+
+    def _shard(self, shard: int) -> TinyDBTable:
+        with self.lock:
+            table = self._tables.get(shard)
+            if table is None:
+                path = os.path.join(self.directory, f'{shard:03d}{self.backend.extension}')
+                table = self._tables[shard] = TinyDBTable(self.backend.open_db(path).table('_default'), self.lock)
+            return table
+
+    def _targets(self, filters: Optional[Dict[str, Any]]) -> List[TinyDBTable]:
+        if filters and self.key in filters:
+            return [self._shard(self.shard_for(filters[self.key]))]
+        return [self._shard(shard) for shard in range(self.shards)]
+
+    def _by_shard(self, doc_ids: Iterable[int]) -> Dict[int, List[int]]:
+        grouped: Dict[int, List[int]] = {}
+        for doc_id in doc_ids:
+            grouped.setdefault(int(doc_id) % self.shards, []).append(int(doc_id))
+        return grouped
+
+    def insert(self, document: Dict[str, Any], doc_id: Optional[int] = None) -> int:
+        shard = self.shard_for(document.get(self.key))
+        with self.lock:
+            if doc_id is not None and int(doc_id) % self.shards != shard:
+                raise ValueError(f"doc_id {doc_id} does not belong to shard {shard}")
+            if shard not in self._next_ids:
+                existing = [row.doc_id for row in self._shard(shard).all()]
+                self._next_ids[shard] = max(existing, default=shard) + self.shards
+            if doc_id is None:
+                doc_id = self._next_ids[shard]
+            self._next_ids[shard] = max(self._next_ids[shard], int(doc_id) + self.shards)
+            return self._shard(shard).insert(document, doc_id=doc_id)
+
+    def get(self, doc_id: int) -> Optional[Document]:
+        return self._shard(int(doc_id) % self.shards).get(doc_id)
+
+    def search(self, filters: Dict[str, Any], order_by: Optional[str] = None,
+               desc: bool = False, limit: Optional[int] = None) -> List[Document]:
+        targets = self._targets(filters)
+        if len(targets) == 1:
+            return targets[0].search(filters, order_by, desc, limit)
+        documents = [document for table in targets for document in table.search(filters, order_by, desc, limit)]
+        if order_by:
+            documents.sort(key=lambda x: x.get(order_by, 0), reverse=desc)
+        return documents[:limit] if limit is not None else documents
+
+    def seek(self, filters: Dict[str, Any], order_by: str, limit: int,
+             before: Optional[Cursor] = None, after: Optional[Cursor] = None) -> List[Document]:
+        targets = self._targets(filters)
+        if len(targets) == 1:
+            return targets[0].seek(filters, order_by, limit, before, after)
+        documents = [document for table in targets for document in table.seek(filters, order_by, limit, before, after)]
+        documents.sort(key=lambda x: (x.get(order_by, 0), x.doc_id), reverse=True)
+        return documents[-limit:] if after is not None else documents[:limit]
+
+    def update(self, fields: Dict[str, Any], filters: Optional[Dict[str, Any]] = None,
+               doc_ids: Optional[Iterable[int]] = None) -> None:
+        if doc_ids is not None:
+            for shard, ids in self._by_shard(doc_ids).items():
+                self._shard(shard).update(fields, filters, ids)
+            return
+        for table in self._targets(filters):
+            table.update(fields, filters)
+
+    def unset(self, fields: Iterable[str], doc_ids: Iterable[int]) -> None:
+        fields = list(fields)
+        for shard, ids in self._by_shard(doc_ids).items():
+            self._shard(shard).unset(fields, ids)
+
+    def remove(self, filters: Optional[Dict[str, Any]] = None,
+               doc_ids: Optional[Iterable[int]] = None) -> None:
+        if doc_ids is not None:
+            for shard, ids in self._by_shard(doc_ids).items():
+                self._shard(shard).remove(doc_ids=ids)
+            return
+        for table in self._targets(filters):
+            table.remove(filters)
+
+    def __len__(self) -> int:
+        return sum(len(self._shard(shard)) for shard in range(self.shards))
+
+
+class SQLiteBackend:
+    """SQLite database in WAL mode holding every bot table."""
+
+    # savepoint() hanya membatalkan blok yang gagal
+    supports_savepoints = True
+
+    def __init__(self, path: str, durability: str = 'normal'):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(f'PRAGMA synchronous={SQLITE_SYNCHRONOUS.get(durability, "NORMAL")}')
+        self._depth = 0
+
+    @contextmanager
+    def transaction(self):
+        """Group statements into a single transaction (re-entrant)."""
+        with self.lock:
+            if self._depth == 0:
+                self.conn.execute('BEGIN IMMEDIATE')
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.conn.execute('ROLLBACK')
+                raise
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        self.conn.execute('COMMIT')
+                    except BaseException:
+                        # Mis. SQLITE_BUSY atau disk penuh: tutup transaksi agar BEGIN berikutnya bisa jalan
+                        if self.conn.in_transaction:
+                            self.conn.execute('ROLLBACK')
+                        raise
+
+    @contextmanager
+    def savepoint(self):
+        """Undo only the statements of this block if it raises."""
+        with self.transaction():
+            self.conn.execute('SAVEPOINT job')
+            try:
+                yield self
+            except BaseException:
+                self.conn.execute('ROLLBACK TO job')
+                self.conn.execute('RELEASE job')
+                raise
+            else:
+                self.conn.execute('RELEASE job')
+
+    def table(self, name: str, indexes: Iterable[IndexSpec] = ()) -> SQLiteTable:
+        return SQLiteTable(self, name, indexes)
+
+    def size(self) -> int:
+        """Bytes on disk, including the WAL file."""
+        return sum(os.path.getsize(path) for path in (self.path, f'{self.path}-wal') if os.path.exists(path))
+
+    def compact(self) -> None:
+        """VACUUM the database and truncate the WAL (blocks writes while it runs)."""
+        with self.lock:
+            if self._depth:
+                raise Exception("Cannot compact inside a transaction")
+            self.conn.execute('VACUUM')
+            self.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def snapshot(self, dest: str, pages: int = 256) -> None:
+        """
+        Copy a point-in-time backup to ``dest`` with the online backup API.
+
+        The copy reads through its own connection inside one read transaction,
+        so it sees a consistent state while the writer keeps committing (WAL).
+        """
+        tmp_path = f'{dest}.tmp'
+        source = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        target = sqlite3.connect(tmp_path)
+        try:
+            source.execute('BEGIN')
+            source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+            source.backup(target, pages=pages, sleep=0.005)
+            source.execute('COMMIT')
+            # secure_delete menimpa halaman yang dibebaskan agar isinya tidak tertinggal di file
+            target.execute('PRAGMA secure_delete=ON')
+            for name in SNAPSHOT_EXCLUDE:
+                target.execute(f'DROP TABLE IF EXISTS "{name}"')
+            target.commit()
+        finally:
+            target.close()
+            source.close()
+        os.replace(tmp_path, dest)
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+
+class BufferedJSONStorage(JSONStorage):
+    """
+    TinyDB JSON storage that keeps writes in memory while a backend transaction
+    is open, so each file is written once per commit instead of once per change.
+    """
+
+    def __init__(self, path: str, backend: 'JSONBackend', **kwargs):
+        super().__init__(path, **kwargs)
+        self.path = path
+        self.backend = backend
+        self._pending = None
+
+    def read(self):
+        if self._pending is not None:
+            return self._pending
+        return super().read()
+
+    def _dump(self, data):
+        return json.dumps(data, **self.kwargs)
+
+    def write(self, data) -> None:
+        if self.backend.in_transaction():
+            self._pending = data
+            self.backend.mark_dirty(self)
+        else:
+            self._write(data)
+
+    def _write(self, data) -> None:
+        self._handle.seek(0)
+        self._handle.write(self._dump(data))
+        self._handle.flush()
+        # normal: serahkan ke OS seperti SQLite synchronous=NORMAL; fsync hanya pada full
+        if self.backend.durability == 'full':
+            os.fsync(self._handle.fileno())
+        self._handle.truncate()
+
+    def flush(self) -> None:
+        if self._pending is not None:
+            data, self._pending = self._pending, None
+            self._write(data)
+
+    def discard(self) -> None:
+        self._pending = None
+
+    def compact(self) -> None:
+        """Rewrite the file through a temp file and an atomic rename."""
+        self.flush()
+        data = self.read()
+        if data is None:
+            return
+
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'wb' if 'b' in self._mode else 'w') as f:
+            f.write(self._dump(data))
+            f.flush()
+            if self.backend.durability != 'off':
+                os.fsync(f.fileno())
+        self._handle.close()
+        os.replace(tmp_path, self.path)
+        self._handle = open(self.path, mode=self._mode)
+
+
+def encode_msgpack(data) -> bytes:
+    return MSGPACK_MAGIC + bytes([MSGPACK_VERSION]) + msgpack.packb(data, use_bin_type=True)
+
+
+def decode_msgpack(raw: bytes):
+    if raw[:len(MSGPACK_MAGIC)] != MSGPACK_MAGIC:
+        raise ValueError("Not a DigiBot msgpack database file")
+    version = raw[len(MSGPACK_MAGIC)]
+    if version > MSGPACK_VERSION:
+        raise ValueError(f"Unsupported msgpack database version {version}")
+    return msgpack.unpackb(raw[len(MSGPACK_MAGIC) + 1:], raw=False, strict_map_key=False)
+
+
+class BufferedMsgpackStorage(BufferedJSONStorage):
+    """Same buffering as BufferedJSONStorage, stored as versioned msgpack."""
+
+    def __init__(self, path: str, backend: 'JSONBackend', **kwargs):
+        super().__init__(path, backend, access_mode='rb+', **kwargs)
+
+    def read(self):
+        if self._pending is not None:
+            return self._pending
+        self._handle.seek(0)
+        raw = self._handle.read()
+        return decode_msgpack(raw) if raw else None
+
+    def _dump(self, data) -> bytes:
+        return encode_msgpack(data)
+
+
+class JSONBackend:
+    """
+    TinyDB files using the original one-file-per-database layout, stored as
+    JSON or, with ``file_format='msgpack'``, as versioned msgpack.
+    """
+
+    # Tanpa savepoint: job yang gagal membatalkan seluruh transaksi (lihat StorageWriter)
+    supports_savepoints = False
+
+    def __init__(self, directory: str = '.', durability: str = 'normal', shards: int = 0,
+                 file_format: str = 'json'):
+        if file_format == 'msgpack' and msgpack is None:
+            raise Exception("The msgpack storage backend needs the msgpack package (pip install msgpack)")
+        self.directory = directory
+        self.durability = durability
+        self.shards = shards
+        self.file_format = file_format
+        self.extension = '.msgpack' if file_format == 'msgpack' else '.json'
+        self._storage = BufferedMsgpackStorage if file_format == 'msgpack' else BufferedJSONStorage
+        self.lock = threading.RLock()
+        self._dbs: Dict[str, TinyDB] = {}
+        self._sharded: Dict[str, ShardedTable] = {}
+        self._dirty: List[BufferedJSONStorage] = []
+        self._depth = 0
+
+    def in_transaction(self) -> bool:
+        return self._depth > 0
+
+    def mark_dirty(self, storage: BufferedJSONStorage) -> None:
+        if storage not in self._dirty:
+            self._dirty.append(storage)
+
+    def _discard(self, storages: Iterable[BufferedJSONStorage]) -> None:
+        for storage in storages:
+            storage.discard()
+        # Cache query TinyDB bisa berisi hasil dari tulisan yang dibatalkan
+        for db in self._dbs.values():
+            for name in db.tables():
+                db.table(name).clear_cache()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Buffer every write until the outermost block ends, then write each file once.
+
+        A commit is not atomic across files: if writing one file fails, the
+        files before it are already on disk and the rest are discarded.
+        """
+        with self.lock:
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    dirty, self._dirty = self._dirty, []
+                    self._discard(dirty)
+                raise
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    dirty, self._dirty = self._dirty, []
+                    for i, storage in enumerate(dirty):
+                        try:
+                            storage.flush()
+                        except BaseException:
+                            logger.error(f"Commit stopped after {i} of {len(dirty)} files, "
+                                         f"{os.path.basename(storage.path)} was not written")
+                            self._discard(dirty[i:])
+                            raise
+
+    @contextmanager
+    def savepoint(self):
+        """
+        JSON files have no savepoints: the writes of a failing block stay in the
+        buffered files, so the caller must let the exception abort the whole
+        transaction (StorageWriter does so and replays the other jobs).
+        """
+        with self.transaction():
+            yield self
+
+    def open_db(self, path: str) -> TinyDB:
+        with self.lock:
+            if path not in self._dbs:
+                self._dbs[path] = TinyDB(path, storage=self._storage, backend=self, create_dirs=True)
+            return self._dbs[path]
+
+    def table(self, name: str, indexes: Iterable[IndexSpec] = ()) -> Table:
+        if self.shards and name in SHARD_KEYS:
+            with self.lock:
+                if name not in self._sharded:
+                    self._sharded[name] = ShardedTable(
+                        self, os.path.join(self.directory, name), SHARD_KEYS[name], self.shards
+                    )
+                return self._sharded[name]
+
+        path = os.path.join(self.directory, self.file_name(name))
+        table_name = LEGACY_JSON_LAYOUT.get(name, (None, '_default'))[1]
+        return TinyDBTable(self.open_db(path).table(table_name), self.lock)
+
+    def file_name(self, name: str) -> str:
+        """File holding table ``name``, e.g. ``db.json`` or ``db.msgpack`` for accounts."""
+        file_name = LEGACY_JSON_LAYOUT.get(name, (f'{name}.json', '_default'))[0]
+        return os.path.splitext(file_name)[0] + self.extension
+
+    def files(self) -> List[str]:
+        """Every data file of this backend that exists on disk."""
+        with self.lock:
+            paths = set(self._dbs)
+            paths.update(os.path.join(self.directory, self.file_name(name)) for name in LEGACY_JSON_LAYOUT)
+            if self.shards:
+                for name in SHARD_KEYS:
+                    paths.update(glob.glob(os.path.join(self.directory, name, f'*{self.extension}')))
+                    paths.add(os.path.join(self.directory, name, 'index.json'))
+        return sorted(path for path in paths if os.path.exists(path))
+
+    def size(self) -> int:
+        return sum(os.path.getsize(path) for path in self.files())
+
+    def compact(self) -> None:
+        """Rewrite every data file via temp file + rename, one file at a time."""
+        for path in self.files():
+            if os.path.basename(path) == 'index.json':
+                continue
+            with self.lock:
+                if self._depth:
+                    raise Exception("Cannot compact inside a transaction")
+                self.open_db(path).storage.compact()
+
+    def snapshot(self, dest: str) -> None:
+        """
+        Copy every file except the SNAPSHOT_EXCLUDE tables to the ``dest`` directory.
+
+        The lock is only held while the committed files are read into memory;
+        writing the copy to disk happens without blocking the writer.
+        """
+        with self.lock:
+            if self._depth:
+                raise Exception("Cannot snapshot inside a transaction")
+            excluded = {os.path.join(self.directory, self.file_name(name)) for name in SNAPSHOT_EXCLUDE}
+            contents = {}
+            for path in self.files():
+                if path in excluded:
+                    continue
+                with open(path, 'rb') as f:
+                    contents[os.path.relpath(path, self.directory)] = f.read()
+
+        tmp_dir = f'{dest}.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for relative_path, data in contents.items():
+            target = os.path.join(tmp_dir, relative_path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(data)
+        os.replace(tmp_dir, dest)
+
+    def close(self) -> None:
+        with self.lock:
+            for db in self._dbs.values():
+                db.close()
+            self._dbs.clear()
+            self._sharded.clear()
+
+
+def open_backend(storage_config: Optional[Dict[str, Any]] = None):
+    """Open the storage backend selected in config.json (``BOT.STORAGE``)."""
+    storage_config = storage_config or STORAGE_CONFIG
+    backend = str(storage_config.get('BACKEND', 'sqlite')).lower()
+
+    durability = str(storage_config.get('DURABILITY', 'normal')).lower()
+
+    if backend == 'sqlite':
+        return SQLiteBackend(storage_config.get('PATH', DEFAULT_STORAGE_CONFIG['PATH']), durability)
+    if backend in ('json', 'msgpack'):
+        return JSONBackend(storage_config.get('JSON_DIR', '.'), durability,
+                           int(storage_config.get('JSON_SHARDS', 0)), file_format=backend)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+# Registry: satu backend dan satu handle per tabel untuk seluruh proses
+_backend = None
+_writer: Optional[StorageWriter] = None
+_tables: Dict[str, Table] = {}
+_registry_lock = threading.Lock()
+
+
+def get_backend():
+    """Return the process-wide backend, opening it on first use."""
+    global _backend
+    with _registry_lock:
+        if _backend is None:
+            _backend = open_backend()
+            logger.info(f"Opened {type(_backend).__name__} storage")
+        return _backend
+
+
+def open_table(name: str, indexes: Iterable[IndexSpec] = ()) -> Table:
+    """Return the shared handle for table ``name`` on the process-wide backend."""
+    backend = get_backend()
+    with _registry_lock:
+        table = _tables.get(name)
+        if table is None:
+            table = _tables[name] = backend.table(name)
+    table.ensure_indexes(indexes)
+    return table
+
+
+def get_writer() -> StorageWriter:
+    """Return the process-wide writer thread that applies every mutation."""
+    global _writer
+    backend = get_backend()
+    with _registry_lock:
+        if _writer is None:
+            _writer = StorageWriter(
+                backend,
+                max_batch=int(STORAGE_CONFIG.get('MAX_BATCH', 256)),
+                commit_window=float(STORAGE_CONFIG.get('COMMIT_WINDOW_MS', 0)) / 1000
+            )
+        return _writer
+
+
+def write(fn, *args, **kwargs):
+    """Run ``fn`` on the writer thread and wait until its batch is committed."""
+    return get_writer().submit(partial(fn, *args, **kwargs))
+
+
+def writes(method):
+    """Decorator routing a DB-class mutator through the writer thread."""
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        return write(method, *args, **kwargs)
+    return wrapper
+
+
+def after_commit(callback) -> None:
+    """Run ``callback`` after the current write batch is committed."""
+    writer = _writer
+    if writer is None:
+        callback()
+    else:
+        writer.after_commit(callback)
+
+
+def writer_stats() -> Dict[str, Any]:
+    """Queue depth, batch size and flush latency of the writer thread."""
+    return get_writer().stats()
+
+
+def close_storage() -> None:
+    """Flush pending writes and close the backend; the next open_table() reopens it."""
+    global _backend, _writer
+    with _registry_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.stop()
+        logger.info(f"Storage writer stopped: {writer.stats()}")
+
+    with _registry_lock:
+        if _backend is not None:
+            _backend.close()
+            logger.info(f"Closed {type(_backend).__name__} storage")
+        _backend = None
+        _tables.clear()
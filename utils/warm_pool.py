@@ -0,0 +1,354 @@
+"""
+Warm pool droplet untuk paket auto order yang populer.
+
+Untuk setiap kombinasi (region, ukuran, image) di ``WARM_POOL.PLANS`` bot
+menjaga ``COUNT`` droplet yang sudah dibuat dan menyala. Order yang cocok
+langsung mengambil satu droplet dari pool (diganti namanya, password root
+unik yang dibuat saat droplet disiapkan diberikan ke pembeli) dan pool diisi
+ulang di background lewat worker provisioning yang sedang menganggur, agar
+order pelanggan tidak menunggu di belakang pengisian pool.
+
+Password root disimpan terenkripsi (Fernet, kunci ``WARM_POOL.PASSWORD_KEY``)
+dan tabel ``warm_pool`` tidak ikut snapshot penyimpanan.
+"""
+import json
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, NamedTuple, Optional, Tuple
+
+import digitalocean
+from digitalocean import NotFoundError
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:
+    Fernet = None
+
+from utils.catalog import catalog
+from utils.db import AccountsDB, WarmPoolDB, token_fingerprint
+from utils.droplet_cache import droplet_cache
+from utils.password_generator import password_generator
+from utils.placement import placement
+from utils.provisioning import ProvisionJob, provisioner
+from utils.set_root_password_script import set_root_password_script
+
+logger = logging.getLogger('warm_pool')
+
+DEFAULT_WARM_POOL_CONFIG: Dict[str, Any] = {
+    'ENABLED': False,
+    # Contoh: [{"REGION": "sgp1", "SIZE": "s-1vcpu-1gb", "IMAGE": "ubuntu-22-04-x64", "COUNT": 2}]
+    'PLANS': [],
+    # Jeda maksimum antar pemeriksaan isi pool (detik)
+    'REFILL_INTERVAL': 60,
+    # Kunci Fernet untuk password root di database, buat dengan:
+    # python -c "from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())"
+    'PASSWORD_KEY': '',
+}
+
+PlanKey = Tuple[str, str, str]
+
+
+def load_warm_pool_config() -> Dict[str, Any]:
+    """Load the WARM_POOL section of config.json, falling back to defaults."""
+    warm_pool_config = dict(DEFAULT_WARM_POOL_CONFIG)
+    try:
+        with open('config.json', 'r') as f:
+            config = json.load(f)
+        warm_pool_config.update(config.get('BOT', {}).get('WARM_POOL', {}))
+    except Exception as e:
+        logger.warning(f"Using default warm pool configuration: {str(e)}")
+    return warm_pool_config
+
+
+WARM_POOL_CONFIG = load_warm_pool_config()
+
+
+class WarmDroplet(NamedTuple):
+    account: Dict[str, Any]
+    droplet: digitalocean.Droplet
+    password: str
+    entry: Dict[str, Any]
+
+
+class WarmPool:
+    """Keeps booted droplets per plan and hands them to matching orders."""
+
+    def __init__(self, plans: Dict[PlanKey, int], refill_interval: float = 60, cipher=None):
+        self.plans = plans
+        self.refill_interval = refill_interval
+        self._cipher = cipher
+        self._ready: Dict[PlanKey, Deque[Dict[str, Any]]] = {key: deque() for key in plans}
+        self._filling: Dict[PlanKey, int] = {key: 0 for key in plans}
+        # Waktu droplet diambil order, untuk mengukur jeda sampai penggantinya siap
+        self._vacated: Dict[PlanKey, Deque[float]] = {key: deque() for key in plans}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._loaded = False
+        self._thread: Optional[threading.Thread] = None
+
+        # Metrik
+        self.hits = 0
+        self.misses = 0
+        self.refilled = 0
+        self.refill_failures = 0
+        self._lag_total = 0.0
+        self._lag_count = 0
+        self.max_lag = 0.0
+        # Biaya droplet yang menganggur sebelum diambil order (USD)
+        self._claimed_idle_cost = 0.0
+
+    def _load(self) -> None:
+        with self._lock:
+            if self._loaded:
+                return
+            for entry in WarmPoolDB().all():
+                key = (entry['region'], entry['size'], entry['image'])
+                if key in self._ready:
+                    self._ready[key].append(dict(entry))
+                else:
+                    logger.warning(f"Warm droplet {entry['droplet_id']} belongs to no configured plan")
+            self._loaded = True
+
+    @staticmethod
+    def _discard(account: Dict[str, Any], droplet: digitalocean.Droplet) -> None:
+        """Destroy a warm droplet that can no longer be handed out."""
+        try:
+            droplet.destroy()
+        except Exception as e:
+            logger.error(f"Could not destroy warm droplet {droplet.id}, remove it manually: {str(e)}")
+        droplet_cache.invalidate(account['token'], droplet.id)
+
+    @staticmethod
+    def _idle_cost(entry: Dict[str, Any], until: float) -> float:
+        return max(until - entry.get('ready_at', until), 0) / 3600 * entry.get('price_hourly', 0)
+
+    def claim(self, region_slug: str, size_slug: str, image_slug: str) -> Optional[WarmDroplet]:
+        """Take a ready droplet for the plan, or None when the plan is not pooled or empty."""
+        key = (region_slug, size_slug, image_slug)
+        if key not in self.plans:
+            return None
+        self._load()
+
+        while True:
+            with self._lock:
+                queue = self._ready[key]
+                entry = queue.popleft() if queue else None
+            if entry is None:
+                self.misses += 1
+                self._wake.set()
+                return None
+
+            WarmPoolDB().remove([entry['droplet_id']])
+            account = AccountsDB().get(entry['account_id'])
+            if account is None or token_fingerprint(account['token']) != entry['fingerprint']:
+                logger.warning(f"Warm droplet {entry['droplet_id']} dropped: its account was removed")
+                continue
+
+            try:
+                droplet = droplet_cache.get(account['token'], entry['droplet_id'], refresh=True)
+            except NotFoundError:
+                logger.warning(f"Warm droplet {entry['droplet_id']} dropped: it no longer exists")
+                continue
+            except Exception as e:
+                # Gangguan API: kembalikan ke pool dan buat droplet baru untuk order ini
+                logger.error(f"Error checking warm droplet {entry['droplet_id']}: {str(e)}")
+                self._put_back(entry)
+                self.misses += 1
+                return None
+
+            if droplet.status != 'active' or not droplet.ip_address:
+                logger.warning(f"Warm droplet {entry['droplet_id']} dropped: status {droplet.status}")
+                self._discard(account, droplet)
+                continue
+
+            try:
+                password = self._cipher.decrypt(entry['password'].encode()).decode()
+            except InvalidToken:
+                # PASSWORD_KEY diganti: password droplet ini tidak bisa dibaca lagi
+                logger.warning(f"Warm droplet {entry['droplet_id']} dropped: cannot decrypt its password")
+                self._discard(account, droplet)
+                continue
+
+            with self._lock:
+                self._vacated[key].append(time.monotonic())
+                self._claimed_idle_cost += self._idle_cost(entry, time.time())
+            self.hits += 1
+            self._wake.set()
+            return WarmDroplet(account, droplet, password, entry)
+
+    def _put_back(self, entry: Dict[str, Any]) -> None:
+        WarmPoolDB().add(entry)
+        with self._lock:
+            self._ready[(entry['region'], entry['size'], entry['image'])].appendleft(entry)
+
+    def restore(self, warm: WarmDroplet) -> None:
+        """Undo a claim, e.g. when the order could not be paid."""
+        key = (warm.entry['region'], warm.entry['size'], warm.entry['image'])
+        with self._lock:
+            if self._vacated[key]:
+                self._vacated[key].pop()
+            # Droplet tetap menganggur; biayanya dihitung lagi dari ready_at
+            self._claimed_idle_cost -= self._idle_cost(warm.entry, time.time())
+        self.hits -= 1
+        self._put_back(warm.entry)
+
+    def refill(self) -> None:
+        """Start provisioning jobs for every missing droplet."""
+        self._load()
+        placement.ensure_loaded()
+        # Pelanggan didahulukan: hanya worker provisioning yang menganggur yang dipakai
+        provisioning_stats = provisioner.stats()
+        idle = provisioner.workers - provisioning_stats['running'] - provisioning_stats['queued']
+        for key, count in self.plans.items():
+            with self._lock:
+                missing = count - len(self._ready[key]) - self._filling[key]
+            while missing > 0 and idle > 0:
+                if not self._start_refill(key):
+                    break
+                missing -= 1
+                idle -= 1
+
+    def _start_refill(self, key: PlanKey) -> bool:
+        region_slug, size_slug, image_slug = key
+        account = placement.reserve(region_slug)
+        if account is None:
+            logger.warning(f"No account has room to refill warm pool {key}")
+            return False
+        try:
+            available = catalog.has_size(account['token'], region_slug, size_slug) \
+                and catalog.has_image(account['token'], region_slug, image_slug)
+        except Exception:
+            available = False
+        if not available:
+            placement.release(account)
+            logger.warning(f"Account {account['email']} cannot host warm pool {key}")
+            return False
+
+        password = password_generator()
+
+        def on_ready(job: ProvisionJob):
+            placement.release(account, created=True)
+            entry = {
+                'account_id': account.doc_id,
+                'fingerprint': token_fingerprint(account['token']),
+                'droplet_id': job.droplet.id,
+                'region': region_slug,
+                'size': size_slug,
+                'image': image_slug,
+                'password': self._cipher.encrypt(password.encode()).decode(),
+                'price_hourly': (job.droplet.size or {}).get('price_hourly', 0),
+                'ready_at': time.time(),
+            }
+            WarmPoolDB().add(entry)
+            with self._lock:
+                self._filling[key] -= 1
+                self._ready[key].append(entry)
+                if self._vacated[key]:
+                    lag = time.monotonic() - self._vacated[key].popleft()
+                    self._lag_total += lag
+                    self._lag_count += 1
+                    self.max_lag = max(self.max_lag, lag)
+            self.refilled += 1
+            self._wake.set()
+
+        def on_failed(job: ProvisionJob, e: Exception):
+            placement.release(account, created=job.orphaned)
+            with self._lock:
+                self._filling[key] -= 1
+            self.refill_failures += 1
+            logger.error(f"Warm pool refill {key} failed: {str(e)}")
+
+        with self._lock:
+            self._filling[key] += 1
+        provisioner.submit(ProvisionJob(
+            account['token'],
+            {
+                'name': f'warm-{region_slug}-{int(time.time())}',
+                'region': region_slug,
+                'image': image_slug,
+                'size_slug': size_slug,
+                'user_data': set_root_password_script(password)
+            },
+            on_ready=on_ready,
+            on_failed=on_failed
+        ))
+        return True
+
+    def start(self) -> Optional[threading.Thread]:
+        if not self.plans:
+            logger.info("Warm pool disabled")
+            return None
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+
+        def refill_task():
+            while True:
+                try:
+                    self.refill()
+                except Exception as e:
+                    logger.error(f"Error refilling warm pool: {str(e)}")
+                self._wake.wait(self.refill_interval)
+                self._wake.clear()
+
+        self._thread = threading.Thread(target=refill_task, name='warm_pool_refill', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            entries = [entry for queue in self._ready.values() for entry in queue]
+            filling = sum(self._filling.values())
+            idle_cost = self._claimed_idle_cost + sum(self._idle_cost(entry, now) for entry in entries)
+            avg_lag = self._lag_total / self._lag_count if self._lag_count else 0.0
+        requests = self.hits + self.misses
+        return {
+            'plans': len(self.plans),
+            'ready': len(entries),
+            'filling': filling,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / requests if requests else 0.0,
+            'refilled': self.refilled,
+            'refill_failures': self.refill_failures,
+            'avg_refill_lag': avg_lag,
+            'max_refill_lag': self.max_lag,
+            'idle_cost': idle_cost,
+        }
+
+
+def _load_plans(config: Dict[str, Any]) -> Dict[PlanKey, int]:
+    plans: Dict[PlanKey, int] = {}
+    if not config.get('ENABLED'):
+        return plans
+    for plan in config.get('PLANS', []):
+        try:
+            plans[(plan['REGION'], plan['SIZE'], plan['IMAGE'])] = int(plan.get('COUNT', 1))
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Ignoring invalid warm pool plan {plan}: {str(e)}")
+    return plans
+
+
+def _load_cipher(config: Dict[str, Any]):
+    """Fernet cipher for the stored root passwords; fails fast when the pool cannot keep them safe."""
+    if not config.get('ENABLED'):
+        return None
+    if Fernet is None:
+        raise Exception("The warm pool needs the cryptography package (pip install cryptography)")
+    if not config.get('PASSWORD_KEY'):
+        raise Exception("WARM_POOL.PASSWORD_KEY is required to encrypt warm droplet passwords")
+    return Fernet(config['PASSWORD_KEY'])
+
+
+warm_pool = WarmPool(
+    _load_plans(WARM_POOL_CONFIG),
+    refill_interval=float(WARM_POOL_CONFIG.get('REFILL_INTERVAL', 60)),
+    cipher=_load_cipher(WARM_POOL_CONFIG)
+)
+
+
+def start_warm_pool_scheduler() -> Optional[threading.Thread]:
+    """Fill the warm pool now, then check it every REFILL_INTERVAL seconds or after each claim."""
+    return warm_pool.start()
@@ -0,0 +1,186 @@
+import time
+import queue
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger('storage')
+
+_STOP = object()
+
+
+class _Rollback(Exception):
+    """Abort the batch transaction after a job failed on a backend without savepoints."""
+
+
+class _Job:
+    __slots__ = ('fn', 'done', 'result', 'error')
+
+    def __init__(self, fn: Callable[[], Any]):
+        self.fn = fn
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class StorageWriter:
+    """
+    Single writer thread for a storage backend.
+
+    Every mutation is queued and executed on this thread. Whatever is pending
+    when the thread wakes up is applied inside one backend transaction and
+    committed once (group commit); each job runs in its own savepoint so a
+    failing job does not roll back the others. Backends without savepoints
+    (JSON files) roll back the whole batch instead and replay it without the
+    failed job.
+    """
+
+    def __init__(self, backend, max_batch: int = 256, commit_window: float = 0.0):
+        self.backend = backend
+        self.max_batch = max_batch
+        self.commit_window = commit_window
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._callbacks: Optional[List[Callable[[], None]]] = None
+        self._writer_ident: Optional[int] = None
+        self._lock = threading.Lock()
+
+        # Metrik
+        self.flushes = 0
+        self.jobs = 0
+        self.failed_jobs = 0
+        self.max_batch_seen = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='storage_writer', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 10) -> None:
+        """Apply everything already queued, then stop the thread."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def in_writer(self) -> bool:
+        return threading.get_ident() == self._writer_ident
+
+    def submit(self, fn: Callable[[], Any]) -> Any:
+        """Run ``fn`` on the writer thread and return its result once committed."""
+        if self.in_writer():
+            return fn()
+
+        self.start()
+        job = _Job(fn)
+        self._queue.put(job)
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def after_commit(self, callback: Callable[[], None]) -> None:
+        """Run ``callback`` once the current batch is committed (or now, outside a batch)."""
+        if self.in_writer() and self._callbacks is not None:
+            self._callbacks.append(callback)
+        else:
+            callback()
+
+    def _run(self) -> None:
+        self._writer_ident = threading.get_ident()
+        while True:
+            job = self._queue.get()
+            if job is _STOP:
+                return
+
+            batch = [job]
+            stopping = False
+            deadline = time.monotonic() + self.commit_window
+            while len(batch) < self.max_batch:
+                try:
+                    remaining = deadline - time.monotonic()
+                    job = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is _STOP:
+                    stopping = True
+                    break
+                batch.append(job)
+
+            self._flush(batch)
+            if stopping:
+                return
+
+    def _flush(self, batch: List[_Job]) -> None:
+        start = time.perf_counter()
+        callbacks: List[Callable[[], None]] = []
+        self._callbacks = callbacks
+
+        try:
+            while not self._apply(batch, callbacks):
+                callbacks.clear()
+        except Exception as e:
+            logger.error(f"Storage commit failed for {len(batch)} writes: {str(e)}")
+            for job in batch:
+                if job.error is None:
+                    job.error = e
+            callbacks.clear()
+        finally:
+            self._callbacks = None
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Error in after-commit callback: {str(e)}")
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.flushes += 1
+        self.jobs += len(batch)
+        self.failed_jobs += sum(1 for job in batch if job.error is not None)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self._total_flush_ms += elapsed_ms
+
+        for job in batch:
+            job.done.set()
+
+    def _apply(self, batch: List[_Job], callbacks: List[Callable[[], None]]) -> bool:
+        """Run the batch in one transaction; False when it was rolled back to drop a failed job."""
+        try:
+            with self.backend.transaction():
+                for job in batch:
+                    if job.error is not None:
+                        continue
+                    pending = len(callbacks)
+                    try:
+                        with self.backend.savepoint():
+                            job.result = job.fn()
+                    except Exception as e:
+                        job.error = e
+                        del callbacks[pending:]
+                        if not self.backend.supports_savepoints:
+                            raise _Rollback()
+        except _Rollback:
+            return False
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'queue_depth': self._queue.qsize(),
+            'flushes': self.flushes,
+            'jobs': self.jobs,
+            'failed_jobs': self.failed_jobs,
+            'avg_batch': self.jobs / self.flushes if self.flushes else 0.0,
+            'max_batch': self.max_batch_seen,
+            'last_flush_ms': self.last_flush_ms,
+            'avg_flush_ms': self._total_flush_ms / self.flushes if self.flushes else 0.0,
+            'max_flush_ms': self.max_flush_ms,
+        }